@@ -25,7 +25,8 @@ if __name__ == "__main__":
       license='MIT',
       packages=['surfaxe'],
       zip_safe=False,
-      install_requires=['scipy', 'numpy>1.20', 'spglib', 'pymatgen','pandas','scikit-learn'],
+      install_requires=['scipy', 'numpy>1.20', 'spglib', 'pymatgen','pandas'],
+      extras_require={'parquet': ['pyarrow'], 'zstd': ['zstandard']},
       python_requires='>=3.7',
       classifiers=[
         'Programming Language :: Python',
@@ -51,6 +52,7 @@ if __name__ == "__main__":
           'surfaxe-plot-potential = surfaxe.cli.plotpotential:main', 
           'surfaxe-generate = surfaxe.cli.generateslabs:main', 
           'surfaxe-surface-dipole = surfaxe.cli.surfacedipole:main',
+          'surfaxe-volumetric = surfaxe.cli.volumetric:main',
         ]
       }
     )
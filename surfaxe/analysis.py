@@ -1,32 +1,47 @@
 # Pymatgen
 from pymatgen.core import Structure
-from pymatgen.analysis.local_env import CrystalNN, CutOffDictNN
-from pymatgen.io.vasp.outputs import Locpot
+from pymatgen.analysis.local_env import CrystalNN
 from pymatgen.io.vasp.inputs import UnknownPotcarWarning
 # Misc
 import os
-import math
+import glob
 import numpy as np
 import pandas as pd
 import warnings
+import functools
+import multiprocessing
 
 warnings.filterwarnings("ignore", category=UnknownPotcarWarning)
 warnings.filterwarnings("ignore", message="No POTCAR file with matching TITEL fields")
 # surfaxe
 from surfaxe.generation import oxidation_states
-from surfaxe.io import plot_bond_analysis, plot_electrostatic_potential, _instantiate_structure
+from surfaxe.io import plot_bond_analysis, plot_electrostatic_potential, \
+_instantiate_structure, planar_average, planar_difference, save_df, \
+_find_file, _exists, \
+_xdatcar_frames, _neighbours, _bonded_structure, _nn_key, _nn_entry, \
+_custom_formatwarning
 
-def cart_displacements(start, end, max_disp=0.1, save_txt=True,
+def cart_displacements(start, end=None, max_disp=0.1, save_txt=True,
 txt_fname='cart_displacements.txt'):
     """
     Produces a text file with all the magnitude of displacements of atoms
-    in Cartesian space
+    in Cartesian space. The displacements use the minimum image convention,
+    so atoms that cross a periodic boundary are not displaced by a lattice
+    vector.
+
+    If ``end`` is not given, ``start`` is a trajectory, an XDATCAR or a list
+    of frames, and the displacements are the total displacements from the
+    first to the last frame, summed over the frames as in 
+    ``trajectory_displacements``.
 
     Args:
-        start (`str`): Filename of initial structure file in any format 
-            supported by pymatgen or pymatgen structure object.
-        end (`str`): Filename of final structure file in any format supported
-            by pymatgen or pymatgen structure object.
+        start (`str` or `list`): Filename of initial structure file in any 
+            format supported by pymatgen or pymatgen structure object. If 
+            ``end`` is ``None``, the filename of an XDATCAR or a list of 
+            structures or structure files.
+        end (`str`, optional): Filename of final structure file in any format
+            supported by pymatgen or pymatgen structure object. Defaults to 
+            ``None``.
         max_disp (`float`, optional): The maximum displacement shown. Defaults 
             to 0.1 Å.
         save_txt (`bool`, optional): Save the displacements to file. Defaults to 
@@ -38,41 +53,27 @@ txt_fname='cart_displacements.txt'):
        None (default) or DataFrame of displacements of atoms in Cartesian space 
 
     """
-    # Instantiate the structures 
-    start_struc = _instantiate_structure(start)
-    end_struc = _instantiate_structure(end)
-
-    # Add the site labels to the structure
-    els = ''.join([i for i in start_struc.formula if not i.isdigit()]).split(' ')
-    el_dict = {i : 1 for i in els}
-    site_labels = []
+    if end is None: 
+        traj = trajectory_displacements(start)
+        site_labels = traj['site_labels']
+        disps = traj['cumulative'][-1]
+    else: 
+        # Instantiate the structures 
+        start_struc = _instantiate_structure(start)
+        end_struc = _instantiate_structure(end)
+        site_labels = _site_labels([site.specie.symbol for site in start_struc])
+        disps = np.linalg.norm(_displacements(start_struc.frac_coords, 
+            end_struc.frac_coords, start_struc.lattice.matrix, 
+            end_struc.lattice.matrix), axis=1)
+
+    # Keep the displacements of at least max_disp, rounded to the same number
+    # of decimal places as max displacement, for presentation 
+    disp_list = [{
+        'site': n+1,
+        'atom': site_labels[n],
+        'displacement': round(float(d), int(format(max_disp, 'E')[-1]))
+        } for n, d in enumerate(disps) if d >= max_disp]
 
-    for site in start_struc:
-        symbol = site.specie.symbol
-        site_labels.append((symbol,el_dict[symbol]))
-        el_dict[symbol] +=1
-    start_struc.add_site_property('', site_labels)
-
-    # Convert to cartesian coordinates
-    start_struc = start_struc.cart_coords
-    end_struc = end_struc.cart_coords
-
-    # Calculate the displacements
-    disp_list = []
-    for n, (start_coord, end_coord) in enumerate(zip(start_struc, end_struc)):
-        xdisp = math.pow(start_coord[0] - end_coord[0], 2)
-        ydisp = math.pow(start_coord[1] - end_coord[1], 2)
-        zdisp = math.pow(start_coord[2] - end_coord[2], 2)
-        d = math.sqrt(xdisp + ydisp + zdisp)
-        label = site_labels[n]
-        if d >= max_disp:
-            disp_list.append({
-                'site': n+1,
-                'atom': label,
-                # this makes the displacements round to the same number of 
-                # decimal places as max displacement, for presentation 
-                'displacement': round(d, int(format(max_disp, 'E')[-1])) 
-                             })
     # Save as txt file
     df = pd.DataFrame(disp_list)
 
@@ -81,17 +82,92 @@ txt_fname='cart_displacements.txt'):
     else: 
         return df
 
-def bond_analysis(structure, bond, nn_method=CrystalNN(), ox_states=None, 
+def trajectory_displacements(trajectory): 
+    """
+    Calculates the displacements of atoms along a trajectory, e.g. a 
+    relaxation or molecular dynamics run. The frames are streamed one at a 
+    time, so only the displacement arrays are kept in memory. The 
+    displacement between consecutive frames uses the minimum image 
+    convention and the cumulative displacement is the sum of these steps, 
+    so atoms that cross a periodic boundary are followed across it.
+
+    Args:
+        trajectory (`str` or `list`): Filename of an XDATCAR (which can be 
+            compressed) or a list of pymatgen structure objects or structure
+            files in any format supported by pymatgen, with the same atoms in 
+            the same order.
+
+    Returns:
+        dict with the ``site_labels``, the ``step`` displacements of each 
+        frame from the previous frame and the ``cumulative`` displacements 
+        of each frame from the first frame, as arrays of frames by sites in Å
+        where the first frame is all zeros
+    """
+    if type(trajectory) == str: 
+        frames = _xdatcar_frames(trajectory)
+    else: 
+        frames = ((
+            [site.specie.symbol for site in struc], struc.lattice.matrix, 
+            struc.frac_coords) for struc in 
+            (_instantiate_structure(frame) for frame in trajectory))
+
+    species, lattice, frac = next(frames)
+    total = np.zeros((len(species), 3))
+    step, cumulative = [np.zeros(len(species))], [np.zeros(len(species))]
+    for next_species, next_lattice, next_frac in frames: 
+        d = _displacements(frac, next_frac, lattice, next_lattice)
+        total += d
+        step.append(np.linalg.norm(d, axis=1))
+        cumulative.append(np.linalg.norm(total, axis=1))
+        lattice, frac = next_lattice, next_frac
+
+    return {'site_labels': _site_labels(species), 'step': np.array(step), 
+        'cumulative': np.array(cumulative)}
+
+def _displacements(start_frac, end_frac, start_lattice, end_lattice): 
+    """
+    Helper function that returns the Cartesian displacement vectors of all
+    atoms at once with the minimum image convention. The whole number of
+    lattice vectors an atom moved by in fractional space is taken off, so an
+    atom crossing a periodic boundary moves by less than half a lattice 
+    vector instead of a full one.
+    """
+    shift = np.round(end_frac - start_frac)
+
+    return (end_frac - shift) @ end_lattice - start_frac @ start_lattice
+
+def _site_labels(species): 
+    """
+    Helper function that labels each site by its element and the number of
+    the atom of that element, e.g. ('O', 3) for the third O
+    """
+    counts = {}
+    site_labels = []
+    for symbol in species: 
+        counts[symbol] = counts.get(symbol, 0) + 1
+        site_labels.append((symbol, counts[symbol]))
+
+    return site_labels
+
+def bond_analysis(structure, bond, nn_method=CrystalNN(), ox_states=None,  
 save_csv=True, csv_fname='bond_analysis.csv', save_plt=False, 
-plt_fname='bond_analysis.png', **kwargs):
+plt_fname='bond_analysis.png', cutoff=None, **kwargs):
     """
     Parses the structure looking for bonds between atoms. Check the validity of
     the nearest neighbour method on the bulk structure before using it on slabs.
+    Several bonds can be analysed at once, sharing the oxidation states and 
+    the nearest neighbours of the structure.
+
+    ``nn_method`` is the reference for finding the bonds, but it is slow on 
+    large slabs. If ``cutoff`` is set, all the bonds are instead found in one
+    pass of a cell list neighbour search, and every second atom within the 
+    cutoff of a first atom counts as bonded to it. 
 
     Args:
         structure (`str`): filename of structure, takes all pymatgen-supported 
             formats, including pmg structure object
-        bond (`list`): Bond to analyse e.g. ``['Y', 'O']``
+        bond (`list`): Bond to analyse e.g. ``['Y', 'O']`` or a list of bonds
+            e.g. ``[['Ti', 'O'], ['Y', 'O'], ['Ti', 'S']]``
         nn_method (`class`, optional): The coordination number prediction 
             algorithm used. Because the ``nn_method`` is a class, the class 
             needs to be imported from ``pymatgen.analysis.local_env`` before it 
@@ -113,63 +189,203 @@ plt_fname='bond_analysis.png', **kwargs):
             Defaults to ``None``. 
         save_csv (`bool`, optional): Makes a csv file with the c coordinate of 
             the first atom and bond length. Defaults to ``True``.
-        csv_fname (`str`, optional): Filename of the csv file. Defaults to 
-            ``'bond_analysis.csv'``.
+        csv_fname (`str`, optional): Filename of the csv file. Defaults to
+            ``'bond_analysis.csv'``. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
         save_plt (`bool`, optional): Make and save the bond analysis plot. 
             Defaults to ``False``. 
         plt_fname (`str`, optional): Filename of the plot. Defaults to 
             ``'bond_analysis.png'``. 
+        cutoff (`float`, `dict` or `str`, optional): Either the maximum bond 
+            length in Å, a dict of them for each bond e.g. ``{'Ti-O': 2.3, 
+            'Y-O': 2.6}``, or the bulk structure, as a filename or pmg 
+            structure object, in which case the cutoff is the longest bond 
+            ``nn_method`` finds in the bulk, lengthened by 10%. Defaults to 
+            ``None``, which uses ``nn_method`` for every site.  
         kwargs (`dict`, optional): Additional keyword arguments to pass to 
             plot_bond_analysis(). Defaults to ``{}``.
 
     Returns:
-        DataFrame with the c coordinate of the first atom and bond length
+        DataFrame with the c coordinate of the first atom and bond length. For
+        a list of bonds, a long format DataFrame with the bond e.g. ``'Ti-O'``,
+        the index and c coordinate of the first atom and the bond length.
     """
     struc = _instantiate_structure(structure)
     struc = oxidation_states(structure=struc, ox_states=ox_states)
 
-    if type(bond) != list:
+    if type(bond) != list or len(bond) == 0:
         raise TypeError('Bond must be supplied as a list of two elements.')
-    
-    if len(bond) > 2: 
+
+    bonds = bond if type(bond[0]) in (list, tuple) else [bond]
+    if any(len(b) > 2 for b in bonds): 
         warnings.warn('Bond with more than two elements supplied. '
         'Only the first two elements will be treated as a bond.')
 
-    # Iterates through the structure, looking for pairs of bonded atoms. If the
-    # sites match, the bond distance is calculated and passed to a dataframe
-    bonds_info = []
-    for n, pos in enumerate(struc):
-        if pos.specie.symbol == bond[0]:
-            nearest_neighbours = nn_method.get_nn_info(struc, n)
-            matched_sites = []
-            for d in nearest_neighbours:
-                if d.get('site').specie.symbol == bond[1]:
-                    matched_sites.append(d)
-            bond_distances = [
-                struc.get_distance(n,x['site_index']) for x in matched_sites
-            ]
-            bonds_info.append({
-                '{}_index'.format(bond[0]): n+1,
-                '{}_c_coord'.format(bond[0]): pos.c,
-                '{}-{}_bond_distance'.format(bond[0],bond[1]): np.mean(bond_distances)
-            })
-
-    df = pd.DataFrame(bonds_info)
-    
+    dfs = _bond_tables(struc, bonds, nn_method, cutoff=cutoff)
+    if type(bond[0]) in (list, tuple): 
+        df = _long_bond_table(bonds, dfs)
+    else: 
+        df = dfs[0]
+        
     # Save plot and csv, or return the DataFrame 
     if save_plt: 
         plot_bond_analysis(bond, df=df, plt_fname=plt_fname, **kwargs)
     if save_csv: 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
-        df.to_csv(csv_fname, header=True, index=False)
+        save_df(df, csv_fname)
     else: 
         return df
 
 
+def _bond_tables(struc, bonds, nn_method, cutoff=None):
+    """
+    Helper function for the bond analysis of several bonds in one structure.
+    The nearest neighbours of each site that is the first atom of one of the
+    bonds are found once, and cached, and shared by all the bonds, either with
+    nn_method or, if a cutoff is given, with the cell list search in 
+    _pair_distances.  
+    Returns a list with a DataFrame of the c coordinate of the first atom and
+    the bond length for each bond.
+    """
+    if cutoff is not None: 
+        cutoffs = _bond_cutoffs(bonds, cutoff, nn_method)
+        species = np.array([site.specie.symbol for site in struc])
+        centres, points, distances = _pair_distances(struc, cutoffs, species)
+
+        dfs = []
+        for bond in bonds: 
+            first = np.flatnonzero(species == bond[0])
+            matched = ((species[centres] == bond[0]) & 
+                (species[points] == bond[1]) & 
+                (distances < cutoffs[tuple(bond[:2])]))
+            # the mean bond length of each first atom, NaN if it has no bonds
+            total = np.bincount(centres[matched], weights=distances[matched],
+                minlength=len(struc))
+            count = np.bincount(centres[matched], minlength=len(struc))
+            with np.errstate(invalid='ignore'): 
+                mean = total[first] / count[first]
+            dfs.append(pd.DataFrame({
+                '{}_index'.format(bond[0]): first + 1,
+                '{}_c_coord'.format(bond[0]): struc.frac_coords[first, 2],
+                '{}-{}_bond_distance'.format(bond[0], bond[1]): mean
+            }))
+
+        return dfs
+
+    first_atoms = {bond[0] for bond in bonds}
+    neighbours = _neighbours(struc, nn_method, [n for n, pos in 
+        enumerate(struc) if pos.specie.symbol in first_atoms])
+
+    # Iterates through the structure, looking for pairs of bonded atoms. If the
+    # sites match, the bond distance is calculated and passed to a dataframe
+    dfs = []
+    for bond in bonds:
+        bonds_info = []
+        for n, pos in enumerate(struc):
+            if pos.specie.symbol == bond[0]:
+                matched_sites = []
+                for i, image, weight in neighbours[n]:
+                    if struc[i].specie.symbol == bond[1]:
+                        matched_sites.append(i)
+                bond_distances = [
+                    struc.get_distance(n,x) for x in matched_sites
+                ]
+                bonds_info.append({
+                    '{}_index'.format(bond[0]): n+1,
+                    '{}_c_coord'.format(bond[0]): pos.c,
+                    '{}-{}_bond_distance'.format(bond[0],bond[1]): np.mean(bond_distances)
+                })
+        dfs.append(pd.DataFrame(bonds_info))
+
+    return dfs
+
+def _long_bond_table(bonds, dfs): 
+    """
+    Helper function that joins the DataFrames from _bond_tables into one long
+    format DataFrame with a row for each first atom of each bond
+    """
+    columns = ['bond', 'index', 'c_coord', 'bond_distance']
+    long_dfs = []
+    for bond, df in zip(bonds, dfs): 
+        # skip the bonds whose first element is not in the structure
+        if df.empty: 
+            continue
+        df = df.rename(columns={
+            '{}_index'.format(bond[0]): 'index', 
+            '{}_c_coord'.format(bond[0]): 'c_coord',
+            '{}-{}_bond_distance'.format(bond[0], bond[1]): 'bond_distance'})
+        df.insert(0, 'bond', '{}-{}'.format(bond[0], bond[1]))
+        long_dfs.append(df.reindex(columns=columns))
+
+    if not long_dfs: 
+        return pd.DataFrame(columns=columns)
+
+    return pd.concat(long_dfs, ignore_index=True)
+
+def _bond_cutoffs(bonds, cutoff, nn_method):
+    """
+    Helper function that returns a dict of the cutoff for each bond, keyed by
+    the (first element, second element) tuple. A number is the cutoff of all 
+    bonds and a dict has the cutoff of each bond keyed by e.g. 'Ti-O'. 
+    Otherwise the cutoff is the longest bond nn_method finds in the bulk 
+    structure lengthened by 10%, so it allows for the bonds relaxing at the 
+    surface.
+    """
+    if isinstance(cutoff, (int, float)): 
+        return {tuple(bond[:2]): float(cutoff) for bond in bonds}
+
+    if isinstance(cutoff, dict): 
+        cutoffs = {tuple(k.split('-')) if isinstance(k, str) else tuple(k): 
+            float(v) for k, v in cutoff.items()}
+        for bond in bonds: 
+            if tuple(bond[:2]) not in cutoffs: 
+                raise ValueError('No cutoff was given for the {}-{} '
+                'bond'.format(bond[0], bond[1]))
+        return cutoffs
+
+    bulk = _instantiate_structure(cutoff)
+    neighbours = _neighbours(bulk, nn_method)
+    cutoffs = {}
+    for bond in bonds: 
+        lengths = [np.linalg.norm(bulk.lattice.get_cartesian_coords(
+            bulk.frac_coords[i] + image) - site.coords)
+            for n, site in enumerate(bulk) if site.specie.symbol == bond[0]
+            for i, image, weight in neighbours[n] 
+            if bulk[i].specie.symbol == bond[1]]
+        if not lengths: 
+            raise ValueError('No {}-{} bonds were found in the bulk '
+            'structure'.format(bond[0], bond[1]))
+        cutoffs[tuple(bond[:2])] = max(lengths) * 1.1
+
+    return cutoffs
+
+def _pair_distances(struc, cutoffs, species=None):
+    """
+    Helper function that finds all pairs of atoms closer than the cutoff of 
+    their pair of elements in one vectorised pass of pymatgen's cell list 
+    neighbour search. ``cutoffs`` is a dict of cutoffs keyed by (element, 
+    element) tuples, or (species, species) with ``species`` given as e.g. 
+    'Ti4+', and pairs are found in both orders. Returns arrays of the
+    indices of the centre and neighbour atom of each pair and their distance,
+    which is to the neighbouring image, not the one in the cell. 
+    """
+    if species is None: 
+        species = np.array([site.specie.symbol for site in struc])
+    centres, points, _, distances = struc.get_neighbor_list(
+        max(cutoffs.values()))
+    centre_species, point_species = species[centres], species[points]
+
+    keep = np.zeros(len(distances), dtype=bool)
+    for (a, b), r in cutoffs.items(): 
+        pair = (((centre_species == a) & (point_species == b)) | 
+            ((centre_species == b) & (point_species == a)))
+        keep |= pair & (distances < r)
+
+    return centres[keep], points[keep], distances[keep]
+
 def electrostatic_potential(locpot='./LOCPOT', prim_to_conv=1,
 axis='c', save_csv=True, csv_fname='potential.csv', save_plt=True, 
-plt_fname='potential.png', lattice_vector=None, **kwargs):
+plt_fname='potential.png', lattice_vector=None, double_window=False, 
+**kwargs):
     """
     Reads LOCPOT to get the planar and macroscopic potential in a, b or c direction 
 
@@ -181,90 +397,94 @@ plt_fname='potential.png', lattice_vector=None, **kwargs):
         axis (`str`, optional): Axis along which the potential is calculated. 
             Takes a,b,c or x,y,z. 
         save_csv (`bool`, optional): Saves to csv. Defaults to ``True``.
-        csv_fname (`str`, optional): Filename of the csv file. Defaults 
-            to ``'potential.csv'``.
+        csv_fname (`str`, optional): Filename of the csv file. Defaults
+            to ``'potential.csv'``. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
         save_plt (`bool`, optional): Make and save the plot of electrostatic 
             potential. Defaults to ``True``. 
         plt_fname (`str`, optional): Filename of the plot. Defaults to 
             ``'potential.png'``.
-        lattice_vector (`float`, optional): Manually set the periodicity of the slab
+        lattice_vector (`float` or `list`, optional): Manually set the 
+            periodicity of the slab, two values give the double window average 
+            used for interfaces between two materials
+        double_window (`bool`, optional): Take the macroscopic average over 
+            two windows of the lattice vector. Defaults to ``False``.
 
     Returns:
         DataFrame
     """
-    # set up axis 
-    if axis in ['a', 'x']: 
-        ax = 0 
-    elif axis in ['b', 'y']: 
-        ax = 1
-    elif axis in ['c', 'z']: 
-        ax = 2
-    else: 
-        raise ValueError('axis can only be set to a,b,c or x,y,z')
-
-    # Read potential and structure data
-    if os.path.exists(locpot):
-        lpt = Locpot.from_file(locpot)
-        struc = lpt.structure
-    elif os.path.exists(locpot + ".gz"):
-        lpt = Locpot.from_file(locpot + ".gz")
-        struc = lpt.structure
-    else:
-        raise FileNotFoundError(
-            f"""No LOCPOT(.gz) found at {locpot}(.gz)""")
+    # Read potential and structure data, get planar and macroscopic potential
+    ax = _get_axis(axis)
+    planar, struc, dim = _read_locpot(locpot, ax)
+    df = _potential(planar, struc, ax, dim[ax], prim_to_conv=prim_to_conv, 
+    lattice_vector=lattice_vector, double_window=double_window)
 
-    # Planar potential
-    planar = lpt.get_average_along_axis(ax)
-    df = pd.DataFrame(data=planar, columns=['planar']) 
-    
-    # Calculate macroscopic potential
-    if lattice_vector is None:
-        # Calculate lattice vector
-        arr = np.array([i.coords for i in struc.sites])
-        comp, factor = struc.composition.get_reduced_composition_and_factor()
-        # get atom closest to median to avoid edge effects
-        med = np.median(arr[:, ax])
-        diff = np.abs(arr[:, ax] - med)
-        argmin = diff.argmin()
+    # Plot and save the graph, save the csv or return the dataframe
+    if save_plt: 
+        plot_electrostatic_potential(df=df, plt_fname=plt_fname, **kwargs)
+    if save_csv: 
+        save_df(df, csv_fname)
+    else: 
+        return df
 
-        specie_min = str(struc[argmin].specie)
-        argmax = int(argmin + comp.as_dict()[specie_min] * prim_to_conv)
-        # check the argmax is not greater than the number of atoms
-        if argmax >= len(arr): 
-            argmax = int(argmin - comp.as_dict()[specie_min] * prim_to_conv )
-        lattice_vector = abs(arr[:, ax][argmax] - arr[:, ax][argmin])
+def volumetric_average(filename='./CHGCAR', reference=None, prim_to_conv=1, 
+axis='c', density=None, save_csv=True, csv_fname='volumetric.csv', 
+save_plt=True, plt_fname='volumetric.png', lattice_vector=None, 
+double_window=False, **kwargs):
+    """
+    Reads any VASP volumetric data file, e.g. CHGCAR, PARCHG or LOCPOT, to 
+    get the planar and macroscopic average in a, b or c direction. The file 
+    is streamed so the grid is never held in memory. Charge densities are 
+    divided by the volume of the cell to give e/Å^3. 
 
-    # Divide lattice parameter by no. of grid points in the direction
-    resolution = struc.lattice.abc[ax]/lpt.dim[ax]
-
-    # Get number of points over which the rolling average is evaluated
-    points = int(lattice_vector/resolution)
-
-    # Need extra points at the start and end of planar potential to evaluate the
-    # macroscopic potential this makes use of the PBC where the end of one unit
-    # cell coincides with start of the next one
-    add_to_start = planar[(len(planar) - points): ]
-    add_to_end = planar[0:points]
-    pfm_data = np.concatenate((add_to_start,planar,add_to_end))
-    pfm = pd.DataFrame(data=pfm_data, columns=['y'])
-
-    # Macroscopic potential
-    m_data = pfm.y.rolling(window=points, center=True).mean()
-    macroscopic = m_data.iloc[points:(len(planar)+points)]
-    macroscopic.reset_index(drop=True,inplace=True)
-    df['macroscopic'] = macroscopic
+    Args:
+        filename (`str`, optional): The path to the volumetric data file. 
+            Defaults to ``'./CHGCAR'``.
+        reference (`str`, optional): The path to a volumetric data file on 
+            the same grid that is subtracted from ``filename`` chunk by 
+            chunk, e.g. the bulk-like charge density in the slab cell for 
+            the charge redistribution at the surface. Defaults to ``None``.
+        prim_to_conv (`int`, optional): The number of primitive cells in the 
+            conventional cell. Defaults to ``1``.
+        axis (`str`, optional): Axis along which the average is calculated. 
+            Takes a,b,c or x,y,z. 
+        density (`bool`, optional): Whether the data is a charge density 
+            which is divided by the volume. Defaults to ``None``, which treats
+            CHGCAR, CHG, PARCHG and AECCAR files as charge densities.
+        save_csv (`bool`, optional): Saves to csv. Defaults to ``True``.
+        csv_fname (`str`, optional): Filename of the csv file. Defaults
+            to ``'volumetric.csv'``. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
+        save_plt (`bool`, optional): Make and save the plot of the planar 
+            and macroscopic average. Defaults to ``True``. 
+        plt_fname (`str`, optional): Filename of the plot. Defaults to 
+            ``'volumetric.png'``.
+        lattice_vector (`float` or `list`, optional): Manually set the 
+            periodicity of the slab, two values give the double window average 
+            used for interfaces between two materials
+        double_window (`bool`, optional): Take the macroscopic average over 
+            two windows of the lattice vector. Defaults to ``False``.
 
-    # Get gradient of the plot - this is used for convergence testing, to make 
-    # sure the potential is actually flat
-    df['gradient'] = np.gradient(df['planar'])
+    Returns:
+        DataFrame
+    """
+    ax = _get_axis(axis)
+    planar, struc, dim = _read_volumetric(filename, ax, reference=reference)
+    if density is None: 
+        density = _is_density(filename)
+    if density: 
+        planar = planar / struc.volume
+    df = _potential(planar, struc, ax, dim[ax], prim_to_conv=prim_to_conv, 
+    lattice_vector=lattice_vector, double_window=double_window)
 
-    # Plot and save the graph, save the csv or return the dataframe
     if save_plt: 
+        if density: 
+            kwargs.setdefault('ylabel', r'Charge density (e/$\mathrm{\AA}^3$)')
+        elif 'LOCPOT' not in os.path.basename(filename).upper(): 
+            kwargs.setdefault('ylabel', 'Average')
         plot_electrostatic_potential(df=df, plt_fname=plt_fname, **kwargs)
     if save_csv: 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
-        df.to_csv(csv_fname, header=True, index=False)
+        save_df(df, csv_fname)
     else: 
         return df
 
@@ -280,11 +500,13 @@ def surface_dipole(filename, **kwargs):
         float: The surface dipole in eV
     """
     if 'LOCPOT' in filename: 
-        pt = electrostatic_potential(filename, **kwargs) 
-        # check the csv file wasnt saved 
-        if pt is None: 
-            save = kwargs.pop('save_csv', True)
-            pt = electrostatic_potential(filename, save_csv=False, **kwargs) 
+        # electrostatic_potential returns nothing when it saves the csv, so 
+        # the csv is saved here to read the LOCPOT only once 
+        save_csv = kwargs.pop('save_csv', True)
+        csv_fname = kwargs.pop('csv_fname', 'potential.csv')
+        pt = electrostatic_potential(filename, save_csv=False, **kwargs) 
+        if save_csv: 
+            save_df(pt, csv_fname)
     elif filename.endswith('csv'): 
         pt = pd.read_csv(filename) 
         if 'macroscopic' not in pt.columns: 
@@ -292,26 +514,147 @@ def surface_dipole(filename, **kwargs):
     else: 
         raise ValueError('filename should be a LOCPOT or a csv file')
     
-    # Get the surface dipole, add an averaging over the IQR 
-    low, high = np.quantile(pt[pt['macroscopic'] < 0].index, [0.25, 0.75])
+    dipole, bulk_potential = _dipole(pt)
 
+    return round(dipole, 3)
 
-    dipole = pt['macroscopic'].max() - np.mean(pt.loc[low:high]['macroscopic'])
+def potential_summary(locpots, processes=None, save_csv=True, 
+csv_fname='potential_summary.csv', **kwargs): 
+    """
+    Gets the vacuum level, surface dipole, bulk-like potential and the 
+    gradient of the vacuum potential of many LOCPOTs, which are processed in 
+    parallel and each read once. 
 
-    return round(dipole, 3)
+    Args:
+        locpots (`str` or `list`): A glob pattern e.g. ``'*/LOCPOT'`` or a 
+            list of paths to or glob patterns of the LOCPOT files
+        processes (`int`, optional): The number of processes used, defaults
+            to the number of CPUs - 1. 
+        save_csv (`bool`, optional): Saves to csv. Defaults to ``True``.
+        csv_fname (`str`, optional): Filename of the csv file. Defaults to 
+            ``'potential_summary.csv'``. A ``.parquet``, ``.feather`` or 
+            ``.npz`` extension saves the data in that format instead.
+        kwargs: ``prim_to_conv``, ``axis``, ``lattice_vector`` and 
+            ``double_window`` as in ``electrostatic_potential``
+
+    Returns:
+        DataFrame with the ``locpot``, ``vacuum_potential`` (eV),
+        ``surface_dipole`` (eV), ``bulk_potential`` (eV), the macroscopic 
+        potential averaged over the IQR of the slab, and ``vacuum_gradient``
+        (meV), the gradient of the planar potential averaged over the middle 
+        half of the vacuum
+    """
+    if type(locpots) == str: 
+        locpots = [locpots]
+    locpots = [locpot for pattern in locpots 
+        for locpot in (sorted(glob.glob(pattern)) or [pattern])]
+
+    if processes == None or processes > multiprocessing.cpu_count():
+        processes = multiprocessing.cpu_count() - 1
+
+    helper = functools.partial(_locpot_summary, kwargs)
+    if processes > 1 and len(locpots) > 1: 
+        with multiprocessing.Pool(min(processes, len(locpots))) as pool: 
+            results = pool.map(helper, locpots)
+    else: 
+        results = [helper(locpot) for locpot in locpots]
+
+    missing = [locpot for locpot, result in zip(locpots, results) 
+    if result is None]
+    if missing: 
+        warnings.formatwarning = _custom_formatwarning
+        warnings.warn('No LOCPOT(.gz, .xz, .bz2, .zst) found at {}'.format(
+        ', '.join(missing)))
+
+    df = pd.DataFrame([result if result is not None else {'locpot': locpot} 
+        for locpot, result in zip(locpots, results)], 
+        columns=['locpot', 'vacuum_potential', 'surface_dipole', 
+        'bulk_potential', 'vacuum_gradient'])
+
+    if save_csv: 
+        save_df(df, csv_fname)
+    else: 
+        return df
+
+def _locpot_summary(kwargs, locpot): 
+    """
+    Helper function for potential_summary. Reads one LOCPOT and returns the 
+    row of the summary table, or None if the LOCPOT does not exist. 
+    """
+    ax = _get_axis(kwargs.get('axis', 'c'))
+    try: 
+        planar, struc, dim = _read_locpot(locpot, ax)
+    except FileNotFoundError: 
+        return None
+    pt = _potential(planar, struc, ax, dim[ax], 
+    prim_to_conv=kwargs.get('prim_to_conv', 1), 
+    lattice_vector=kwargs.get('lattice_vector', None), 
+    double_window=kwargs.get('double_window', False))
+
+    dipole, bulk_potential = _dipole(pt)
+    vacuum = _vacuum_region(pt['macroscopic'].to_numpy())
+    gradient = pt['gradient'].to_numpy()[vacuum]
+
+    return {'locpot': locpot, 
+    'vacuum_potential': float(f"{np.max(planar): .3f}"), 
+    'surface_dipole': round(dipole, 3), 
+    'bulk_potential': round(bulk_potential, 3), 
+    'vacuum_gradient': np.mean(gradient) * 1000 if len(gradient) else np.nan}
+
+def _dipole(pt): 
+    """
+    Helper function that returns the surface dipole and the bulk-like 
+    potential, the macroscopic potential averaged over the IQR of the slab
+    """
+    slab = pt[pt['macroscopic'] < 0].index
+    if len(slab) == 0: 
+        return np.nan, np.nan
+    low, high = np.quantile(slab, [0.25, 0.75])
+    bulk_potential = np.mean(pt.loc[low:high]['macroscopic'])
+    dipole = pt['macroscopic'].max() - bulk_potential
+
+    return dipole, bulk_potential
+
+def _vacuum_region(macroscopic): 
+    """
+    Helper function that returns the indices of the middle half of the 
+    vacuum, the longest periodic run of non-negative macroscopic potential, 
+    which is away from the surfaces and should be flat
+    """
+    vacuum = macroscopic >= 0
+    if vacuum.all() or not vacuum.any(): 
+        return np.array([], dtype=int)
+
+    # start from a point in the slab so the vacuum does not wrap around 
+    first = np.argmin(vacuum)
+    rolled = np.roll(vacuum, -first).astype(int)
+    edges = np.diff(np.concatenate(([0], rolled, [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    longest = np.argmax(ends - starts)
+    start, end = starts[longest], ends[longest]
+    quarter = (end - start) // 4
+
+    return (np.arange(start + quarter, end - quarter) + first) % len(vacuum)
 
 def simple_nn(start, end=None, ox_states=None, nn_method=CrystalNN(), 
-save_csv=True, csv_fname='nn_data.csv'):
+save_csv=True, csv_fname='nn_data.csv', processes=None):
     """
     Finds the nearest neighbours for simple structures. Before using on slabs
-    make sure the nn_method works with the bulk structure. 
+    make sure the nn_method works with the bulk structure. The start and end
+    structures are analysed in parallel. 
+
+    A batch of structures, e.g. every folder of a convergence sweep, can be 
+    analysed at once by supplying a list of (start, end) pairs or of start 
+    structures as ``start``. All of the structures are then analysed in 
+    parallel and returned in one DataFrame, with the start structure's 
+    filename (or its position in the list) in the ``structure`` column.
     
     The ``site_index`` in the produced DataFrame or csv file is one-indexed and 
     represents the atom index in the structure. 
 
     Args:
-        start (`str`): Filename of structure file in any format supported by 
-            pymatgen
+        start (`str` or `list`): Filename of structure file in any format 
+            supported by pymatgen, or a list of them or of (start, end) pairs
         end (`str`, optional): Filename of structure file in any format 
             supported by pymatgen. Use if comparing initial and final structures. 
             The structures must have same constituent atoms and number of sites. 
@@ -336,89 +679,114 @@ save_csv=True, csv_fname='nn_data.csv'):
             needs to be imported from pymatgen.analysis.local_env before it 
             can be instantiated here. Defaults to ``CrystalNN()``.
         save_csv (`bool`, optional): Save to a csv file. Defaults to ``True``.
-        csv_fname (`str`, optional): Filename of the csv file. Defaults to 
-            ``'nn_data.csv'``
+        csv_fname (`str`, optional): Filename of the csv file. Defaults to
+            ``'nn_data.csv'``. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
+        processes (`int`, optional): Number of CPU processes to use, limited 
+            to max-1. Defaults to max-1.
     
     Returns
         None (default) or DataFrame containing coordination data 
     """
-    # Instantiate start structure object
-    start_struc = _instantiate_structure(start)
-
-    # Add atom site labels to the structure
-    els = ''.join([i for i in start_struc.formula if not i.isdigit()]).split(' ')
-    el_dict = {i : 1 for i in els}
-    site_labels = []
-    for site in start_struc:
-        symbol = site.specie.symbol
-        site_labels.append((symbol,el_dict[symbol]))
-        el_dict[symbol] +=1
-    start_struc.add_site_property('', site_labels)
-    
-    # Add oxidation states and get bonded structure
-    start_struc = oxidation_states(start_struc, ox_states)
-    bonded_start = nn_method.get_bonded_structure(start_struc)
-
-    if end: 
-        end_struc = _instantiate_structure(end)
-        end_struc = oxidation_states(end_struc, ox_states)
-        bonded_end = nn_method.get_bonded_structure(end_struc)
-    
-    # Iterate through structure, evaluate the coordination number and the 
-    # nearest neighbours specie for start and end structures, collects the
-    # symbol and index of the site (atom) evaluated and its nearest neighbours 
-    df_list = []
-    for n, site in enumerate(start_struc):
-        cn_start = bonded_start.get_coordination_of_site(n)
-        coord_start = bonded_start.get_connected_sites(n)
-        specie_list = []
-        for d in coord_start: 
-            spc = d.site.specie.symbol 
-            specie_list.append(spc)
-        specie_list.sort()
-        site_nn_start = ' '.join(specie_list)
-        label = site_labels[n]
-
-        if end: 
-            cn_end = bonded_end.get_coordination_of_site(n)
-            coord_end = bonded_end.get_connected_sites(n)
-            specie_list = []
-            for d in coord_end: 
-                spc = d.site.specie.symbol 
-                specie_list.append(spc)
-            specie_list.sort()
-            site_nn_end = ' '.join(specie_list)
-            df_list.append({'site': n+1, 'atom': label, 'cn_start': cn_start,
-            'nn_start': site_nn_start, 'cn_end': cn_end, 'nn_end': site_nn_end})
-
-        else: 
-            df_list.append({'site_index': n+1, 'site': label,
-            'cn_start': cn_start, 'nn_start': site_nn_start})
-
-    # Make a dataframe from df_list 
-    df = pd.DataFrame(df_list)
+    helper = functools.partial(_nn_coordination, nn_method, ox_states)
+    df = _nn_tables(start, end, helper, processes)
 
     # Save the csv file or return as dataframe 
     if save_csv: 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
-        df.to_csv(csv_fname, header=True, index=False)
+        save_df(df, csv_fname)
     else:    
         return df
 
+def _nn_coordination(nn_method, ox_states, structure): 
+    """
+    Helper function that returns the coordination number and the sorted 
+    elements of the nearest neighbours of every site of the structure from 
+    its bonded structure. The neighbours found are also returned with their
+    cache key, so they are cached in the main process when the structure is
+    analysed by another process.
+    """
+    struc = _instantiate_structure(structure)
+    struc = oxidation_states(struc, ox_states)
+    bonded = _bonded_structure(struc, nn_method)
+
+    cn = [bonded.get_coordination_of_site(n) for n in range(len(struc))]
+    nn = [' '.join(sorted(d.site.specie.symbol for d in 
+        bonded.get_connected_sites(n))) for n in range(len(struc))]
+    key = _nn_key(struc, nn_method)
+
+    return cn, nn, (key, _nn_entry(key)['neighbours'])
+
+def _nn_tables(start, end, helper, processes): 
+    """
+    Helper function for simple_nn and complex_nn. Gets the coordination of 
+    the start and end structure, or of all the structures in a batch, with 
+    helper in a pool of processes and returns the DataFrame of coordination
+    data. 
+    """
+    if processes == None or processes > multiprocessing.cpu_count():
+        processes = multiprocessing.cpu_count() - 1
+
+    # A batch is a list of (start, end) pairs or of start structures 
+    batch = type(start) == list
+    if batch: 
+        pairs = [tuple(pair) if type(pair) in (list, tuple) else (pair, None)
+            for pair in start]
+    else: 
+        pairs = [(start, end)]
+    pairs = [(_instantiate_structure(s), e if e else None) for s, e in pairs]
+    tasks = [struc for pair in pairs for struc in pair if struc is not None]
+
+    if processes > 1 and len(tasks) > 1: 
+        with multiprocessing.Pool(min(processes, len(tasks))) as pool: 
+            results = pool.map(helper, tasks)
+        # keep the neighbours found by the other processes 
+        for result in results: 
+            if len(result) > 2: 
+                _nn_entry(result[2][0])['neighbours'].update(result[2][1])
+    else: 
+        results = [helper(struc) for struc in tasks]
+
+    results = iter(results)
+    dfs = []
+    for n, (start_struc, end_struc) in enumerate(pairs): 
+        site_labels = _site_labels([site.specie.symbol for site in start_struc])
+        cn_start, nn_start = next(results)[:2]
+        if end_struc is None and not batch: 
+            df = pd.DataFrame({'site_index': np.arange(1, len(start_struc)+1),
+                'site': site_labels, 'cn_start': cn_start, 
+                'nn_start': nn_start})
+        else: 
+            # a batch uses the same columns for all structures
+            df = pd.DataFrame({'site': np.arange(1, len(start_struc)+1), 
+                'atom': site_labels, 'cn_start': cn_start, 
+                'nn_start': nn_start})
+            if end_struc is not None: 
+                df['cn_end'], df['nn_end'] = next(results)[:2]
+        if batch: 
+            label = start[n][0] if type(start[n]) in (list, tuple) else start[n]
+            df.insert(0, 'structure', label if type(label) == str else n)
+        dfs.append(df)
+
+    return pd.concat(dfs, ignore_index=True)
+
 
 def complex_nn(start,  cut_off_dict, end=None, ox_states=None, 
-save_csv=True, csv_fname='nn_data.csv'):
+save_csv=True, csv_fname='nn_data.csv', processes=None):
     """
-    Finds the nearest neighbours for more complex structures. Uses CutOffDictNN()
-    class as the nearest neighbour method. Check validity on bulk structure
-    before applying to surface slabs. 
+    Finds the nearest neighbours for more complex structures. Uses the cut-off
+    dictionary like the CutOffDictNN() class, but all sites are found at once 
+    in one vectorised neighbour list search. Check validity on bulk structure
+    before applying to surface slabs. The start and end structures are 
+    analysed in parallel. A batch of structures can be analysed at once as 
+    in simple_nn. 
 
     The ``site_index`` in the produced DataFrame or csv file is one-indexed and 
     represents the atom index in the structure. 
 
     Args:
-        start (`str`): filename of structure, takes all pymatgen-supported formats.
+        start (`str` or `list`): filename of structure, takes all 
+            pymatgen-supported formats, or a list of them or of (start, end) 
+            pairs.
         cut_off_dict (`dict`): Dictionary of bond lengths. The bonds should be 
             specified with the oxidation states\n
             e.g. ``{('Bi3+', 'O2-'): 2.46, ('V5+', 'O2-'): 1.73}``
@@ -441,76 +809,180 @@ save_csv=True, csv_fname='nn_data.csv'):
 
             Defaults to ``None`` 
         save_csv (`bool`, optional): Save to a csv file. Defaults to ``True``.
-        csv_fname (`str`, optional): Filename of the csv file. Defaults to 
-            ``'nn_data.csv'``
+        csv_fname (`str`, optional): Filename of the csv file. Defaults to
+            ``'nn_data.csv'``. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
+        processes (`int`, optional): Number of CPU processes to use, limited 
+            to max-1. Defaults to max-1.
     
     Returns
         None (default) or DataFrame containing coordination data.
     """
-    # Instantiate start structure object
-    start_struc = Structure.from_file(start)
-
-    # Add atom site labels to the structure
-    els = ''.join([i for i in start_struc.formula if not i.isdigit()]).split(' ')
-    el_dict = {i : 1 for i in els}
-    site_labels = []
-    for site in start_struc:
-        symbol = site.specie.symbol
-        site_labels.append((symbol,el_dict[symbol]))
-        el_dict[symbol] +=1
-    start_struc.add_site_property('', site_labels)
-
-    # Add oxidation states 
-    start_struc = oxidation_states(start_struc, ox_states=ox_states)
-
-    # Instantiate the nearest neighbour algorithm and get bonded structure
-    codnn = CutOffDictNN(cut_off_dict=cut_off_dict)
-    bonded_start = codnn.get_bonded_structure(start_struc)
-
-    # Instantiate the end structure if provided
-    if end: 
-        end_struc = Structure.from_file(end)
-        end_struc = oxidation_states(end_struc, ox_states=ox_states)
-        bonded_end = codnn.get_bonded_structure(end_struc)
-
-    # Iterate through structure, evaluate the coordination number and the 
-    # nearest neighbours specie for start and end structures, collects the
-    # symbol and index of the site (atom) evaluated and its nearest neighbours 
-    df_list = []
-    for n, site in enumerate(start_struc):
-        cn_start = bonded_start.get_coordination_of_site(n)
-        coord_start = bonded_start.get_connected_sites(n)
-        specie_list = []
-        for d in coord_start: 
-            spc = d.site.specie.symbol 
-            specie_list.append(spc)
-        specie_list.sort()
-        site_nn_start = ' '.join(specie_list)
-        label = site_labels[n]
-
-        if end: 
-            cn_end = bonded_end.get_coordination_of_site(n)
-            coord_end = bonded_end.get_connected_sites(n)
-            specie_list = []
-            for d in coord_end: 
-                spc = d.site.specie.symbol 
-                specie_list.append(spc)
-            specie_list.sort()
-            site_nn_end = ' '.join(specie_list)
-            df_list.append({'site': n+1, 'atom': label, 'cn start': cn_start,
-            'nn_start': site_nn_start, 'cn_end': cn_end, 'nn_end': site_nn_end})
-
-        else: 
-            df_list.append({'site_index': n+1, 'site': label,
-            'cn_start': cn_start, 'nn_start': site_nn_start})
-
-    # Make a dataframe from df_list 
-    df = pd.DataFrame(df_list)
+    helper = functools.partial(_cutoff_coordination, cut_off_dict, ox_states)
+    df = _nn_tables(start, end, helper, processes)
+    # complex_nn has always named the start coordination column 'cn start' 
+    # when comparing to an end structure
+    if 'cn_end' in df.columns: 
+        df = df.rename(columns={'cn_start': 'cn start'})
     
     # Save the csv file or return as dataframe 
     if save_csv: 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
-        df.to_csv(csv_fname, header=True, index=False)
+        save_df(df, csv_fname)
     else:    
         return df
+
+def _cutoff_coordination(cut_off_dict, ox_states, structure): 
+    """
+    Helper function that returns the coordination number and the sorted 
+    elements of the nearest neighbours of every site of the structure, with
+    the bonds of the cut-off dictionary as in CutOffDictNN, from one pass of
+    _pair_distances over all pairs of species
+    """
+    struc = _instantiate_structure(structure)
+    struc = oxidation_states(struc, ox_states=ox_states)
+    species = np.array([site.species_string for site in struc])
+    symbols = np.array([site.specie.symbol for site in struc])
+    centres, points, _ = _pair_distances(struc, cut_off_dict, species)
+
+    # order the neighbours by site and then by element, and split by site
+    cn = np.bincount(centres, minlength=len(struc))
+    nn = symbols[points][np.lexsort((symbols[points], centres))]
+    nn = [' '.join(site_nn) for site_nn in np.split(nn, np.cumsum(cn)[:-1])]
+
+    return cn, nn
+
+def _get_axis(axis):
+    """Helper function to get the index of the axis from its label """
+    if axis in ['a', 'x']:
+        ax = 0
+    elif axis in ['b', 'y']:
+        ax = 1
+    elif axis in ['c', 'z']:
+        ax = 2
+    else:
+        raise ValueError('axis can only be set to a,b,c or x,y,z')
+
+    return ax
+
+def _read_locpot(locpot, ax=2):
+    """
+    Helper function for reading a plain or compressed LOCPOT, returns the
+    planar potential along the axis, the structure and the grid dimensions
+    """
+    if _exists(_find_file(locpot)):
+        return planar_average(_find_file(locpot), axis=ax)
+    else: 
+        raise FileNotFoundError(
+            f"""No LOCPOT(.gz, .xz, .bz2, .zst) found at {locpot}""")
+
+def _read_volumetric(filename, ax=2, reference=None):
+    """
+    Helper function for reading a plain or compressed VASP volumetric data 
+    file, returns the planar average along the axis, of the difference to the
+    reference file if there is one, the structure and the grid dimensions
+    """
+    for f in [filename, reference]: 
+        if f is not None and not _exists(_find_file(f)): 
+            raise FileNotFoundError('No {}(.gz, .xz, .bz2, .zst) found at '
+            '{}'.format(os.path.basename(f), f))
+
+    if reference is None: 
+        return planar_average(_find_file(filename), axis=ax)
+    return planar_difference(_find_file(filename), _find_file(reference), 
+    axis=ax)
+
+def _is_density(filename): 
+    """
+    Helper function that checks if a volumetric data file is a charge 
+    density from its name, i.e. a CHGCAR, CHG, PARCHG or AECCAR
+    """
+    name = os.path.basename(filename).upper()
+    return any(kind in name for kind in ['CHG', 'AECCAR'])
+
+def _potential(planar, struc, ax, ngrid, prim_to_conv=1, lattice_vector=None, 
+double_window=False):
+    """
+    Helper function for calculating the macroscopic potential and gradient
+    from the planar potential. The macroscopic potential is the periodic 
+    window average of the planar potential over one lattice vector, or the 
+    double window average over two lattice vectors which also removes the 
+    oscillations left by a window that does not match the period exactly.
+
+    Args:
+        planar (`numpy array`): Planar potential along the axis.
+        struc (`pymatgen Structure`): Structure the potential belongs to.
+        ax (`int`): Index of the axis along which the potential is evaluated.
+        ngrid (`int`): The number of grid points along the axis.
+        prim_to_conv (`int`, optional): The number of primitive cells in the
+            conventional cell. Defaults to ``1``.
+        lattice_vector (`float` or `list`, optional): Manually set the 
+            periodicity of the slab. Two values e.g. ``[3.9, 4.2]`` give the 
+            double window average over the periodicities of the two materials 
+            at an interface.
+        double_window (`bool`, optional): Average over a second window of 
+            the same lattice vector. Defaults to ``False``.
+
+    Returns:
+        DataFrame with planar, macroscopic and gradient columns
+    """
+    df = pd.DataFrame(data=planar, columns=['planar'])
+
+    # Calculate macroscopic potential
+    if lattice_vector is None:
+        # Calculate lattice vector
+        arr = struc.cart_coords
+        comp, factor = struc.composition.get_reduced_composition_and_factor()
+        # get atom closest to median to avoid edge effects
+        med = np.median(arr[:, ax])
+        diff = np.abs(arr[:, ax] - med)
+        argmin = diff.argmin()
+
+        specie_min = str(struc[argmin].specie)
+        argmax = int(argmin + comp.as_dict()[specie_min] * prim_to_conv)
+        # check the argmax is not greater than the number of atoms
+        if argmax >= len(arr):
+            argmax = int(argmin - comp.as_dict()[specie_min] * prim_to_conv )
+        lattice_vector = abs(arr[:, ax][argmax] - arr[:, ax][argmin])
+
+    lattice_vectors = list(np.atleast_1d(lattice_vector))
+    if double_window and len(lattice_vectors) == 1: 
+        lattice_vectors *= 2
+
+    # Divide lattice parameter by no. of grid points in the direction
+    resolution = struc.lattice.abc[ax]/ngrid
+
+    # Macroscopic potential, the window average over each lattice vector in 
+    # turn, the number of points in the window is rounded down as before
+    macroscopic = np.asarray(planar, dtype=float)
+    for vector in lattice_vectors: 
+        macroscopic = _window_average(macroscopic, int(vector/resolution))
+    df['macroscopic'] = macroscopic
+
+    # Get gradient of the plot - this is used for convergence testing, to make
+    # sure the potential is actually flat
+    df['gradient'] = np.gradient(df['planar'])
+
+    return df
+
+def _window_average(values, points):
+    """
+    Helper function for the centred moving average of periodic data over a 
+    window of ``points`` grid points. The window sums are differences of one 
+    cumulative sum, using the PBC where the end of one unit cell coincides 
+    with the start of the next one, so the data is never padded. The mean is 
+    taken off first so the cumulative sum wraps around to zero, which keeps 
+    it accurate and makes windows wider than the cell work too. A window 
+    shorter than one grid point has no average. 
+    """
+    n = len(values)
+    if points < 1: 
+        return np.full(n, np.nan)
+
+    mean = values.mean()
+    cumulative = np.concatenate(([0.], np.cumsum(values - mean)))
+
+    # Windows are centred the same way as pandas' centred rolling mean
+    start = np.arange(n) - points // 2
+    end = start + points
+
+    return (cumulative[end % n] - cumulative[start % n]) / points + mean
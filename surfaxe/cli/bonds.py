@@ -16,6 +16,17 @@ def _oxstates_to_dict(ox):
     ox_states_dict = dict(zip(keys,values))
     return ox_states_dict
 
+def _cutoff(cutoff): 
+    try: 
+        return float(cutoff)
+    except ValueError: 
+        return cutoff
+
+def _bonds(bond): 
+    if bond is not None and any('-' in b for b in bond): 
+        return [b.split('-') for b in bond]
+    return bond
+
 def _get_parser(): 
     parser = ArgumentParser(
         description="""Parses the structure looking for bonds between atoms. 
@@ -27,14 +38,19 @@ def _get_parser():
     help=('Filename of structure file in any format supported by pymatgen '
           '(default: POSCAR'))
     parser.add_argument('-b', '--bond', default=None, nargs='+', type=str,
-    help='List of elements e.g. Ti O for a Ti-O bond')
+    help=('List of elements e.g. Ti O for a Ti-O bond, or several bonds '
+    'e.g. Ti-O Y-O'))
     parser.add_argument('--oxi-list', default=None, dest='ox_states_list', 
     nargs='+', type=float, 
     help='Add oxidation states to the structure as a list e.g. 3 3 -2 -2 -2')
     parser.add_argument('--oxi-dict', default=None, type=_oxstates_to_dict,
     dest='ox_states_dict', help=('Add oxidation states to the structure as ' 
     'a dictionary e.g. Fe:3,O:-2'))
-    parser.add_argument('--no-csv', default=True, action='store_false', 
+    parser.add_argument('--cutoff', default=None, type=_cutoff, 
+    help=('Find the bonds with a fast cell list search instead of CrystalNN, '
+    'with a maximum bond length in Å or a bulk structure file to take the '
+    'longest bulk bond from e.g. 2.3 or POSCAR_bulk'))
+    parser.add_argument('--no-csv', default=True, action='store_false',  
     dest='save_csv', help='Prints data to terminal' )
     parser.add_argument('--csv-fname', default='bond_analysis.csv', 
     dest='csv_fname', help='Filename of the csv file (default: bond_analysis.csv)')
@@ -80,9 +96,10 @@ def main():
             ox_states=None 
         
 
-        ba = bond_analysis(args.structure, args.bond, nn_method=CrystalNN(),
-        ox_states=ox_states, save_csv=args.save_csv, csv_fname=args.csv_fname, 
-        save_plt=args.save_plt, plt_fname=args.plt_fname, dpi=args.dpi, 
+        ba = bond_analysis(args.structure, _bonds(args.bond), 
+        nn_method=CrystalNN(), ox_states=ox_states, save_csv=args.save_csv, 
+        csv_fname=args.csv_fname, save_plt=args.save_plt, 
+        plt_fname=args.plt_fname, cutoff=args.cutoff, dpi=args.dpi, 
         color=args.color, width=args.width, height=args.height, 
         marker=args.marker, markersize=args.markersize)
         
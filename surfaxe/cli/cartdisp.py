@@ -17,6 +17,9 @@ def _get_parser():
     parser.add_argument('-e', '--end', default='CONTCAR',
     help=('Filename of structure file in any format supported by pymatgen. '
     '(default: CONTCAR)'))
+    parser.add_argument('-t', '--trajectory', default=None, type=str,
+    help=('Filename of an XDATCAR to take the total displacements from '
+    'instead of start and end structures'))
     parser.add_argument('--max-disp', type=float, default=0.1, dest='max_disp', 
     help='The maximum displacement shown (default: 0.1)')
     parser.add_argument('--no-txt', default=True, action='store_false', 
@@ -43,10 +46,15 @@ def main():
             print(cd)
  
     else: 
-        cd = cart_displacements(args.start, args.end, max_disp=args.max_disp, 
-        save_txt=args.save_txt, txt_fname=args.txt_fname)
+        if args.trajectory is not None: 
+            cd = cart_displacements(args.trajectory, max_disp=args.max_disp, 
+            save_txt=args.save_txt, txt_fname=args.txt_fname)
+        else: 
+            cd = cart_displacements(args.start, args.end, 
+            max_disp=args.max_disp, save_txt=args.save_txt, 
+            txt_fname=args.txt_fname)
         
-        if args.save_txt: 
+        if not args.save_txt: 
             print(cd)
 
 if __name__ == "__main__":
@@ -5,7 +5,7 @@ import os
 from ruamel.yaml.main import YAML
 
 # Surfaxe 
-from surfaxe.convergence import parse_energies
+from surfaxe.convergence import parse_energies, watch_energies
 
 def _get_parser(): 
     parser = ArgumentParser(
@@ -17,12 +17,15 @@ def _get_parser():
         By default convergence plots are turned off - they can be customised by 
         using surfaxe-plot-enatom and surfaxe-plot-surfen"""
     )
-    parser.add_argument('--hkl', help='Miller index e.g. 0,0,-1')
+    parser.add_argument('--hkl', nargs='+', help=('Miller index e.g. 0,0,-1, '
+    'several Miller indices e.g. 0,0,1 1,1,0 or all to parse every Miller '
+    'index folder found'))
     parser.add_argument('-b', '--bulk-energy', type=float,
     dest='bulk_per_atom', help=('Bulk energy per atom from a converged bulk ' 
     'calculation in eV per atom'))
     parser.add_argument('-p', '--path', default=None, type=str, 
-    help='Relative path to the convergence folders (default: cwd)')
+    help=('Relative path to the convergence folders or a tar archive of '
+    'them (default: cwd)'))
     parser.add_argument('--remove-energy', default=False, action='store_true', 
     dest='remove', help=('Remove the first data point in calculation of '
     'Fiorentini-Metfessel and Boettger surface energy (default: False)'))
@@ -40,12 +43,25 @@ def _get_parser():
     dest='plt_surfen', 
     help='Plot basic surface energy vs slab thickness figure (default: False)')
     parser.add_argument('--csv-fname', default=None, type=str,
-    dest='csv_fname', help='Filename of the csv file (default: hkl_data.csv)')
+    dest='csv_fname', help=('Filename of the csv file, a .parquet, .feather or '
+    '.npz extension saves in that format (default: hkl_data.csv)'))
     parser.add_argument('-v', '--verbose', default=False, action='store_true', 
     help=('Whether or not to print extra info about the folders being parsed.'
     ' (default: False)'))
-    parser.add_argument('--processes', default=None,
+    parser.add_argument('--processes', default=None, type=int,
     help='CPU processes to use in multiprocessing, default is max-1')
+    parser.add_argument('--db', default=None, type=str, dest='db_fname', 
+    help=('SQLite results store the data is also saved to, one store can '
+    'hold many materials (default: None)'))
+    parser.add_argument('--material', default=None, type=str, 
+    help=('Name of the material in the results store (default: the folder '
+    'the Miller index folder is in)'))
+    parser.add_argument('--watch', default=False, action='store_true', 
+    help=('Keep watching the convergence folders and parse each one as soon '
+    'as its vasprun.xml is complete, updating the csv file and the surface '
+    'energy plots of the affected terminations (default: False)'))
+    parser.add_argument('--interval', default=60, type=float, 
+    help='Time between checks of the folders in watch mode in s (default: 60)')
     parser.add_argument('--yaml', default=None, type=str,
     help=('Read all args from a yaml config file. Completely overrides any '
     'other flags set '))
@@ -66,17 +82,36 @@ def main():
         if not args.hkl or not args.bulk_per_atom: 
             raise ValueError('hkl or bulk energy per atom were not supplied')
 
-        hkl = tuple(map(int, args.hkl.strip('[]()').split(',')))
+        if args.hkl == ['all']: 
+            hkl = 'all'
+        else: 
+            hkl = [tuple(map(int, h.strip('[]()').split(','))) 
+            for h in args.hkl]
+            hkl = hkl[0] if len(hkl) == 1 else hkl
         
         path = os.getcwd()
         if args.path is not None: 
             path = args.path
 
-        parse_energies(hkl, args.bulk_per_atom, path_to_fols=path, 
-        parse_core_energy=args.parse_core, core_atom=args.core, bulk_nn=args.nn, 
-        parse_vacuum=args.parse_vacuum,plt_surfen=args.plt_surfen, save_csv=True, 
-        csv_fname=args.csv_fname, verbose=args.verbose, 
-        remove_first_energy=args.remove, processes=args.processes)
+        if args.watch: 
+            try: 
+                watch_energies(hkl, args.bulk_per_atom, path_to_fols=path, 
+                interval=args.interval, parse_core_energy=args.parse_core, 
+                core_atom=args.core, bulk_nn=args.nn, 
+                parse_vacuum=args.parse_vacuum, plt_surfen=args.plt_surfen, 
+                csv_fname=args.csv_fname, verbose=args.verbose, 
+                remove_first_energy=args.remove, processes=args.processes, 
+                db_fname=args.db_fname, material=args.material)
+            except KeyboardInterrupt:  
+                pass
+        else: 
+            parse_energies(hkl, args.bulk_per_atom, path_to_fols=path, 
+            parse_core_energy=args.parse_core, core_atom=args.core, 
+            bulk_nn=args.nn, parse_vacuum=args.parse_vacuum,
+            plt_surfen=args.plt_surfen, save_csv=True, 
+            csv_fname=args.csv_fname, verbose=args.verbose, 
+            remove_first_energy=args.remove, processes=args.processes, 
+            db_fname=args.db_fname, material=args.material)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
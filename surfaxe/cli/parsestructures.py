@@ -21,13 +21,16 @@ def _get_parser():
     parser.add_argument('-b', '--bond', default=None, nargs='+', type=str,
     help='List of elements e.g. Ti O for a Ti-O bond')
     parser.add_argument('-p', '--path', default=None, type=str, 
-    help='Relative path to the convergence folders (default: cwd)')
+    help=('Relative path to the convergence folders or a tar archive of '
+    'them (default: cwd)'))
     parser.add_argument('--json-fname', default=None, type=str,
     dest='json_fname', help=('Filename of the json file (default: '
     'formula_parsed_metadata.json)'))
     parser.add_argument('-v', '--verbose', default=False, action='store_true', 
     help=('Whether or not to print extra info about the folders being parsed.'
     ' (default: False)'))
+    parser.add_argument('--processes', default=None, type=int,
+    help='CPU processes to use in multiprocessing, default is max-1')
     parser.add_argument('--yaml', default=None, type=str,
     help=('Read all args from a yaml config file. Completely overrides any '
     'other flags set '))
@@ -54,11 +57,9 @@ def main():
         if args.path is not None: 
             path = args.path
 
-        parse_structures(hkl, args.bulk_per_atom, path_to_fols=path, 
-        parse_core_energy=args.parse_core, core_atom=args.core, bulk_nn=args.nn, 
-        parse_vacuum=args.parse_vacuum, plt_enatom=args.plt_enatom, 
-        plt_surfen=args.plt_surfen, csv_fname=args.json_fname, 
-        verbose=args.verbose)
+        parse_structures(hkl, structure_file=args.structure or 'CONTCAR', 
+        bond=args.bond, path_to_fols=path, json_fname=args.json_fname, 
+        processes=args.processes)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,13 +5,19 @@ from ruamel.yaml import YAML
 # Surfaxe 
 from surfaxe.io import plot_bond_analysis
 
+def _bonds(bond): 
+    if bond is not None and any('-' in b for b in bond): 
+        return [b.split('-') for b in bond]
+    return bond
+
 def _get_parser(): 
     parser = ArgumentParser(
         description="""Plots the bond distance with respect to fractional 
         coordinate. Used in conjunction with surfaxe.analysis.bond_analysis."""
     )
     parser.add_argument('-b', '--bond', default=None, nargs='+', type=str,
-    help='List of elements e.g. Ti O for a Ti-O bond')
+    help=('List of elements e.g. Ti O for a Ti-O bond, or several bonds '
+    'e.g. Ti-O Y-O'))
     parser.add_argument('-f', '--filename', default='bond_analysis.csv',
     help='Path to the csv file from bond analysis (default: bond_analysis.csv)')
     parser.add_argument('--plt-fname', default='bond_analysis.png', type=str,
@@ -44,8 +50,8 @@ def main():
         plot_bond_analysis(**yaml_args)
 
     else: 
-        plot_bond_analysis(args.bond, filename=args.filename, color=args.color, 
-        dpi=args.dpi, width=args.width, height=args.height, 
+        plot_bond_analysis(_bonds(args.bond), filename=args.filename, 
+        color=args.color, dpi=args.dpi, width=args.width, height=args.height, 
         plt_fname=args.plt_fname, marker=args.marker, markersize=args.markersize)
 
 if __name__ == "__main__":
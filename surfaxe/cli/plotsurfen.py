@@ -1,17 +1,17 @@
 # Misc 
 from argparse import ArgumentParser
-import pandas as pd
 from ruamel.yaml.main import YAML
 
 # Surfaxe 
-from surfaxe.io import plot_surfen
+from surfaxe.io import plot_surfen, load_df
 
 def _get_parser(): 
     parser = ArgumentParser(
         description="""Plots the surface energy for all terminations."""
     )
     parser.add_argument('-f', '--filename', 
-    help='Path to the csv file from parsefols with data')
+    help=('Path to the csv, Parquet, Feather or npz file from parsefols with '
+    'data'))
     parser.add_argument('--plt-fname', default='surface_energy.png', type=str,
     dest='plt_fname', help='Filename of the plot (default: surface_energy.png)')
     parser.add_argument('--dpi', default=300, type=int, 
@@ -38,11 +38,11 @@ def main():
             yaml = YAML(typ='safe', pure=True)
             yaml_args = yaml.load(y)
         
-        df = pd.read_csv(yaml_args['filename'])
+        df = load_df(yaml_args['filename'])
         plot_surfen(df=df, **yaml_args)
     
     else: 
-        df = pd.read_csv(args.filename)
+        df = load_df(args.filename)
         plot_surfen(df, colors=args.colors, dpi=args.dpi, width=args.width, 
         height=args.height,  plt_fname=args.plt_fname)
 
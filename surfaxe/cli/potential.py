@@ -23,7 +23,12 @@ def _get_parser():
     parser.add_argument('--no-plot', default=True, action='store_false', 
     dest='save_plt', help='Turns off plotting')
     parser.add_argument('-v', '--lattice-vector', type=float, default=None,
-    dest='lattice_vector', help='Manually set the periodicity of the slab')
+    nargs='+', dest='lattice_vector', help=('Manually set the periodicity of '
+    'the slab, two values e.g. 3.9 4.2 average over both periodicities at an '
+    'interface'))
+    parser.add_argument('--double-window', default=False, action='store_true',
+    dest='double_window', help=('Average the macroscopic potential over two '
+    'windows of the lattice vector'))
     parser.add_argument('--plt-fname', default='potential.png', type=str,
     dest='plt_fname', help='Filename of the plot (default: potential.png)')
     parser.add_argument('--dpi', default=300, type=int, 
@@ -54,7 +59,8 @@ def main():
         
     else: 
         electrostatic_potential(locpot=args.locpot, prim_to_conv=args.prim_to_conv,
-        lattice_vector=args.lattice_vector, axis=args.axis,
+        lattice_vector=args.lattice_vector, axis=args.axis, 
+        double_window=args.double_window,
         save_csv=True, csv_fname=args.csv_fname, 
         save_plt=args.save_plt, plt_fname=args.plt_fname, dpi=args.dpi, 
         colors=args.colors, width=args.width, height=args.height)
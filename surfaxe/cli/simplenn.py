@@ -23,12 +23,13 @@ def _get_parser():
         structure."""
     )
     
-    parser.add_argument('-s', '--start', default='POSCAR',
-    help=('Filename of structure file in any format supported by pymatgen '
-          '(default: POSCAR'))
-    parser.add_argument('-e', '--end', default=None,
+    parser.add_argument('-s', '--start', default=['POSCAR'], nargs='+',
+    help=('Filename of structure file in any format supported by pymatgen, '
+          'several are analysed as a batch (default: POSCAR'))
+    parser.add_argument('-e', '--end', default=None, nargs='+',
     help=('Filename of structure file in any format supported by pymatgen. ' 
-          'Use if comparing initial and final structures.'))
+          'Use if comparing initial and final structures, one for each start '
+          'structure.'))
     parser.add_argument('--oxi-list', default=None, dest='ox_states_list', 
     nargs='+', type=float, 
     help='Add oxidation states to the structure as a list e.g. 3 3 -2 -2 -2')
@@ -39,14 +40,17 @@ def _get_parser():
     dest='save_csv', help='Prints data to terminal' )
     parser.add_argument('--csv-fname', default='nn_data.csv',
     dest='csv_fname', help='Filename of the csv file (default: nn_data.csv)')
-    parser.add_argument('--yaml', default=None, type=str, 
+    parser.add_argument('--processes', default=None, type=int,
+    help='CPU processes to use in multiprocessing, default is max-1')
+    parser.add_argument('--yaml', default=None, type=str,  
     help=('Read all args from a yaml config file. Completely overrides any '
     'other flags set '))
     
     return parser 
 
 def main(): 
-    args = _get_parser().parse_args()
+    parser = _get_parser()
+    args = parser.parse_args()
 
     if args.yaml is not None: 
         with open(args.yaml, 'r') as y:
@@ -65,8 +69,21 @@ def main():
         else: 
             ox_states=None
 
-        nn = simple_nn(args.start, end=args.end, ox_states=ox_states, 
-        nn_method=CrystalNN(), save_csv=args.save_csv, csv_fname=args.csv_fname)
+        if args.end and len(args.end) != len(args.start): 
+            parser.error('--end needs one structure for each --start '
+            'structure, got {} start and {} end'.format(len(args.start), 
+            len(args.end)))
+
+        # several start structures are a batch of (start, end) pairs 
+        if len(args.start) > 1: 
+            start = list(zip(args.start, args.end)) if args.end else args.start
+            end = None
+        else: 
+            start, end = args.start[0], args.end[0] if args.end else None
+
+        nn = simple_nn(start, end=end, ox_states=ox_states, 
+        nn_method=CrystalNN(), save_csv=args.save_csv, csv_fname=args.csv_fname,
+        processes=args.processes)
     
         if args.save_csv==False: 
             print(nn)
@@ -1,21 +1,37 @@
 from ruamel.yaml.main import YAML
 from argparse import ArgumentParser
+import glob
 # Surfaxe 
-from surfaxe.analysis import surface_dipole 
+from surfaxe.analysis import surface_dipole, potential_summary 
 
 def _get_parser(): 
     parser = ArgumentParser(
         description="""Calculates the surface dipole moment of a slab for band alignments"""
     )
 
-    parser.add_argument('-f', '--filename', type=str, default='LOCPOT', 
-    help='The path to the LOCPOT or parsed csv file (default: ./LOCPOT)')
+    parser.add_argument('-f', '--filename', type=str, default=['LOCPOT'], 
+    nargs='+', help=('The path to the LOCPOT or parsed csv file, several '
+    'LOCPOTs or a glob e.g. "*/LOCPOT" give a table of the vacuum level, '
+    'surface dipole, bulk-like potential and vacuum gradient of each '
+    '(default: ./LOCPOT)'))
     parser.add_argument('-p', '--prim-to-conv', type=int, default=1, dest='prim_to_conv',
     help='The number of primitive cells in the conventional cell (default: 1)')
     parser.add_argument('-a', '--axis', type=str, default='c',
     dest='axis', help='Axis of interest; takes abc or xyz (default: c)')
     parser.add_argument('-v', '--lattice-vector', type=float, default=None,
-    dest='lattice_vector', help='Manually set the periodicity of the slab')
+    nargs='+', dest='lattice_vector', help=('Manually set the periodicity of '
+    'the slab, two values e.g. 3.9 4.2 average over both periodicities at an '
+    'interface'))
+    parser.add_argument('--double-window', default=False, action='store_true',
+    dest='double_window', help=('Average the macroscopic potential over two '
+    'windows of the lattice vector'))
+    parser.add_argument('--processes', default=None, type=int,
+    help='CPU processes to use in multiprocessing, default is max-1')
+    parser.add_argument('--no-csv', default=True, action='store_false', 
+    dest='save_csv', help='Prints the table of several LOCPOTs to terminal')
+    parser.add_argument('--csv-fname', default='potential_summary.csv', 
+    type=str, dest='csv_fname', help=('Filename of the csv file of several '
+    'LOCPOTs (default: potential_summary.csv)'))
     parser.add_argument('--yaml', default=None, type=str,
     help=('Read all args from a yaml config file. Completely overrides any '
     'other flags set '))
@@ -33,9 +49,19 @@ def main():
         ep = surface_dipole(**yaml_args)
         print(ep)
         
+    elif len(args.filename) > 1 or glob.has_magic(args.filename[0]): 
+        ps = potential_summary(args.filename, processes=args.processes, 
+        save_csv=args.save_csv, csv_fname=args.csv_fname, 
+        prim_to_conv=args.prim_to_conv, lattice_vector=args.lattice_vector, 
+        axis=args.axis, double_window=args.double_window)
+        if not args.save_csv: 
+            print(ps)
+
     else: 
-        ep = surface_dipole(filename=args.filename, prim_to_conv=args.prim_to_conv, lattice_vector=args.lattice_vector, axis=args.axis,
-        save_csv=False, save_plt=False, )
+        ep = surface_dipole(filename=args.filename[0], 
+        prim_to_conv=args.prim_to_conv, lattice_vector=args.lattice_vector, 
+        axis=args.axis, double_window=args.double_window, save_csv=False, 
+        save_plt=False)
         print(ep)
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+# Misc 
+from argparse import ArgumentParser
+
+from ruamel.yaml.main import YAML
+
+# Surfaxe 
+from surfaxe.analysis import volumetric_average 
+
+def _get_parser(): 
+    parser = ArgumentParser(
+        description="""Reads any VASP volumetric data file e.g. CHGCAR, PARCHG 
+        or LOCPOT to get the planar and macroscopic average in specified 
+        direction"""
+    )
+
+    parser.add_argument('-f', '--filename', type=str, default='CHGCAR', 
+    help='The path to the volumetric data file (default: ./CHGCAR)')
+    parser.add_argument('-r', '--reference', type=str, default=None, 
+    help=('The path to a volumetric data file on the same grid that is '
+    'subtracted e.g. a bulk-like CHGCAR in the slab cell'))
+    parser.add_argument('-p', '--prim-to-conv', type=int, default=1, dest='prim_to_conv',
+    help='The number of primitive cells in the conventional cell (default: 1)')
+    parser.add_argument('-a', '--axis', type=str, default='c',
+    dest='axis', help='Axis of interest; takes abc or xyz (default: c)')
+    parser.add_argument('--density', default=None, action='store_true', 
+    help=('Divide the data by the volume as for a charge density, used by '
+    'default for CHGCAR, CHG, PARCHG and AECCAR files'))
+    parser.add_argument('--no-density', action='store_false', dest='density',
+    help='Do not divide the data by the volume')
+    parser.add_argument('--csv-fname', default='volumetric.csv', type=str,
+    dest='csv_fname', help='Filename of the csv file (default: volumetric.csv)')
+    parser.add_argument('--no-plot', default=True, action='store_false', 
+    dest='save_plt', help='Turns off plotting')
+    parser.add_argument('-v', '--lattice-vector', type=float, default=None,
+    nargs='+', dest='lattice_vector', help=('Manually set the periodicity of '
+    'the slab, two values e.g. 3.9 4.2 average over both periodicities at an '
+    'interface'))
+    parser.add_argument('--double-window', default=False, action='store_true',
+    dest='double_window', help=('Average over two windows of the lattice '
+    'vector'))
+    parser.add_argument('--plt-fname', default='volumetric.png', type=str,
+    dest='plt_fname', help='Filename of the plot (default: volumetric.png)')
+    parser.add_argument('--dpi', default=300, type=int, 
+    help='Dots per inch (default: 300)')
+    parser.add_argument('-c', '--colors', default=None, nargs='+', type=str, 
+    help=('Colors for planar and macroscopic average plots in any format '
+    'supported by mpl e.g. r "#eeefff"; need to supply two valid values where ' 
+    'hex colours starting with # need to be surrounded with quotation marks'))
+    parser.add_argument('--width', default=6, type=float, 
+    help='Width of the figure in inches (default: 6)')
+    parser.add_argument('--height', default=5, type=float, 
+    help='Height of the figure in inches (default: 5)')
+    parser.add_argument('--yaml', default=None, type=str,
+    help=('Read all args from a yaml config file. Completely overrides any '
+    'other flags set '))
+
+    return parser
+
+def main(): 
+    args = _get_parser().parse_args()
+
+    if args.yaml is not None: 
+        with open(args.yaml, 'r') as y:
+            yaml = YAML(typ='safe', pure=True)
+            yaml_args = yaml.load(y)
+
+        volumetric_average(**yaml_args)
+        
+    else: 
+        volumetric_average(filename=args.filename, reference=args.reference,
+        prim_to_conv=args.prim_to_conv, axis=args.axis, density=args.density,
+        lattice_vector=args.lattice_vector, double_window=args.double_window,
+        save_csv=True, csv_fname=args.csv_fname, 
+        save_plt=args.save_plt, plt_fname=args.plt_fname, dpi=args.dpi, 
+        colors=args.colors, width=args.width, height=args.height)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # Pymatgen
-from pymatgen.io.vasp.outputs import Vasprun, Outcar
+from pymatgen.io.vasp.outputs import Vasprun, Outcar, Oszicar
 from pymatgen.analysis.local_env import CrystalNN
 from pymatgen.core.structure import Structure
 from pymatgen.core.periodic_table import Element
@@ -10,16 +10,22 @@ import pandas as pd
 import numpy as np
 import warnings
 import functools
-import itertools
 import multiprocessing
-import copy
-from sklearn.linear_model import LinearRegression
 import json
+import re
+import time
+import traceback
+import builtins
+from xml.etree.ElementTree import ParseError
 
 # surfaxe
-from surfaxe.io import plot_surfen, slab_from_file, _custom_formatwarning
-from surfaxe.vasp_data import vacuum, core_energy
-from surfaxe.analysis import bond_analysis, electrostatic_potential
+from surfaxe.io import plot_surfen, slab_from_file, _custom_formatwarning, \
+save_df, load_df, _instantiate_structure, _find_file, _local_file, \
+_compression, _walk, _archive_order, save_db, _exists, _in_archive, \
+_read_partial_vasprun, _bonded_structure
+from surfaxe.vasp_data import potential_analysis, core_energy
+from surfaxe.analysis import _bond_tables
+from surfaxe.generation import oxidation_states
 
 # todo: 
 # - add a script that takes json from here and generate and does cart disp 
@@ -29,23 +35,34 @@ from surfaxe.analysis import bond_analysis, electrostatic_potential
 def parse_energies(hkl, bulk_per_atom, path_to_fols=None, parse_core_energy=False,
 core_atom=None, bulk_nn=None, parse_vacuum=False, remove_first_energy=False,
 plt_surfen=True, plt_surfen_fname='surface_energy.png', save_csv=True,
-csv_fname=None, verbose=False, processes=None, **kwargs):
+csv_fname=None, verbose=False, processes=None, db_fname=None, material=None,
+**kwargs):
     """
     Parses the convergence folders to get the surface energy, total energy,
     energy per atom, band gap and time taken for each slab and vacuum thickness
     combination. Calculates surface energies using Fiorentini-Methfessel and 
     Boettger methods. It can optionally parse vacuum and core level energies.
 
-    ``path_to_fols`` specifies the parent directory containing subdirectories 
-    that must include the miller index specified. e.g. if ``hkl=(0,0,1)`` there 
-    must be a ``001/`` subdirectory present somewhere on the path. Each 
-    directory within the subdirectory must contain a vasprun.xml and OUTCAR file.  
+    ``path_to_fols`` specifies the parent directory containing subdirectories
+    that must include the miller index specified. e.g. if ``hkl=(0,0,1)`` there
+    must be a ``001/`` subdirectory present somewhere on the path. Each
+    directory within the subdirectory must contain a vasprun.xml and OUTCAR file.
+
+    Several Miller indices can be parsed in one pass by supplying a list of
+    tuples, or ``hkl='all'`` to parse every Miller index subdirectory (e.g.
+    ``001/``, ``1-10/``) found on the path. All folders are parsed on the same
+    pool of processes and returned in one DataFrame with the Miller index in
+    the ``hkl_string`` and ``hkl_tuple`` columns.
 
     Args:
-        hkl (`tuple`): Miller index of the slab.
+        hkl (`tuple`, `list` or `str`): Miller index of the slab, a list of
+            Miller indices or ``'all'``.
         bulk_per_atom (`float`): Bulk energy per atom from a converged 
             bulk calculation in eV per atom.
-        path_to_fols (`str`, optional): Path to the convergence folders. 
+        path_to_fols (`str`, optional): Path to the convergence folders or a
+            tar archive (e.g. .tar.gz) of them. The folders in an archive are
+            found from its member index and each folder only reads its own
+            files from the archive, so it does not need to be unpacked.
             Defaults to None which is cwd
         parse_core_energy (`bool`, optional): If ``True`` the script attempts to 
             parse core energies from a supplied OUTCAR. Defaults to ``False``. 
@@ -63,13 +80,39 @@ csv_fname=None, verbose=False, processes=None, **kwargs):
         plt_surfen (`bool`, optional): Plots the surface energy. Defaults to 
             ``True``.
         plt_surfen_fname (`str`, optional): The name of the surface energy plot.
-            Defaults to ``surface_energy.png``
+            Defaults to ``surface_energy.png``. If more than one Miller index
+            was parsed, each one is plotted to ``hkl_surface_energy.png``.
         save_csv (`bool`, optional): Saves the csv. Defaults to ``True``.
         csv_fname (`str`, optional): Name of the csv file to save. Defaults to
-            hkl_data.csv, where hkl are the miller indices.
+            hkl_data.csv, where hkl are the miller indices, which is one file
+            per Miller index if more than one was parsed. If it is set, all
+            data is saved to the one file. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
         verbose (`bool`, optional): Whether or not to print extra info about the
             folders being parsed. Defaults to ``False``. 
         processes (`int`, optional): Number of CPU processes to use, limited to max-1. Defaults to max-1.
+        db_fname (`str`, optional): SQLite results store the data is also
+            upserted into, see ``surfaxe.io.save_db`` and
+            ``surfaxe.io.query_db``. Defaults to ``None``, no store.
+        material (`str`, optional): Name of the material in the results
+            store. Defaults to ``None``, which is the name of the folder the
+            Miller index folder is in, e.g. the formula folder made by
+            ``surfaxe.generation.generate_slabs``.
+
+    Calculations that were killed or are still running, i.e. with a missing, 
+    truncated or unfinished vasprun.xml, are parsed from their last completed 
+    ionic step instead: the energy from the OSZICAR and the structure from the 
+    CONTCAR (or POSCAR), or both from the last complete ionic step of the 
+    truncated vasprun.xml. These rows are marked in an ``incomplete`` column, 
+    which is only added if there are any, and have no band gap, time, vacuum 
+    or core energy.
+
+    Folders that cannot be parsed (e.g. a missing vasprun.xml and OSZICAR or 
+    a missing OUTCAR) do not stop the others from being parsed. They are reported in a 
+    warning and kept in an errors DataFrame with the path, thicknesses, index 
+    and the reason and traceback, which is available as ``df.attrs['errors']`` 
+    and saved to ``hkl_data_errors.csv`` when ``save_csv=True``. If no folder 
+    can be parsed the error of the first folder is raised with its traceback.  
 
     Returns:
         DataFrame 
@@ -77,41 +120,18 @@ csv_fname=None, verbose=False, processes=None, **kwargs):
     if processes == None or processes > multiprocessing.cpu_count():
         processes = multiprocessing.cpu_count() - 1
 
-    # Update kwargs for core energy 
-    get_core_energy_kwargs = {'orbital': '1s', 'ox_states': None, 
-    'nn_method': CrystalNN()}
-    get_core_energy_kwargs.update(
-        (k, kwargs[k]) for k in get_core_energy_kwargs.keys() & kwargs.keys()
-    )
-    get_core = False
-    if parse_core_energy: 
-        if core_atom is not None and bulk_nn is not None:
-            get_core = True 
-        else: 
-            warnings.formatwarning = _custom_formatwarning
-            warnings.warn(('Core atom or bulk nearest neighbours were not '
-            'supplied. Core energy will not be parsed.'))
+    helper = _energy_helper(parse_vacuum, parse_core_energy, core_atom, bulk_nn,
+    **kwargs)
 
     # Set directory 
     cwd = os.getcwd() if path_to_fols is None else path_to_fols
 
-    # Get all paths to slab_vac_index folders
-    list_of_paths=[]
-    for root, fols, files in os.walk(cwd):
-        for fol in fols:
-            # Perform a loose check that we are looking in the right place, 
-            # also avoid .ipynb_checkpoint files 
-            if ''.join(map(str,hkl)) in root.split('/') and '.' not in fol:
-                if len(fol.split('_')) == 3:
-                    list_of_paths.append([
-                        os.path.join(root, fol),
-                        fol.split('_')[0], 
-                        fol.split('_')[1], 
-                        fol.split('_')[2]
-                    ])
-                    if verbose:
-                        print(root, fol)
-    
+    # Get all paths to slab_vac_index folders of all Miller indices
+    list_of_paths = _find_fols(hkl, cwd, verbose=verbose)
+    if not list_of_paths:
+        raise FileNotFoundError(('No slab_vac_index folders for {} found in '
+        '{}').format(hkl, cwd))
+
     if len(list_of_paths) > 20 and parse_core_energy:
         warnings.formatwarning = _custom_formatwarning
         warnings.warn(('Determining core energies for {} slabs may be slow. ' 
@@ -119,211 +139,338 @@ csv_fname=None, verbose=False, processes=None, **kwargs):
                                        processes))
 
 
-    # Check if multiple cores are available, iterate through paths to folders 
-    # and parse folders
-    if processes > 1 :
-        with multiprocessing.Pool(processes) as pool:
-            mp_list = pool.starmap(
-                functools.partial(_mp_helper_energy, parse_vacuum, 
-                get_core, hkl, core_atom=core_atom, bulk_nn=bulk_nn, 
-                **get_core_energy_kwargs), list_of_paths)
-
-        # len(mp_list) == len(list_of_paths), mp_list[0][0] the is main data
-        # collected for the dataframe, mp_list[0][1] are the potentials, 
-        # mp_list[0][2] are the core energies
-        df_list = list(itertools.chain.from_iterable([i[0] for i in mp_list]))
-        electrostatic_list = list(itertools.chain.from_iterable(
-            [i[1] for i in mp_list]))
-        core_energy_list = list(itertools.chain.from_iterable(
-            [i[2] for i in mp_list]))
-        gradient_list = list(itertools.chain.from_iterable(
-            [i[3] for i in mp_list]))
-    
-    else:
-        df_list, electrostatic_list, core_energy_list, gradient_list = ([] for i in range(4))
-        for path, slab_thickness, vac_thickness, slab_index in list_of_paths: 
-            vsp_path = '{}/vasprun.xml'.format(path)
-            otc_path = '{}/OUTCAR'.format(path)
-
-            # instantiate structure, slab, vasprun and outcar objects
-            if os.path.exists(vsp_path):
-                vsp = Vasprun(vsp_path, parse_potcar_file=False)
-            else:  # should give error if neither vasprun.xml(.gz) able to be parsed
-                vsp = Vasprun(vsp_path + '.gz', parse_potcar_file=False)
-            if os.path.exists(otc_path):
-                otc = Outcar(otc_path)
-            else:  # should give error if neither OUTCAR(.gz) able to be parsed
-                otc = Outcar(otc_path + '.gz')
-
-            slab = slab_from_file(vsp.final_structure, hkl)
-            vsp_dict = vsp.as_dict()
-
-            # extract the time data
-            otc_times = otc.run_stats
-
-            df_list.append(
-                {'hkl_string': ''.join(map(str, hkl)), 
-                'hkl_tuple': hkl, 
-                'slab_thickness': slab_thickness,
-                'vac_thickness': vac_thickness,
-                'slab_index': slab_index,
-                'atoms': vsp_dict['nsites'], 
-                'area': slab.surface_area, 
-                'bandgap': vsp_dict['output']['bandgap'],
-                'slab_energy': vsp_dict['output']['final_energy'],
-                'slab_per_atom': vsp_dict['output']['final_energy_per_atom'],
-                'time_taken': otc_times['Elapsed time (sec)']})
-
-            if parse_vacuum: 
-                # get value of potential in vacuum
-                electrostatic_list.append(vacuum(path))
-
-                lpt = '{}/LOCPOT'.format(path) 
-                p = electrostatic_potential(lpt, save_plt=False, save_csv=False)
-                # gradient in eV 
-                g = p['gradient'].to_numpy()
-                ratio = int(vac_thickness)/(int(vac_thickness)+int(slab_thickness))
-                # check if slab is centred so can get the gradient
-                if 0.45 < slab.center_of_mass[2] < 0.55:
-                    # divide by 2 bc two regions, 0.75 is a scaling factor that 
-                    # should hopefully work to avoid any charge from dangling 
-                    # bonds? 
-                    # mean is in meV 
-                    a = int(len(g)*ratio/2*0.75)
-                    gradient_list.append(np.mean(g[:a]) * 1000) 
-
-                else: 
-                    a = int(len(g)*ratio*0.75)
-                    # if atoms are more towards the end of the slab, the start 
-                    # should be vacuum
-                    if slab.center_of_mass[2] > 0.5: 
-                        gradient_list.append(np.mean(g[:a]) * 1000)  # meV 
-                    # and then if atoms are at the start, the vacuum is at
-                    # the end
-                    else: 
-                        gradient_list.append(np.mean(g[(len(g)-a):]) * 1000) 
-
-            if get_core: 
-                core_energy_list.append(
-                    core_energy(core_atom, bulk_nn, outcar=otc_path, 
-                    structure=slab, **get_core_energy_kwargs)
-                    ) 
+    mp_list = _run_tasks(helper, list_of_paths, processes)
+
+    df_list = [data for n, data, error in mp_list if error is None]
+    errors = [error for n, data, error in mp_list if error is not None]
+    df_errors = pd.DataFrame([{
+        'hkl_string': ''.join(map(str, list_of_paths[n][4])),
+        'path': list_of_paths[n][0], 
+        'slab_thickness': list_of_paths[n][1],
+        'vac_thickness': list_of_paths[n][2], 
+        'slab_index': list_of_paths[n][3], 
+        'error': error['error'], 'traceback': error['traceback']}
+        for n, data, error in mp_list if error is not None], 
+        columns=['hkl_string', 'path', 'slab_thickness', 'vac_thickness',
+        'slab_index', 'error', 'traceback'])
+
+    # Nothing to work with, raise the error of the first folder again, as a 
+    # RuntimeError if it is not a built-in exception 
+    if not df_list and errors: 
+        error_type = getattr(builtins, errors[0]['error'].split(':')[0], None)
+        if not (isinstance(error_type, type) and 
+        issubclass(error_type, Exception)): 
+            error_type = RuntimeError
+        raise error_type('None of the {} folders could be parsed, the first '
+        'failed with:\n{}'.format(len(list_of_paths), errors[0]['traceback']))
+
+    if errors: 
+        warnings.formatwarning = _custom_formatwarning
+        warnings.warn('{} of {} folders could not be parsed:\n{}'.format(
+            len(errors), len(list_of_paths), '\n'.join('{}: {}'.format(p, e) 
+            for p, e in zip(df_errors['path'], df_errors['error']))))
 
     df = pd.DataFrame(df_list)
 
-    if electrostatic_list: 
-        df['vacuum_potential'] = electrostatic_list
-    
-    if gradient_list: 
-        df['vacuum_gradient'] = gradient_list # in meV
-    
-    if core_energy_list: 
-        df['core_energy'] = core_energy_list
-        
+    # Unfinished calculations are kept, with their last ionic step 
+    if 'incomplete' in df.columns: 
+        df['incomplete'] = df['incomplete'].fillna(False).astype(bool)
+        unfinished = df[df['incomplete']]
+        warnings.formatwarning = _custom_formatwarning
+        warnings.warn(('{} of {} folders are unfinished, their energies are '
+        'from the last completed ionic step:\n{}').format(len(unfinished), 
+        len(list_of_paths), '\n'.join('{} {}_{}_{}'.format(*row) for row in 
+        unfinished[['hkl_string', 'slab_thickness', 'vac_thickness', 
+        'slab_index']].itertuples(index=False))))
+
     df['surface_energy'] = (
         (df['slab_energy'] - bulk_per_atom * df['atoms'])/(2*df['area']) * 16.02
         ) 
     
-    # Add Fiorentini-Methfessel and Boettger methods for calculating 
-    # surface energies 
-    dfs = []
-    for index in df.groupby('slab_index'): 
-        df_index = index[1].sort_values('vac_thickness')
-        for group in df_index.groupby('vac_thickness'): 
-            df2 = group[1].sort_values('slab_thickness')
-            # deepcopy to keep it fresh 
-            df3 = copy.deepcopy(df2)
-            # Fiorentini-methfessel
-            # remove first data point if it's too much of an outlier and there are 
-            # more than three data points 
-            if remove_first_energy and len(df2['atoms']) >= 3: 
-                x = np.delete(df2['atoms'].to_numpy(), 0).reshape(-1,1)
-                y = np.delete(df2['slab_energy'].to_numpy(), 0) 
-            else: 
-                x = df2['atoms'].to_numpy().reshape(-1,1)
-                y = df2['slab_energy'].to_numpy()
-            
-            model = LinearRegression().fit(x,y)
-            df3['surface_energy_fm'] = (
-            (df3['slab_energy'] - model.coef_ * df3['atoms'])/(2*df3['area'])*16.02)
-            
-            # Boettger
-            # new dataframe, just in case 
-            df4 = group[1].sort_values('slab_thickness')
-            if remove_first_energy and len(df4['atoms']) >= 3: 
-                # big energy = M+1 layers energy, small energy = M layers, 
-                # calculating bulk energy for M layers
-                # remove first two from M+1 energy, add a nan in place of one and 
-                # at the end; also replace the first from the M energies with nan; 
-                # same with atoms
-                big_energy = df4['slab_energy'].iloc[2:].to_numpy()
-                big_energy = np.append(big_energy, np.nan)
-                big_energy = np.insert(big_energy, 0, np.nan)
-                
-                small_energy = df4['slab_energy'].iloc[1:].to_numpy()
-                small_energy = np.insert(small_energy, 0, np.nan)
-                
-                big_atoms = df4['atoms'].iloc[2:].to_numpy()
-                big_atoms = np.append(big_atoms, np.nan)
-                big_atoms = np.insert(big_atoms, 0, np.nan)
-                small_atoms = df4['atoms'].astype('float').iloc[1:].to_numpy()
-                small_atoms = np.insert(small_atoms, 0, np.nan) 
-            
-            else: 
-                # need to remove the first from big energy and add a nan at the end 
-                big_energy = df4['slab_energy'].iloc[1:].to_numpy()
-                big_energy = np.append(big_energy, np.nan)
-                
-                small_energy = df4['slab_energy'].to_numpy()
-                
-                big_atoms = df4['atoms'].iloc[1:].to_numpy()
-                big_atoms = np.append(big_atoms, np.nan)
-                small_atoms = df4['atoms'].to_numpy()
-            
-            # difference M+1 - M, get bulk energy from E(M+1)-E(M) / (M+1)-M        
-            diff_energy = big_energy-small_energy
-            diff_atoms = big_atoms-small_atoms
-            bulk_energies = diff_energy/diff_atoms
-            # make last energy a nan to get a nan surface energy 
-
-            small_energy[-1] = np.nan
-        
-            df3['surface_energy_boettger'] = (
-            (small_energy - df3['atoms']*bulk_energies) / (2*df3['area']) * 16.02)
-
-            dfs.append(df3)
-    
-    # Concat list back to one dataframe
-    df = pd.concat(dfs)
+    # Add Fiorentini-Methfessel and Boettger methods for calculating
+    # surface energies
+    df = _fm_boettger(df, remove_first_energy=remove_first_energy)
+    df.attrs['errors'] = df_errors
 
-    if remove_first_energy and len(df2['atoms']) < 3:
-        warnings.formatwarning = _custom_formatwarning
-        warnings.warn('First data point was not removed - less than three '
-        'data points were present in dataset') 
+    if db_fname is not None:
+        _save_db(df, db_fname, material, {(''.join(map(str, p[4])), *p[1:4]):
+            p[0] for p in list_of_paths})
 
-    # Plot surface energy
+    # Plot surface energy
     plt_kwargs = {'colors': None, 'width': 6, 'height': 5}
     plt_kwargs.update((k, kwargs[k]) for k in plt_kwargs.keys() & kwargs.keys())
 
-    if plt_surfen: 
-        plot_surfen(df, plt_fname=plt_surfen_fname, **plt_kwargs)
+    # One plot per Miller index, prefixed by the index if there is more than
+    # one of them
+    hkl_strings = list(df['hkl_string'].unique())
+    if plt_surfen:
+        for hkl_string in hkl_strings:
+            fname = plt_surfen_fname if len(hkl_strings) == 1 else '{}_{}'.format(
+                hkl_string, plt_surfen_fname)
+            plot_surfen(df[df['hkl_string'] == hkl_string], plt_fname=fname,
+            **plt_kwargs)
 
     # Save the csv or return the dataframe
     if save_csv:
-        csv_fname = '{}_data.csv'.format(
-            ''.join(map(str, hkl))) if csv_fname is None else csv_fname 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
+        if csv_fname is not None:
+            to_save = [(csv_fname, df, df_errors)]
+        else:
+            to_save = [('{}_data.csv'.format(hkl_string),
+                df[df['hkl_string'] == hkl_string],
+                df_errors[df_errors['hkl_string'] == hkl_string])
+                for hkl_string in hkl_strings]
+
+        for fname, df_save, df_errors_save in to_save:
+            fname = save_df(df_save, fname)
+
+            # Save the folders that could not be parsed and why next to the
+            # data
+            if not df_errors_save.empty:
+                root, ext = os.path.splitext(fname)
+                save_df(df_errors_save, root + '_errors' + ext)
 
-        df.to_csv(csv_fname, header=True, index=False)
-    
-    else: 
+    else:
         return df
 
-def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=CrystalNN(), path_to_fols=None, save_json=True, json_fname=None,  **kwargs): 
+def watch_energies(hkl, bulk_per_atom, path_to_fols=None, interval=60,
+max_polls=None, parse_core_energy=False, core_atom=None, bulk_nn=None,
+parse_vacuum=False, remove_first_energy=False, plt_surfen=True,
+csv_fname=None, verbose=False, processes=None, db_fname=None, material=None,
+**kwargs):
+    """
+    Watches the convergence folders while the calculations are running. The
+    folders are polled every ``interval`` seconds and each slab_vac_index
+    folder is parsed once its vasprun.xml is complete (or a compressed one is
+    present). Rerun calculations, i.e. vasprun.xml files that changed since
+    they were parsed, are parsed again.
+
+    The results are kept in an incremental store, ``csv_fname``, which is
+    read on start up so parsing carries on where it stopped; only folders
+    with vasprun.xml files newer than the store are parsed again. When new
+    folders are parsed, the Fiorentini-Methfessel and Boettger surface
+    energies are only recalculated for the affected (slab_index,
+    vac_thickness) groups and only the surface energy plots of the affected
+    slab indices are redrawn, to ``hkl_surface_energy_index.png``.
+
+    Args:
+        hkl (`tuple`, `list` or `str`): Miller index of the slab, a list of
+            Miller indices or ``'all'``.
+        bulk_per_atom (`float`): Bulk energy per atom from a converged
+            bulk calculation in eV per atom.
+        path_to_fols (`str`, optional): Path to the convergence folders.
+            Defaults to None which is cwd
+        interval (`float`, optional): Time between polls in seconds. Defaults
+            to ``60``.
+        max_polls (`int`, optional): Stop after this many polls. Defaults to
+            ``None``, which watches until interrupted.
+        csv_fname (`str`, optional): The result store, in any format
+            supported by ``surfaxe.io.save_df``. Defaults to hkl_data.csv for
+            one Miller index and data.csv otherwise.
+        db_fname (`str`, optional): SQLite results store the rows of the
+            affected groups are upserted into after each poll. Defaults to
+            ``None``, no store.
+
+    The other args are the same as for ``parse_energies``.
+
+    Returns:
+        DataFrame
+    """
+    if processes == None or processes > multiprocessing.cpu_count():
+        processes = multiprocessing.cpu_count() - 1
+
+    helper = _energy_helper(parse_vacuum, parse_core_energy, core_atom, bulk_nn,
+    **kwargs)
+    cwd = os.getcwd() if path_to_fols is None else path_to_fols
+
+    if csv_fname is None:
+        if hkl != 'all' and all(isinstance(i, int) for i in hkl):
+            csv_fname = '{}_data.csv'.format(''.join(map(str, hkl)))
+        else:
+            csv_fname = 'data.csv'
+    if os.path.splitext(csv_fname)[1] not in ('.parquet', '.feather', '.npz'):
+        csv_fname = csv_fname if csv_fname.endswith('.csv') else csv_fname + '.csv'
+
+    plt_kwargs = {'colors': None, 'width': 6, 'height': 5}
+    plt_kwargs.update((k, kwargs[k]) for k in plt_kwargs.keys() & kwargs.keys())
+
+    # rows of the store by (hkl, slab_thickness, vac_thickness, slab_index),
+    # the vasprun.xml signatures of the parsed folders and the folder paths
+    rows, seen, paths = {}, {}, {}
+    store_time = None
+    if os.path.exists(csv_fname):
+        store_time = os.stat(csv_fname).st_mtime_ns
+        for row in load_df(csv_fname).to_dict('records'):
+            for col in ['slab_thickness', 'vac_thickness', 'slab_index']:
+                row[col] = str(row[col])
+            rows[_row_key(row)] = row
+
+    polls = 0
+    while True:
+        new = []
+        for fol in _find_fols(hkl, cwd):
+            paths[(''.join(map(str, fol[4])), *fol[1:4])] = fol[0]
+            signature = _vasprun_signature(fol[0])
+            if signature is None or seen.get(fol[0]) == signature:
+                continue
+            seen[fol[0]] = signature
+            key = (''.join(map(str, fol[4])), *fol[1:4])
+            if key in rows and store_time is not None and \
+                signature[0] <= store_time:
+                continue
+            new.append(fol)
+            if verbose:
+                print('Parsing {}'.format(fol[0]))
+
+        affected = set()
+        for n, data, error in _run_tasks(helper, new, processes):
+            if error is not None:
+                warnings.formatwarning = _custom_formatwarning
+                warnings.warn('{} could not be parsed: {}'.format(
+                    new[n][0], error['error']))
+                continue
+            data['surface_energy'] = ((data['slab_energy'] - bulk_per_atom *
+                data['atoms']) / (2 * data['area']) * 16.02)
+            rows[_row_key(data)] = data
+            affected.add((data['hkl_string'], data['slab_index'],
+                data['vac_thickness']))
+
+        if affected:
+            # Only the groups with new data need new FM and Boettger energies
+            for group in affected:
+                group_df = _fm_boettger(pd.DataFrame([row for key, row in
+                    rows.items() if (key[0], key[3], key[2]) == group]),
+                    remove_first_energy=remove_first_energy)
+                for row in group_df.to_dict('records'):
+                    rows[_row_key(row)] = row
+
+            df = _store_df(rows)
+            save_df(df, csv_fname)
+            store_time = os.stat(csv_fname).st_mtime_ns
+            if db_fname is not None:
+                _save_db(df[[(h, i, v) in affected for h, i, v in
+                    zip(df['hkl_string'], df['slab_index'],
+                    df['vac_thickness'])]], db_fname, material, paths)
+
+            if plt_surfen:
+                for hkl_string, slab_index in sorted({(g[0], g[1])
+                    for g in affected}):
+                    plot_surfen(df[(df['hkl_string'] == hkl_string) &
+                        (df['slab_index'] == slab_index)],
+                        plt_fname='{}_surface_energy_{}.png'.format(
+                        hkl_string, slab_index), **plt_kwargs)
+
+        polls += 1
+        if max_polls is not None and polls >= max_polls:
+            break
+        time.sleep(interval)
+
+    return _store_df(rows)
+
+def plan_convergence(df, tol=0.01, energy='surface_energy_fm', slab_step=None,
+vac_step=None):
+    """
+    Checks the slab and vacuum thickness convergence of the surface energy of
+    each termination in the parsed convergence data and suggests the
+    calculations needed to converge the ones that are not converged.
+
+    The slab thickness is converged from the smallest thickness from which
+    all surface energies at the largest vacuum are within ``tol`` of each
+    other. The vacuum is converged in the same way from the energies at the
+    converged slab thickness, or the thickest slab if the slab thickness is
+    not converged. At least two points are needed for either, so a
+    termination is only converged if the largest two thicknesses or vacuums
+    agree. For each unconverged dimension one extra point is suggested, one
+    step beyond the largest thickness or vacuum.
+
+    The suggestions are grouped into keyword arguments for
+    ``surfaxe.generation.generate_slabs``, one dict for each Miller index and
+    vacuum, e.g. ``{'hkl': (0,0,1), 'thicknesses': [50], 'vacuums': [30]}``.
+    Note that ``generate_slabs`` makes all terminations of the Miller index.
+
+    Args:
+        df (`pandas DataFrame` or `str`): DataFrame from ``parse_energies`` or
+            the path to the file it was saved to.
+        tol (`float`, optional): Tolerance of the surface energy in J/m^2.
+            Defaults to ``0.01``.
+        energy (`str`, optional): The surface energy column to check, one of
+            'surface_energy', 'surface_energy_fm' or 'surface_energy_boettger'.
+            Defaults to ``'surface_energy_fm'``.
+        slab_step (`float`, optional): Increase in slab thickness of the
+            suggested slabs in Angstroms. Defaults to ``None``, which uses the
+            spacing between the two thickest slabs or 10 A if there is only one.
+        vac_step (`float`, optional): Increase in vacuum of the suggested slabs
+            in Angstroms. Defaults to ``None``, which works like ``slab_step``.
+
+    Returns:
+        dict with 'convergence', a DataFrame with a row for each termination,
+        and 'generate_slabs', a list of dicts of ``generate_slabs`` arguments
+    """
+    if type(df) == str:
+        df = load_df(df)
+    df = df.copy()
+    for col in ['slab_thickness', 'vac_thickness', energy]:
+        df[col] = pd.to_numeric(df[col])
+    df = df.dropna(subset=[energy])
+
+    rows, suggestions = [], {}
+    for (hkl_string, slab_index), group in df.groupby(['hkl_string',
+        'slab_index'], sort=False):
+        if 'hkl_tuple' in group.columns:
+            hkl = tuple(group['hkl_tuple'].iloc[0])
+        else:
+            hkl = tuple(int(i) for i in re.findall(r'-?\d', hkl_string))
+
+        # Slab thickness convergence at the largest vacuum
+        vac_max = _as_number(group['vac_thickness'].max())
+        by_slab = group[group['vac_thickness'] == vac_max]
+        slab_conv = _converged_from(by_slab['slab_thickness'].to_numpy(),
+            by_slab[energy].to_numpy(), tol)
+        slab_ref = slab_conv if slab_conv is not None else \
+            _as_number(by_slab['slab_thickness'].max())
+
+        # Vacuum convergence at the converged or thickest slab
+        by_vac = group[group['slab_thickness'] == slab_ref]
+        vac_conv = _converged_from(by_vac['vac_thickness'].to_numpy(),
+            by_vac[energy].to_numpy(), tol)
+
+        suggested = []
+        if slab_conv is None:
+            suggested.append((_next_point(by_slab['slab_thickness'], slab_step),
+                vac_conv if vac_conv is not None else vac_max))
+        if vac_conv is None:
+            suggested.append((slab_ref,
+                _next_point(by_vac['vac_thickness'], vac_step)))
+        for slab, vac in suggested:
+            suggestions.setdefault((hkl, vac), set()).add(slab)
+
+        converged = slab_conv is not None and vac_conv is not None
+        rows.append({
+            'hkl_string': hkl_string,
+            'hkl_tuple': hkl,
+            'slab_index': slab_index,
+            'converged': converged,
+            'slab_thickness': np.nan if slab_conv is None else slab_conv,
+            'vac_thickness': np.nan if vac_conv is None else vac_conv,
+            energy: by_vac.loc[by_vac['vac_thickness'] == vac_conv,
+                energy].iloc[0] if converged else np.nan,
+            'suggested': suggested
+        })
+
+    generate_slabs_args = [{'hkl': hkl, 'thicknesses': sorted(slabs),
+        'vacuums': [vac]} for (hkl, vac), slabs in sorted(suggestions.items())]
+
+    return {'convergence': pd.DataFrame(rows),
+        'generate_slabs': generate_slabs_args}
+
+def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=CrystalNN(), path_to_fols=None, save_json=True, json_fname=None, processes=None, **kwargs): 
     """
     Parses the convergence folders to get the relaxed structures, performs bond analysis and saves the data to a JSON file.
-    Args: 
+
+    The slabs are parsed in parallel. The nearest neighbours of each slab are
+    found once and all bonds are taken from them, and the slabs are kept in
+    the order of the folders, so the JSON file is the same for every run.
+
+    Args:  
         hkl (`tuple`): Miller index of the slab.
         structure_file (`str`): Name of the structure file to parse. Defaults to 'CONTCAR'.
         bond (`str`): Bond to analyse. Defaults to 'auto', which guesses 
@@ -331,11 +478,14 @@ def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=Cryst
         nn_method (`pymatgen.analysis.local_env.NearNeighbors`): The      
             coordination number prediction algorithm used. Defaults to 
             CrystalNN().
-        path_to_fols (`str`): Path to the convergence folders. Defaults to 
-            cwd. 
+        path_to_fols (`str`): Path to the convergence folders or a tar
+            archive of them, read without unpacking it. Defaults to cwd.  
         save_json (`bool`): Whether to save the data to a JSON file. Defaults to True.
         json_fname (`str`): Name of the JSON file.
-        kwargs: Keyword arguments to pass to `bond_analysis`.
+        processes (`int`, optional): Number of CPU processes to use, limited 
+            to max-1. Defaults to max-1.
+        kwargs: Keyword arguments to pass to `bond_analysis`, e.g. 
+            ``ox_states``.
 
     Returns:
         dict or saves to file
@@ -343,30 +493,21 @@ def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=Cryst
     # collect the relaxed structures & put them in a json file 
     # has to be same format as the input (-layers) 
 
+    if processes == None or processes > multiprocessing.cpu_count():
+        processes = multiprocessing.cpu_count() - 1
+
     # Set directory 
     cwd = os.getcwd() if path_to_fols is None else path_to_fols
 
     # Get all paths to slab_vac_index folders, list=[[path,slab,vac,index],..]
-    list_of_paths=[]
-    for root, fols, files in os.walk(cwd):
-        fols.sort()
-        for fol in fols:
-            # Perform a loose check that we are looking in the right place, 
-            # also avoid .ipynb_checkpoint files 
-            if ''.join(map(str,hkl)) in root.split('/') and '.' not in fol:
-                if len(fol.split('_')) == 3:
-                    list_of_paths.append([
-                        os.path.join(root, fol),
-                        fol.split('_')[0], 
-                        fol.split('_')[1], 
-                        fol.split('_')[2]
-                    ])
+    list_of_paths = [p[:4] for p in _find_fols(hkl, cwd)]
     # Only parse the structures for bonds once, use the first one in the 
     # list
     fixed_bonds = []
     if bond=='auto': 
-        struc = Structure.from_file('{}/{}'.format(list_of_paths[0][0], structure_file))
-        sg = nn_method.get_bonded_structure(struc)
+        struc = _instantiate_structure('{}/{}'.format(list_of_paths[0][0],
+        structure_file))
+        sg = _bonded_structure(struc, nn_method)
         all_bonds = list(sg.types_and_weights_of_connections.keys())
         print('Bonds found automatically: {}'.format(all_bonds))
         for ab in all_bonds: 
@@ -378,42 +519,30 @@ def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=Cryst
                 fixed_bonds.append([str(el1), str(el2)])
 
     if fixed_bonds: 
-        bond = fixed_bonds
-
-    lst = []
-    for path, slab_thickness, vac_thickness, slab_index in list_of_paths: 
-        struc_path = '{}/{}'.format(path, structure_file)
-        slab = slab_from_file(struc_path, hkl)
-        lst_dict = {
-            'hkl': hkl, 
-            'slab_thickness': slab_thickness, 
-            'vac_thickness': vac_thickness, 
-            'slab_index': slab_index,
-            'slab': slab.as_dict()
-        }
-
-        # if bond is set, do bond analysis; single bond
-        if bond is not None and type(bond[0]) == str: 
-            df = bond_analysis(slab, bond, nn_method=nn_method, 
-            save_csv=False, **kwargs)
-            lst_dict['bonds'] = {f'{bond[0]}-{bond[1]}': df.to_dict()}
-            
-        # multiple bonds 
-        elif bond is not None and type(bond[0]) == list: 
-            d = {}
-            for b in bond: 
-                df = bond_analysis(slab, b, nn_method=nn_method, 
-                save_csv=False, **kwargs)
-                k = f'{b[0]}-{b[1]}'
-                df.dropna(inplace=True)
-                d[k] = df.to_dict()
-            lst_dict['bonds'] = d
-
-        lst.append(lst_dict)
+        # the same bond can be found more than once, keep a stable order
+        bond = [list(b) for b in sorted({tuple(b) for b in fixed_bonds})]
+
+    if bond is not None: 
+        for b in bond if type(bond) == list and type(bond[0]) == list else [bond]: 
+            if type(b) != list: 
+                raise TypeError('Bond must be supplied as a list of two elements.')
+            if len(b) > 2: 
+                warnings.warn('Bond with more than two elements supplied. '
+                'Only the first two elements will be treated as a bond.')
+
+    # imap keeps the slabs in the order of the folders
+    helper = functools.partial(_mp_helper_structures, structure_file, hkl, 
+    bond, nn_method, ox_states=kwargs.get('ox_states', None))
+    if processes > 1 and len(list_of_paths) > 1: 
+        with multiprocessing.Pool(processes) as pool: 
+            lst = list(pool.imap(helper, list_of_paths))
+    else: 
+        lst = [helper(task) for task in list_of_paths]
 
     if save_json:
         if json_fname is None: 
-            bulk_name = slab.composition.reduced_formula
+            bulk_name = Structure.from_dict(
+                lst[-1]['slab']).composition.reduced_formula
             json_fname = '{}_parsed_metadata.json'.format(bulk_name)
         
         with open(json_fname, 'w') as f: 
@@ -423,27 +552,399 @@ def parse_structures(hkl, structure_file='CONTCAR', bond='auto', nn_method=Cryst
 
 
 
-def _mp_helper_energy(parse_vacuum, get_core, hkl, path, slab_thickness,
-vac_thickness, slab_index, core_atom=None, bulk_nn=None, **kwargs): 
+def _mp_helper_structures(structure_file, hkl, bond, nn_method, task, 
+ox_states=None): 
+    """
+    Helper function for multiprocessing, reads the slab in one
+    slab_vac_index folder and does the bond analysis of all bonds with one
+    neighbour search. ``task`` is the [path, slab_thickness, vac_thickness,
+    slab_index] list. Returns the dict of the slab for the JSON file.
+    """
+    path, slab_thickness, vac_thickness, slab_index = task
+    slab = slab_from_file('{}/{}'.format(path, structure_file), hkl)
+    lst_dict = {
+        'hkl': hkl, 
+        'slab_thickness': slab_thickness, 
+        'vac_thickness': vac_thickness, 
+        'slab_index': slab_index,
+        'slab': slab.as_dict()
+    }
+    if bond is None: 
+        return lst_dict
+
+    # oxidation states are added and the neighbours found once for all bonds
+    single = type(bond[0]) == str
+    bonds = [bond] if single else bond
+    struc = oxidation_states(structure=slab, ox_states=ox_states)
+    dfs = _bond_tables(struc, bonds, nn_method)
+
+    d = {}
+    for b, df in zip(bonds, dfs): 
+        # only the single bond keeps the atoms without a bond
+        if not single: 
+            df.dropna(inplace=True)
+        d[f'{b[0]}-{b[1]}'] = df.to_dict()
+    lst_dict['bonds'] = d
+
+    return lst_dict
+
+def _converged_from(x, y, tol):
     """
-    Helper function for multiprocessing, returns a list of lists of the main 
-    extracted data, electrostatic potential and core energies
-    Same args as for parse_fols, only that path is the path to the folder in 
-    which the vasprun and OUTCAR for the specific slab/vacuum/index slab are. 
+    Helper function that returns the smallest x from which all y values at x
+    and above are within tol of each other, or ``None`` if the last two are
+    not.
     """
-    df_list, electrostatic_list, core_energy_list, gradient_list = ([] for i in range(4))
+    order = np.argsort(x)
+    x, y = x[order], y[order]
+    for i in range(len(x) - 1):
+        if np.ptp(y[i:]) <= tol:
+            return _as_number(x[i])
 
-    # instantiate structure, slab, vasprun and outcar objects
-    vsp_path = '{}/vasprun.xml'.format(path)
+    return None
+
+def _next_point(x, step=None):
+    """
+    Helper function that returns the next thickness one step beyond the
+    largest one, by default the spacing of the two largest thicknesses.
+    """
+    x = np.unique(x)
+    if step is None:
+        step = x[-1] - x[-2] if len(x) > 1 else 10
+
+    return _as_number(x[-1] + step)
+
+def _as_number(x):
+    """Helper function that turns whole numbers to int and others to float """
+    return int(x) if float(x).is_integer() else float(x)
+
+def _energy_helper(parse_vacuum, parse_core_energy, core_atom, bulk_nn,
+**kwargs):
+    """
+    Helper function that sets up the core energy arguments and returns the
+    function that parses one slab_vac_index folder task.
+    """
+    # Update kwargs for core energy
+    get_core_energy_kwargs = {'orbital': '1s', 'ox_states': None,
+    'nn_method': CrystalNN()}
+    get_core_energy_kwargs.update(
+        (k, kwargs[k]) for k in get_core_energy_kwargs.keys() & kwargs.keys()
+    )
+    get_core = False
+    if parse_core_energy:
+        if core_atom is not None and bulk_nn is not None:
+            get_core = True
+        else:
+            warnings.formatwarning = _custom_formatwarning
+            warnings.warn(('Core atom or bulk nearest neighbours were not '
+            'supplied. Core energy will not be parsed.'))
+
+    return functools.partial(_mp_helper_energy, parse_vacuum, get_core,
+    core_atom=core_atom, bulk_nn=bulk_nn, **get_core_energy_kwargs)
+
+def _run_tasks(helper, list_of_paths, processes):
+    """
+    Helper function that parses each folder in its own task so one broken
+    folder does not throw away the others. Results are collected as soon as
+    they are ready and then put back into the order of ``list_of_paths``.
+    """
+    # folders in a tar archive are read in the order they are stored in
+    tasks = sorted(enumerate(list_of_paths),
+        key=lambda task: _archive_order(task[1][0]))
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            mp_list = list(pool.imap_unordered(helper, tasks))
+    else:
+        mp_list = [helper(task) for task in tasks]
+    mp_list.sort(key=lambda x: x[0])
+
+    return mp_list
+
+def _vasprun_signature(path):
+    """
+    Helper function that returns the (modification time, size) of the
+    vasprun.xml(.gz, .xz, ...) in path if the calculation has finished
+    writing it, otherwise ``None``. An uncompressed vasprun.xml is complete
+    once it ends with the closing modeling tag, compressed ones are taken to
+    be complete.
+    """
+    vsp_path = _find_file(os.path.join(path, 'vasprun.xml'))
+    if not os.path.exists(vsp_path) or not _vasprun_finished(vsp_path):
+        return None
+    stat = os.stat(vsp_path)
+
+    return stat.st_mtime_ns, stat.st_size
+
+def _vasprun_finished(vsp_path):
+    """
+    Helper function that checks if an uncompressed vasprun.xml ends with the
+    closing modeling tag. Compressed files and files in tar archives are
+    taken to be finished.
+    """
+    if _in_archive(vsp_path) or _compression(vsp_path) is not None:
+        return True
+    with open(vsp_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 256, 0))
+
+        return b'</modeling>' in f.read()
+
+def _last_ionic_step(path):
+    """
+    Helper function for calculations that were killed or are still running.
+    Returns the energy and structure of the last completed ionic step, the
+    energy from the OSZICAR and the structure from the CONTCAR (or the POSCAR
+    if no CONTCAR was written yet), otherwise both from the last complete
+    calculation block of a truncated vasprun.xml. Returns ``None`` if neither
+    has a completed ionic step.
+    """
+    oszicar = _find_file('{}/OSZICAR'.format(path))
+    if _exists(oszicar):
+        try:
+            with _local_file(oszicar) as fname:
+                energy = Oszicar(fname).final_energy
+        except (IndexError, ValueError):
+            energy = None
+        for fname in ['CONTCAR', 'POSCAR']:
+            if energy is None:
+                break
+            try:
+                return energy, _instantiate_structure('{}/{}'.format(path,
+                fname))
+            except (OSError, IndexError, ValueError):
+                continue
+
+    vsp_path = _find_file('{}/vasprun.xml'.format(path))
+    if _exists(vsp_path):
+        return _read_partial_vasprun(vsp_path)
+
+    return None
+
+def _save_db(df, db_fname, material, paths):
+    """
+    Helper function that upserts parsed rows into the SQLite results store
+    together with their folder paths, which are looked up in a dict by
+    _row_key. Unless the material is given, it is named after the folder the
+    Miller index folder is in.
+    """
+    df = df.copy()
+    df['path'] = [paths.get(_row_key(row)) for row in df.to_dict('records')]
+    if material is None:
+        material = [_material_name(path, hkl_string) for path, hkl_string in
+            zip(df['path'], df['hkl_string'])]
+    df['material'] = material
+    save_db(df, db_fname)
+
+def _material_name(path, hkl_string):
+    """
+    Helper function that returns the name of the folder above the Miller
+    index folder in path, without the extension if it is a tar archive
+    """
+    if path is None:
+        return None
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(len(parts) - 1, 0, -1):
+        if parts[i] == hkl_string:
+            return re.sub(r'\.(tar|tgz|tbz2|txz)(\.\w+)?$', '', parts[i - 1])
+
+    return None
+
+def _row_key(row):
+    """Helper function for the key of a row of the watch_energies store """
+    return (row['hkl_string'], str(row['slab_thickness']),
+        str(row['vac_thickness']), str(row['slab_index']))
+
+def _store_df(rows):
+    """Helper function that makes a sorted DataFrame of the watched rows """
+    keys = sorted(rows, key=lambda k: (k[0], float(k[3]), float(k[2]),
+        float(k[1])))
+
+    return pd.DataFrame([rows[k] for k in keys])
+
+def _find_fols(hkl, path, verbose=False):
+    """
+    Helper function that walks ``path`` once and finds the slab_vac_index
+    folders in all Miller index subdirectories. ``hkl`` is a tuple, a list of
+    tuples or ``'all'``, which accepts any subdirectory named like a Miller
+    index, e.g. ``001`` or ``1-10``. If Miller index subdirectories are nested,
+    the one closest to the slab_vac_index folder is used. ``path`` can also be
+    a tar archive of the folders or a folder inside one, then the folders
+    are found from the archive member index without unpacking it. Returns a
+    sorted list of [path, slab_thickness, vac_thickness, slab_index, hkl]
+    lists.
+    """
+    if hkl == 'all':
+        wanted = None
+    elif all(isinstance(i, int) for i in hkl):
+        wanted = {''.join(map(str, hkl)): tuple(hkl)}
+    else:
+        wanted = {''.join(map(str, h)): tuple(h) for h in hkl}
+
+    list_of_paths = []
+    for root, fols, files in _walk(path):
+        fols.sort()
+        fol_hkl = None
+        for part in reversed(root.split(os.sep)):
+            if wanted is None and re.fullmatch(r'(-?\d){3}', part):
+                fol_hkl = tuple(int(i) for i in re.findall(r'-?\d', part))
+                break
+            elif wanted is not None and part in wanted:
+                fol_hkl = wanted[part]
+                break
+        if fol_hkl is None:
+            continue
+
+        for fol in fols:
+            # Perform a loose check that we are looking in the right place,
+            # also avoid .ipynb_checkpoint files
+            if '.' not in fol and len(fol.split('_')) == 3:
+                list_of_paths.append([os.path.join(root, fol),
+                *fol.split('_'), fol_hkl])
+                if verbose:
+                    print(root, fol)
+
+    return list_of_paths
+
+def _fm_boettger(df, remove_first_energy=False):
+    """
+    Helper function that calculates the Fiorentini-Methfessel and Boettger
+    surface energies for every (hkl, slab_index, vac_thickness) group at once.
+
+    Fiorentini-Methfessel: the bulk energy per atom is the slope of the least
+    squares fit of slab energy against number of atoms in the group.
+    Boettger: the bulk energy per atom for the M layer slab is
+    E(M+1)-E(M) / N(M+1)-N(M), so the thickest slab in each group has no
+    Boettger surface energy.
+
+    Args:
+        df (`pandas DataFrame`): DataFrame with 'slab_index', 'vac_thickness',
+            'slab_thickness', 'atoms', 'area' and 'slab_energy' columns, and
+            optionally 'hkl_string'.
+        remove_first_energy (`bool`, optional): Leave out the thinnest slab of
+            groups with at least three slabs from both methods. Defaults to
+            ``False``.
+
+    Returns:
+        DataFrame sorted by hkl, slab index, vacuum and slab thickness with
+        'surface_energy_fm' and 'surface_energy_boettger' columns
+    """
+    # Sort so each group is contiguous and ordered by slab thickness
+    keys = [pd.to_numeric(df['slab_thickness']).to_numpy(),
+        pd.to_numeric(df['vac_thickness']).to_numpy(),
+        pd.to_numeric(df['slab_index']).to_numpy()]
+    groups = ['slab_index', 'vac_thickness']
+    if 'hkl_string' in df.columns:
+        keys.append(df['hkl_string'].to_numpy())
+        groups.insert(0, 'hkl_string')
+    df = df.iloc[np.lexsort(keys)].copy()
+    grouped = df.groupby(groups, sort=False)
+    g = grouped.ngroup().to_numpy()
+    pos = grouped.cumcount().to_numpy()
+    size = grouped['atoms'].transform('size').to_numpy()
+
+    x = df['atoms'].to_numpy(dtype=float)
+    y = df['slab_energy'].to_numpy(dtype=float)
+    area = df['area'].to_numpy(dtype=float)
+
+    # remove first data point if it's too much of an outlier and there are
+    # at least three data points
+    first = np.zeros(len(df), dtype=bool)
+    if remove_first_energy:
+        first = (pos == 0) & (size >= 3)
+        if (size < 3).any():
+            warnings.formatwarning = _custom_formatwarning
+            warnings.warn('First data point was not removed - less than three '
+            'data points were present in dataset')
+
+    # Fiorentini-Methfessel, closed form least squares slope for each group;
+    # a single point or a single number of atoms gives a slope of 0
+    w = (~first).astype(float)
+    n = np.bincount(g, weights=w)
+    x_mean = np.bincount(g, weights=w*x) / n
+    y_mean = np.bincount(g, weights=w*y) / n
+    dx = w * (x - x_mean[g])
+    dy = w * (y - y_mean[g])
+    sxx = np.bincount(g, weights=dx*dx)
+    sxy = np.bincount(g, weights=dx*dy)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    df['surface_energy_fm'] = (y - slope[g] * x) / (2 * area) * 16.02
+
+    # Boettger, difference between each slab and the next thickest one in
+    # the same group
+    same_group = np.append(g[1:] == g[:-1], False)
+    big_energy = np.where(same_group, np.append(y[1:], np.nan), np.nan)
+    big_atoms = np.where(same_group, np.append(x[1:], np.nan), np.nan)
+    bulk_energies = (big_energy - y) / (big_atoms - x)
+    bulk_energies[first] = np.nan
+    df['surface_energy_boettger'] = (y - x * bulk_energies) / (2 * area) * 16.02
+
+    return df
+
+def _mp_helper_energy(parse_vacuum, get_core, task, core_atom=None,
+bulk_nn=None, **kwargs):
+    """
+    Helper function for multiprocessing, parses one slab_vac_index folder.
+    ``task`` is a tuple of the position of the folder in the list of paths and
+    the [path, slab_thickness, vac_thickness, slab_index, hkl] list. Returns a
+    tuple of the position, the dict of parsed data and ``None``, or if the
+    folder could not be parsed the position, ``None`` and a dict of the 
+    ``error`` ('type: message') and its ``traceback`` as strings, which unlike
+    the exception itself can always be sent back from the pool.
+    """
+    n, (path, slab_thickness, vac_thickness, slab_index, hkl) = task
+    try: 
+        data = _parse_energy_fol(parse_vacuum, get_core, hkl, path, 
+        slab_thickness, vac_thickness, slab_index, core_atom=core_atom, 
+        bulk_nn=bulk_nn, **kwargs)
+    except Exception as e: 
+        return n, None, {'error': '{}: {}'.format(type(e).__name__, e), 
+            'traceback': traceback.format_exc()}
+    
+    return n, data, None
+
+def _parse_energy_fol(parse_vacuum, get_core, hkl, path, slab_thickness,
+vac_thickness, slab_index, core_atom=None, bulk_nn=None, **kwargs): 
+    """
+    Helper function that parses the vasprun.xml, OUTCAR and optionally LOCPOT 
+    from one folder. Same args as for parse_energies, only that path is the 
+    path to the folder in which the vasprun and OUTCAR for the specific 
+    slab/vacuum/index slab are. Returns a dict of the main extracted data, 
+    vacuum potential and gradient and core energy. 
+    """
+    # instantiate structure, slab, vasprun and outcar objects, should give
+    # error if no vasprun.xml or OUTCAR(.gz, .xz, ...) is able to be parsed
     otc_path = '{}/OUTCAR'.format(path)
-    if os.path.exists(vsp_path):
-        vsp = Vasprun(vsp_path, parse_potcar_file=False)
-    else:  # should give error if neither vasprun.xml(.gz) able to be parsed
-        vsp = Vasprun(vsp_path + '.gz', parse_potcar_file=False)
-    if os.path.exists(otc_path):
-        otc = Outcar(otc_path)
-    else:  # should give error if neither OUTCAR(.gz) able to be parsed
-        otc = Outcar(otc_path + '.gz')
+    vsp_path = _find_file('{}/vasprun.xml'.format(path))
+    try: 
+        # don't let Vasprun reparse a vasprun.xml that is still being written
+        if _exists(vsp_path) and not _vasprun_finished(vsp_path): 
+            raise ValueError('{} is unfinished'.format(vsp_path))
+        with _local_file(vsp_path) as fname:
+            vsp = Vasprun(fname, parse_potcar_file=False)
+    except (ValueError, ParseError, EOFError):  
+        # killed or running calculation, use the last completed ionic step
+        # if there is one
+        step = _last_ionic_step(path)
+        if step is None: 
+            raise
+        energy, structure = step
+        slab = slab_from_file(structure, hkl)
+
+        # the LOCPOT and core states are only written at the end of the run
+        return {'hkl_string': ''.join(map(str, hkl)), 
+            'hkl_tuple': hkl, 
+            'slab_thickness': slab_thickness,
+            'vac_thickness': vac_thickness,
+            'slab_index': slab_index,
+            'atoms': len(structure), 
+            'area': slab.surface_area, 
+            'bandgap': np.nan,
+            'slab_energy': energy,
+            'slab_per_atom': energy / len(structure),
+            'time_taken': np.nan,
+            'incomplete': True}
+
+    with _local_file(_find_file(otc_path)) as fname:
+        otc = Outcar(fname)
 
     slab = slab_from_file(vsp.final_structure, hkl)
     vsp_dict = vsp.as_dict()
@@ -451,8 +952,7 @@ vac_thickness, slab_index, core_atom=None, bulk_nn=None, **kwargs):
     # extract the time data
     otc_times = otc.run_stats
 
-    df_list.append(
-        {'hkl_string': ''.join(map(str, hkl)), 
+    data = {'hkl_string': ''.join(map(str, hkl)), 
         'hkl_tuple': hkl, 
         'slab_thickness': slab_thickness,
         'vac_thickness': vac_thickness,
@@ -462,39 +962,17 @@ vac_thickness, slab_index, core_atom=None, bulk_nn=None, **kwargs):
         'bandgap': vsp_dict['output']['bandgap'],
         'slab_energy': vsp_dict['output']['final_energy'],
         'slab_per_atom': vsp_dict['output']['final_energy_per_atom'],
-        'time_taken': otc_times['Elapsed time (sec)']})
+        'time_taken': otc_times['Elapsed time (sec)']}
 
     if parse_vacuum: 
-        electrostatic_list.append(vacuum(path))
-
-        lpt = '{}/LOCPOT'.format(path) 
-        p = electrostatic_potential(lpt, save_plt=False, save_csv=False)
-        # gradient in eV 
-        g = p['gradient'].to_numpy()
-        ratio = int(vac_thickness)/(int(vac_thickness)+int(slab_thickness))
-        # check if slab is centred so can get the gradient
-        if 0.45 < slab.center_of_mass[2] < 0.55:
-            # divide by 2 bc two regions, 0.75 is a scaling factor that 
-            # should hopefully work to avoid any charge from dangling 
-            # bonds? 
-            a = int(len(g)*ratio/2*0.75)
-            gradient_list.append(np.mean(g[:a])* 1000) 
-
-        else: 
-            a = int(len(g)*ratio*0.75)
-            # if atoms are more towards the end of the slab, the start 
-            # should be vacuum
-            if slab.center_of_mass[2] > 0.5: 
-                gradient_list.append(np.mean(g[:a])* 1000)  
-            # and then if atoms are at the start, the vacuum is at
-            # the end
-            else: 
-                gradient_list.append(np.mean(g[(len(g)-a):]) * 1000)  
+        # read the LOCPOT once for both the vacuum level and gradient
+        pa = potential_analysis(path, slab_thickness, vac_thickness, 
+        structure=slab)
+        data['vacuum_potential'] = pa['vacuum_potential']
+        data['vacuum_gradient'] = pa['vacuum_gradient'] # in meV
                                     
     if get_core: 
-        core_energy_list.append(
-            core_energy(core_atom, bulk_nn, outcar=otc_path, 
-            structure=slab, **kwargs)
-            ) 
+        data['core_energy'] = core_energy(core_atom, bulk_nn, 
+        outcar=otc_path, structure=slab, **kwargs)
 
-    return [df_list, electrostatic_list, core_energy_list, gradient_list]
\ No newline at end of file
+    return data
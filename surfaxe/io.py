@@ -2,6 +2,8 @@
 from pymatgen.io.vasp.sets import DictSet
 from pymatgen.core import Structure
 from pymatgen.core.surface import Slab
+from pymatgen.io.vasp.inputs import Poscar
+from pymatgen.analysis.graphs import StructureGraph
 
 # Misc
 import pandas as pd
@@ -9,6 +11,24 @@ import numpy as np
 import os
 import warnings
 import json
+import gzip
+import bz2
+import lzma
+import tarfile
+import posixpath
+import math
+import hashlib
+import zipfile
+import itertools
+import ast
+from xml.etree import ElementTree
+import re
+import sqlite3
+import shutil
+import tempfile
+from io import TextIOWrapper, BufferedReader, BytesIO
+from collections import OrderedDict
+from contextlib import contextmanager, closing, ExitStack
 from ruamel.yaml import YAML
 from pathlib import Path
 
@@ -36,7 +56,8 @@ def slab_from_file(structure, hkl):
          Slab object
     """
     if type(structure) == str:
-        slab_input = Structure.from_file(structure)
+        with _local_file(_find_file(structure)) as fname:
+            slab_input = Structure.from_file(fname)
     else:
         slab_input = structure
     return Slab(slab_input.lattice,
@@ -258,7 +279,8 @@ def _check_psp_dir():
 def _instantiate_structure(structure): 
     """Helper function for instatiating structure files correctly """
     if type(structure) == str:
-        struc = Structure.from_file(structure)
+        with _local_file(_find_file(structure)) as fname:
+            struc = Structure.from_file(fname)
     elif type(structure) == Structure or type(structure) == Slab: 
         struc = structure
     else: 
@@ -266,26 +288,1180 @@ def _instantiate_structure(structure):
     
     return struc
 
-def plot_bond_analysis(bond, df=None, filename=None, width=6, height=5, dpi=300,
-color=None, plt_fname='bond_analysis.png', markersize=8, marker='x'):
+# Nearest neighbours of recently analysed structures, keyed by _nn_key, and
+# the optional folder where they are also saved as json files 
+_NN_CACHE = OrderedDict()
+_NN_CACHE_SIZE = 32
+_NN_CACHE_DIR = os.environ.get('SURFAXE_NN_CACHE')
+
+def set_nn_cache(maxsize=32, cache_dir=None): 
+    """
+    Sets up the cache of nearest neighbours shared by the analysis functions,
+    so that analysing the same structure with the same nearest neighbour
+    method again, e.g. in simple_nn and then bond_analysis, reuses the 
+    neighbours instead of finding them again. The most recently used 
+    structures are kept in memory and, optionally, all of them are saved to 
+    a folder to be reused by later runs and by other processes. The folder 
+    can also be set with the ``SURFAXE_NN_CACHE`` environment variable.
+
+    Args:
+        maxsize (`int`, optional): The number of structures kept in memory. 
+            Defaults to ``32``. 
+        cache_dir (`str`, optional): The folder where the neighbours are 
+            saved. Defaults to ``None``, which keeps them only in memory.
+
+    Returns:
+        None
+    """
+    global _NN_CACHE_SIZE, _NN_CACHE_DIR
+    _NN_CACHE_SIZE = maxsize
+    _NN_CACHE_DIR = cache_dir
+    # so the processes started by multiprocessing use the same folder
+    if cache_dir is None: 
+        os.environ.pop('SURFAXE_NN_CACHE', None)
+    else: 
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ['SURFAXE_NN_CACHE'] = cache_dir
+    while len(_NN_CACHE) > _NN_CACHE_SIZE: 
+        _NN_CACHE.popitem(last=False)
+
+def clear_nn_cache(): 
+    """Empties the in-memory cache of nearest neighbours """
+    _NN_CACHE.clear()
+
+def _nn_params(obj): 
+    """
+    Helper function that turns the parameters of a nearest neighbour method
+    into a nested list that has the same repr for the same parameters
+    """
+    if isinstance(obj, dict): 
+        return sorted((repr(k), _nn_params(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)): 
+        return [_nn_params(v) for v in obj]
+    if hasattr(obj, '__dict__'): 
+        return [type(obj).__name__, _nn_params(vars(obj))]
+    return repr(obj)
+
+def _nn_key(struc, nn_method): 
+    """
+    Helper function that returns the key of a structure and nearest neighbour
+    method in the cache: a hash of the lattice, the species (including their 
+    oxidation states) and the fractional coordinates of the sites, and of the
+    class and parameters of the nearest neighbour method 
+    """
+    h = hashlib.sha1()
+    # rounded, and -0.0 made 0.0, so that equal structures hash the same 
+    h.update(np.round(struc.lattice.matrix, 6).tobytes() + b'0.0')
+    h.update((np.round(struc.frac_coords, 8) + 0.0).tobytes())
+    h.update(' '.join(str(site.species) for site in struc).encode())
+    h.update(repr((type(nn_method).__module__, type(nn_method).__name__, 
+        _nn_params(vars(nn_method)))).encode())
+
+    return h.hexdigest()
+
+def _nn_entry(key): 
+    """
+    Helper function that returns the cache entry of key, reading it from the
+    cache folder if it is not in memory, and makes it the most recently used
+    """
+    if key in _NN_CACHE: 
+        _NN_CACHE.move_to_end(key)
+        return _NN_CACHE[key]
+
+    entry = {'neighbours': {}, 'graph': None}
+    if _NN_CACHE_DIR is not None: 
+        fname = os.path.join(_NN_CACHE_DIR, '{}.json'.format(key))
+        if os.path.isfile(fname): 
+            with open(fname, 'r') as f: 
+                entry['neighbours'] = {int(n): [(i, tuple(image), weight) 
+                    for i, image, weight in nn] 
+                    for n, nn in json.load(f).items()}
+    _NN_CACHE[key] = entry
+    while len(_NN_CACHE) > _NN_CACHE_SIZE: 
+        _NN_CACHE.popitem(last=False)
+
+    return entry
+
+def _neighbours(struc, nn_method, sites=None): 
+    """
+    Helper function that returns a dict of the nearest neighbours of the 
+    sites, all sites by default, from the cache, finding the ones that are 
+    not cached with nn_method. The neighbours of each site are a list of the
+    (site index, periodic image, weight) of each neighbour.
+    """
+    key = _nn_key(struc, nn_method)
+    entry = _nn_entry(key)
+    neighbours = entry['neighbours']
+    sites = range(len(struc)) if sites is None else sites
+    missing = [n for n in sites if n not in neighbours]
+
+    if missing: 
+        # get_all_nn_info can be faster than finding each site's neighbours
+        if len(missing) == len(struc): 
+            nn_info = enumerate(nn_method.get_all_nn_info(struc))
+        else: 
+            nn_info = ((n, nn_method.get_nn_info(struc, n)) for n in missing)
+        for n, nn in nn_info: 
+            neighbours[n] = [(d['site_index'], tuple(int(i) for i in 
+                d['image']), d['weight']) for d in nn]
+        if _NN_CACHE_DIR is not None: 
+            with open(os.path.join(_NN_CACHE_DIR, '{}.json'.format(key)), 
+            'w') as f: 
+                json.dump({n: [[i, image, weight] for i, image, weight in nn]
+                    for n, nn in neighbours.items()}, f)
+
+    return {n: neighbours[n] for n in sites}
+
+def _bonded_structure(struc, nn_method): 
+    """
+    Helper function that returns the bonded structure from 
+    nn_method.get_bonded_structure(struc), built from the cached nearest 
+    neighbours. The StructureGraph is shared by everything analysing the 
+    same structure, so it should not be modified.
+    """
+    neighbours = _neighbours(struc, nn_method)
+    entry = _nn_entry(_nn_key(struc, nn_method))
+    if entry['graph'] is None: 
+        # the same edges as StructureGraph.with_local_env_strategy
+        sg = StructureGraph.with_empty_graph(struc, name='bonds')
+        for n in range(len(struc)): 
+            for i, image, weight in neighbours[n]: 
+                sg.add_edge(from_index=n, from_jimage=(0, 0, 0), to_index=i,
+                to_jimage=image, weight=weight, warn_duplicates=False)
+        sg.set_node_attributes()
+        entry['graph'] = sg
+
+    return entry['graph']
+
+def planar_average(filename, axis=2, chunk_size=10000, cache=True,
+grid_cache=None):
+    """
+    Reads a VASP volumetric data file (e.g. LOCPOT) and gets the planar
+    average of the data along one axis. Unlike ``Locpot.from_file`` the full
+    3D grid is never built; the data block is streamed in chunks and each
+    chunk is added to the planar sums, so the memory needed scales with the
+    number of grid points along the axis and the chunk size. Compressed
+    files (gzip, bzip2, xz or zstd) are decompressed as they are streamed.
+
+    The planar averages along all three axes are saved to a
+    ``filename.planar.npz`` sidecar file together with the grid dimensions,
+    the structure and the size, modification time and hash of the source
+    file. Later reads use the sidecar instead of the volumetric file until
+    the volumetric file changes. Files inside tar archives are streamed
+    from the archive and never get a sidecar.
+
+    If there is no sidecar but the grid was converted with
+    ``volumetric_to_npy``, the planar averages are taken from the
+    memory-mapped ``filename.grid.npy`` instead of parsing the volumetric
+    file. With ``grid_cache`` the grid is converted as it is parsed.
+
+    Args:
+        filename (`str`): Path to the volumetric data file.
+        axis (`int`, optional): Index of the axis along which the planar
+            average is taken, 0, 1 or 2 for a, b or c. Defaults to ``2``.
+        chunk_size (`int`, optional): Number of lines of the data block
+            read at a time. Defaults to ``10000``.
+        cache (`bool`, optional): Whether to read and write the planar
+            average sidecar file and the grid cache. Defaults to ``True``.
+        grid_cache (`bool`, optional): Whether to save the grid to
+            ``filename.grid.npy`` when the volumetric file is parsed.
+            Defaults to ``None``, which saves it if the ``SURFAXE_GRID_CACHE``
+            environment variable is set to anything but ``0``.
+
+    Returns:
+        tuple of the planar average (`numpy array`), the structure
+        (pymatgen Structure) and the grid dimensions (`tuple`)
+    """
+    sidecar = '{}.planar.npz'.format(filename)
+    cache = cache and os.path.exists(filename)
+    if grid_cache is None:
+        grid_cache = os.environ.get('SURFAXE_GRID_CACHE', '0') not in ('', '0')
+    data = _load_sidecar(filename, sidecar) if cache else None
+    if data is None:
+        data = _mapped_planar_averages(filename) if cache else None
+        if data is None and cache and grid_cache:
+            try:
+                data = _convert_grid(filename, chunk_size=chunk_size)
+            except OSError:
+                # read-only folders just don't get a grid cache
+                data = None
+        if data is None:
+            data = _stream_planar_averages(filename, chunk_size=chunk_size)
+        if cache:
+            _save_sidecar(filename, sidecar, data)
+
+    struc = _poscar_from_str(data['poscar']).structure
+
+    return data['planar'][axis], struc, data['dim']
+
+def volumetric_to_npy(filename, chunk_size=10000):
+    """
+    Converts the grid of a VASP volumetric data file (e.g. LOCPOT) to a raw
+    ``filename.grid.npy`` file, which is memory-mapped by ``load_grid`` and
+    ``planar_average`` instead of parsing the volumetric file again. The
+    POSCAR header, grid dimensions, lattice and the size, modification time
+    and hash of the volumetric file are saved to ``filename.grid.npz``, the
+    grid cache is not used once the volumetric file changes. The grid is
+    streamed into the npy file in chunks, so it is never held in memory.
+
+    Args:
+        filename (`str`): Path to the volumetric data file.
+        chunk_size (`int`, optional): Number of lines of the data block
+            read at a time. Defaults to ``10000``.
+
+    Returns:
+        str: The path to the npy file
+    """
+    filename = _find_file(filename)
+    if not os.path.isfile(filename):
+        raise FileNotFoundError('{} is not a file on disk'.format(filename))
+    _convert_grid(filename, chunk_size=chunk_size)
+
+    return '{}.grid.npy'.format(filename)
+
+def load_grid(filename, chunk_size=10000):
+    """
+    Memory-maps the grid of a VASP volumetric data file converted with
+    ``volumetric_to_npy``, the file is converted first if it has no up to
+    date grid cache. Only the parts of the grid that are used are read from
+    disk.
+
+    Args:
+        filename (`str`): Path to the volumetric data file.
+        chunk_size (`int`, optional): Number of lines of the data block
+            read at a time if the file is converted. Defaults to ``10000``.
+
+    Returns:
+        tuple of the read-only grid (`numpy memmap`) indexed [a, b, c] like
+        the data of pymatgen's VolumetricData and the structure (pymatgen
+        Structure)
+    """
+    filename = _find_file(filename)
+    mapped = _load_grid_cache(filename)
+    if mapped is None:
+        volumetric_to_npy(filename, chunk_size=chunk_size)
+        mapped = _load_grid_cache(filename)
+    data, grid = mapped
+
+    return grid.T, _poscar_from_str(data['poscar']).structure
+
+def _convert_grid(filename, chunk_size=10000):
+    """
+    Helper function that streams the volumetric data file into the grid
+    cache and returns the dict of _stream_planar_averages
+    """
+    npy = '{}.grid.npy'.format(filename)
+    tmp = '{}.{}.tmp.npy'.format(npy, os.getpid())
+    try:
+        data = _stream_planar_averages(filename, chunk_size=chunk_size,
+        grid=tmp)
+        # replace in one step so parallel readers never see a partial file
+        os.replace(tmp, npy)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _save_sidecar(filename, '{}.grid.npz'.format(filename), data)
+
+    return data
+
+def _load_grid_cache(filename):
+    """
+    Helper function that returns the metadata of the grid cache and the
+    memory-mapped grid, in the (c, b, a) order it is stored in the
+    volumetric file, or None if there is no up to date grid cache
+    """
+    npy = '{}.grid.npy'.format(filename)
+    if not os.path.isfile(npy):
+        return None
+    data = _load_sidecar(filename, '{}.grid.npz'.format(filename))
+    if data is None:
+        return None
+    try:
+        grid = np.load(npy, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if grid.shape != data['dim'][::-1]:
+        return None
+
+    return data, grid
+
+def _mapped_planar_averages(filename):
+    """
+    Helper function that gets the planar averages along all three axes from
+    the memory-mapped grid cache, returns None if there is no grid cache
+    """
+    mapped = _load_grid_cache(filename)
+    if mapped is None:
+        return None
+    data, grid = mapped
+
+    # sum a block of c planes at a time so only the block is in memory
+    nc, nb, na = grid.shape
+    totals = [np.zeros(na), np.zeros(nb), np.zeros(nc)]
+    step = max(1, (1 << 20) // (na * nb))
+    for k in range(0, nc, step):
+        block = np.asarray(grid[k:k + step])
+        totals[0] += block.sum(axis=(0, 1))
+        totals[1] += block.sum(axis=(0, 2))
+        totals[2][k:k + step] = block.sum(axis=(1, 2))
+    data['planar'] = [totals[ax] * grid.shape[2 - ax] / grid.size
+                      for ax in range(3)]
+
+    return data
+
+def planar_difference(filename, reference, axis=2, chunk_size=10000,
+grid=None):
+    """
+    Gets the planar average of the difference between two VASP volumetric
+    data files on the same grid, e.g. the CHGCAR of a slab minus the CHGCAR
+    of a bulk-like reference in the same cell. Both files are streamed
+    together in chunks and subtracted a chunk at a time, so neither grid is
+    ever held in memory. Compressed files are decompressed as they are
+    streamed.
+
+    Args:
+        filename (`str`): Path to the volumetric data file, e.g. the slab.
+        reference (`str`): Path to the volumetric data file that is
+            subtracted, e.g. the bulk-like reference.
+        axis (`int`, optional): Index of the axis along which the planar
+            average is taken, 0, 1 or 2 for a, b or c. Defaults to ``2``.
+        chunk_size (`int`, optional): Number of lines of the data blocks
+            read at a time. Defaults to ``10000``.
+        grid (`str`, optional): Path of a npy file to also save the
+            difference grid to, it can be memory-mapped with
+            ``np.load(grid, mmap_mode='r')``. Defaults to ``None``.
+
+    Returns:
+        tuple of the planar average of the difference (`numpy array`), the
+        structure of ``filename`` (pymatgen Structure) and the grid
+        dimensions (`tuple`)
+    """
+    data = _stream_planar_averages(filename, chunk_size=chunk_size, grid=grid,
+    reference=reference)
+    struc = _poscar_from_str(data['poscar']).structure
+
+    return data['planar'][axis], struc, data['dim']
+
+def _stream_planar_averages(filename, chunk_size=10000, grid=None,
+reference=None):
+    """
+    Helper function that streams a volumetric data file once and returns a
+    dict with the POSCAR header, grid dimensions, lattice and the planar
+    averages along all three axes. If ``grid`` is a path, the grid is also
+    written to it as a npy file. If ``reference`` is the path to another
+    volumetric data file on the same grid, it is streamed alongside and
+    subtracted chunk by chunk.
+    """
+    with ExitStack() as stack:
+        f = stack.enter_context(_open_file(filename))
+        poscar, dim = _read_volumetric_header(f)
+        lattice = _poscar_from_str(poscar).structure.lattice.matrix
+        ngrid = dim[0] * dim[1] * dim[2]
+        blocks = _grid_blocks(f, filename, ngrid, chunk_size)
+
+        if reference is not None:
+            g = stack.enter_context(_open_file(reference))
+            ref_poscar, ref_dim = _read_volumetric_header(g)
+            ref_lattice = _poscar_from_str(ref_poscar).structure.lattice.matrix
+            if ref_dim != dim or not np.allclose(ref_lattice, lattice,
+            atol=1e-4):
+                raise ValueError('{} and {} are not on the same grid, the '
+                'grids are {} and {}'.format(filename, reference, dim, ref_dim))
+            blocks = _difference_blocks(blocks,
+                _grid_blocks(g, reference, ngrid, chunk_size))
+
+        totals = [np.zeros(n) for n in dim]
+        if grid is not None:
+            grid = np.lib.format.open_memmap(grid, mode='w+', dtype=float,
+            shape=dim[::-1])
+            flat = grid.reshape(-1)
+        count = 0
+
+        # x is the fastest index, followed by y then z
+        for values in blocks:
+            if grid is not None:
+                flat[count:count + len(values)] = values
+            idx = np.arange(count, count + len(values))
+            yz = idx // dim[0]
+            for ax, i in enumerate([idx % dim[0], yz % dim[1], yz // dim[1]]):
+                totals[ax] += np.bincount(i, weights=values, minlength=dim[ax])
+            count += len(values)
+
+    if grid is not None:
+        grid.flush()
+        del flat, grid
+
+    planar = [totals[ax] / dim[(ax + 1) % 3] / dim[(ax + 2) % 3]
+              for ax in range(3)]
+
+    return {'poscar': poscar, 'dim': dim, 'lattice': lattice,
+            'planar': planar}
+
+def _read_volumetric_header(f):
+    """
+    Helper function that reads the header of an open volumetric data file,
+    the structure in POSCAR format followed by a blank line and the grid
+    dimensions. Returns the POSCAR string and the grid dimensions.
+    """
+    header = []
+    for line in f:
+        line = line.strip()
+        if line == '' and header:
+            break
+        header.append(line)
+    dim = tuple(int(i) for i in f.readline().split())
+
+    return '\n'.join(header), dim
+
+def _grid_blocks(f, filename, ngrid, chunk_size=10000):
+    """
+    Helper function that yields the values of the first grid of an open
+    volumetric data file, after its header, in blocks of ``chunk_size``
+    lines
+    """
+    count = 0
+    per_line = None
+    while count < ngrid:
+        if per_line is None:
+            lines = [f.readline()]
+            per_line = len(lines[0].split())
+        else:
+            # only read as many lines as needed to finish the grid,
+            # anything after it is augmentation data or another grid
+            n = min(chunk_size, math.ceil((ngrid - count) / per_line))
+            lines = list(itertools.islice(f, n))
+        if not lines or not lines[0]:
+            raise ValueError('{} ended before all {} grid points were '
+            'read'.format(filename, ngrid))
+
+        values = np.array(' '.join(lines).split(), dtype=float)
+        values = values[:ngrid - count]
+        count += len(values)
+        yield values
+
+def _difference_blocks(blocks, reference_blocks):
+    """
+    Helper function that subtracts the blocks of the reference grid from the
+    blocks of a grid of the same size, the blocks do not need to line up
+    """
+    rest = np.empty(0)
+    for values in blocks:
+        while len(rest) < len(values):
+            rest = np.concatenate((rest, next(reference_blocks)))
+        yield values - rest[:len(values)]
+        rest = rest[len(values):]
+
+def _file_hash(filename):
+    """Helper function that returns the sha1 hash of the file contents"""
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _save_sidecar(filename, sidecar, data):
+    """
+    Helper function for writing the planar average sidecar file next to the
+    volumetric data file
+    """
+    stat = os.stat(filename)
+    tmp = '{}.{}.tmp'.format(sidecar, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            np.savez(f, planar_a=data['planar'][0], planar_b=data['planar'][1],
+            planar_c=data['planar'][2], dim=np.array(data['dim']),
+            lattice=data['lattice'], poscar=np.array(data['poscar']),
+            source_size=stat.st_size, source_mtime=stat.st_mtime_ns,
+            source_hash=np.array(_file_hash(filename)))
+        # replace in one step so parallel readers never see a partial file
+        os.replace(tmp, sidecar)
+    except OSError:
+        # read-only folders just don't get a sidecar
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _load_sidecar(filename, sidecar):
+    """
+    Helper function for reading the planar average sidecar file, returns
+    None if there is no sidecar or the volumetric data file has changed
+    """
+    if not os.path.isfile(sidecar):
+        return None
+    try:
+        with np.load(sidecar) as npz:
+            stat = os.stat(filename)
+            if int(npz['source_size']) != stat.st_size:
+                return None
+            # only hash the file if it was touched, hashing is still much
+            # faster than parsing the volumetric data
+            if (int(npz['source_mtime']) != stat.st_mtime_ns and
+            str(npz['source_hash']) != _file_hash(filename)):
+                return None
+            return {'poscar': str(npz['poscar']),
+                    'dim': tuple(int(i) for i in npz['dim']),
+                    'lattice': npz['lattice'],
+                    'planar': [npz['planar_a'], npz['planar_b'],
+                               npz['planar_c']]}
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        return None
+
+# Magic bytes at the start of compressed files
+_MAGIC = {'gzip': b'\x1f\x8b', 'bzip2': b'BZh', 'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd'}
+_COMPRESSED_EXTENSIONS = ('.gz', '.xz', '.bz2', '.zst', '.lzma')
+
+def _compression(filename):
+    """
+    Helper function that gets the compression of a file from its magic
+    bytes, ``None`` if the file is not compressed
+    """
+    if _in_archive(filename):
+        with _open_member(filename) as f:
+            return _magic_compression(f.peek(6))
+    with open(filename, 'rb') as f:
+        return _magic_compression(f.read(6))
+
+def _magic_compression(head):
+    """Helper function that matches the first bytes of a file to _MAGIC """
+    for compression, magic in _MAGIC.items():
+        if head.startswith(magic):
+            return compression
+
+    return None
+
+def _open_file(filename, mode='rt', **kwargs):
+    """
+    Helper function for opening plain or compressed files for reading. The
+    gzip, bzip2, xz or zstd compression is detected from the magic bytes, not
+    the extension, and the file is decompressed as it is read. Like ``open``,
+    files are opened as text unless the mode has a 'b'. Reading zstd files
+    needs the zstandard package. Files inside tar archives, e.g.
+    sweep.tar.gz/001/20_20_15/vasprun.xml, are streamed from the archive.
+    """
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+    if _in_archive(filename):
+        source = _open_member(filename)
+        compression = _magic_compression(source.peek(6))
+    else:
+        source = filename
+        compression = _compression(filename)
+
+    if compression is None and source is filename:
+        return open(filename, mode, **kwargs)
+    elif compression is None:
+        return source if 'b' in mode else TextIOWrapper(source, **kwargs)
+    elif compression == 'gzip':
+        return gzip.open(source, mode, **kwargs)
+    elif compression == 'bzip2':
+        return bz2.open(source, mode, **kwargs)
+    elif compression == 'xz':
+        return lzma.open(source, mode, **kwargs)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(('{} is zstd compressed, reading it needs the '
+        'zstandard package').format(filename))
+    if source is filename:
+        source = open(filename, 'rb')
+    stream = zstandard.ZstdDecompressor().stream_reader(source, closefd=True)
+    if 'b' in mode:
+        return stream
+
+    return TextIOWrapper(stream, **kwargs)
+
+def _find_file(filename):
+    """
+    Helper function that returns ``filename`` if it exists, otherwise the
+    first of filename.gz, .xz, .bz2, .zst or .lzma that exists. Returns
+    ``filename`` if none of them exist so that opening it raises the usual
+    FileNotFoundError. Files inside tar archives are found too.
+    """
+    if _exists(filename):
+        return filename
+    for ext in _COMPRESSED_EXTENSIONS:
+        if _exists(filename + ext):
+            return filename + ext
+
+    return filename
+
+def _exists(filename):
+    """Helper function, os.path.exists that also looks inside tar archives """
+    if os.path.exists(filename):
+        return True
+    split = _split_archive(filename)
+
+    return split is not None and split[1] in _tar_index(split[0])[0]
+
+def _in_archive(filename):
+    """
+    Helper function that checks if filename is a file inside a tar archive
+    rather than a file on disk
+    """
+    return not os.path.exists(filename) and _split_archive(filename) is not None
+
+# Parsed tar archive indexes and the archives opened by each process
+_TAR_INDEX = {}
+_TAR_FILES = {}
+
+# Names of the files read by surfaxe, the ones of a folder in a compressed
+# archive that are stored before the requested file are kept in memory
+_TAR_PREFETCH = ('vasprun.xml', 'OUTCAR', 'POSCAR', 'CONTCAR', 'LOCPOT')
+
+def _split_archive(path):
+    """
+    Helper function that splits a path inside a tar archive, e.g.
+    sweep.tar.gz/001/20_20_15/OUTCAR, into the archive and the member name.
+    Returns ``None`` if no parent of the path is a tar archive.
+    """
+    path = os.fspath(path)
+    head, tail = os.path.split(path)
+    parts = [tail]
+    while head and not os.path.exists(head):
+        head, tail = os.path.split(head)
+        parts.append(tail)
+    if not head or not os.path.isfile(head) or not _is_archive(head):
+        return None
+
+    return head, posixpath.join(*reversed(parts)).strip('/')
+
+def _is_archive(path):
+    """Helper function that checks if path is a tar archive """
+    return path in _TAR_INDEX or tarfile.is_tarfile(path)
+
+def _tar_index(archive):
+    """
+    Helper function that reads the member index of a tar archive once and
+    returns a dict of member name to (data offset, size), with a size of
+    ``None`` for directories, and a dict of directory to its (directories,
+    files). The offset of a directory is the offset of its first file.
+    """
+    stat = os.stat(archive)
+    key = (stat.st_size, stat.st_mtime_ns)
+    if archive in _TAR_INDEX and _TAR_INDEX[archive][0] == key:
+        return _TAR_INDEX[archive][1:]
+
+    index = {}
+    with tarfile.open(archive) as tar:
+        for member in tar:
+            name = posixpath.normpath(member.name).strip('/')
+            if member.isfile():
+                index[name] = (member.offset_data, member.size)
+            elif not member.isdir() or name in ('', '.'):
+                continue
+            # directories are often not stored as members of their own
+            offset = member.offset_data
+            while name not in ('', '.'):
+                if name in index and index[name][1] is None:
+                    offset = min(offset, index[name][0])
+                if name not in index or index[name][1] is None:
+                    index[name] = (offset, None)
+                name = posixpath.dirname(name)
+
+    children = {'': ([], [])}
+    for name, (offset, size) in index.items():
+        parent = children.setdefault(posixpath.dirname(name), ([], []))
+        parent[0 if size is None else 1].append(posixpath.basename(name))
+        if size is None:
+            children.setdefault(name, ([], []))
+    _TAR_INDEX[archive] = (key, index, children)
+    for k in [k for k in _TAR_FILES if k[0] == archive]:
+        _TAR_FILES.pop(k)['tar'].close()
+
+    return index, children
+
+def _open_member(filename):
+    """
+    Helper function that opens a file inside a tar archive as a binary
+    stream. Each process keeps the archive open and seeks to the member from
+    the index, so only the member itself is read. Compressed archives can
+    only be decompressed forwards, so the files surfaxe reads that are
+    stored before the requested one in the same folder are kept in memory
+    on the way past instead of decompressing the archive from the start
+    again when they are requested.
+    """
+    archive, member = _split_archive(filename)
+    index, children = _tar_index(archive)
+    if member not in index or index[member][1] is None:
+        raise FileNotFoundError('No file {} in {}'.format(member, archive))
+
+    key = (archive, os.getpid())
+    if key not in _TAR_FILES:
+        _TAR_FILES[key] = {'tar': tarfile.open(archive), 'folder': None,
+            'cache': {}}
+    handle = _TAR_FILES[key]
+    if member in handle['cache']:
+        return BufferedReader(BytesIO(handle['cache'][member]))
+
+    tar = handle['tar']
+    offset, size = index[member]
+    folder = posixpath.dirname(member)
+    if isinstance(tar.fileobj, (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile)):
+        if folder != handle['folder']:
+            handle['folder'], handle['cache'] = folder, {}
+        siblings = sorted((index[posixpath.join(folder, name)][0],
+            posixpath.join(folder, name)) for name in children[folder][1]
+            if name.startswith(_TAR_PREFETCH))
+        for sibling_offset, sibling in siblings:
+            if tar.fileobj.tell() <= sibling_offset < offset:
+                tar.fileobj.seek(sibling_offset)
+                handle['cache'][sibling] = tar.fileobj.read(
+                    index[sibling][1])
+
+    tarinfo = tarfile.TarInfo(member)
+    tarinfo.offset_data, tarinfo.size = offset, size
+
+    return tar.extractfile(tarinfo)
+
+def _walk(path):
+    """
+    Helper function, os.walk that also walks tar archives. If path is a tar
+    archive or a folder inside one, the folders are read from the archive
+    member index and yielded as paths inside the archive, e.g.
+    sweep.tar.gz/001.
+    """
+    if os.path.isdir(path):
+        yield from os.walk(path)
+        return
+    if os.path.isfile(path) and _is_archive(path):
+        archive, top = path, ''
+    else:
+        split = _split_archive(path)
+        if split is None:
+            return
+        archive, top = split
+    children = _tar_index(archive)[1]
+    if top not in children:
+        return
+
+    def walk(folder):
+        fols, files = children.get(folder, ([], []))
+        fols = list(fols)
+        root = os.path.join(archive, *folder.split('/')) if folder else archive
+        yield root, fols, list(files)
+        for fol in fols:
+            yield from walk(posixpath.join(folder, fol))
+
+    yield from walk(top)
+
+def _archive_order(path):
+    """
+    Helper function, sort key that puts the folders of a tar archive in the
+    order they are stored in, so they are read front to back. Paths that are
+    not in an archive all sort the same.
+    """
+    split = _split_archive(path) if not os.path.exists(path) else None
+    if split is None:
+        return 0
+
+    return _tar_index(split[0])[0].get(split[1], (0, None))[0]
+
+@contextmanager
+def _local_file(filename):
+    """
+    Helper context manager that gives a plain file on disk with the contents
+    of ``filename``, for the pymatgen readers (Vasprun, Outcar, Oszicar and
+    Structure.from_file) that only take a path. Plain files are used as they
+    are, compressed files and files in tar archives are decompressed through
+    ``_open_file`` into a temporary folder, which is removed afterwards. The
+    file name is kept without the compression extension, as pymatgen uses it
+    to tell the file type.
+    """
+    if not _exists(filename) or (not _in_archive(filename) and
+        _compression(filename) is None):
+        yield filename
+        return
+
+    name = os.path.basename(filename)
+    for ext in _COMPRESSED_EXTENSIONS:
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+            break
+    tmp = tempfile.mkdtemp(prefix='surfaxe_')
+    try:
+        local = os.path.join(tmp, name)
+        with _open_file(filename, 'rb') as f, open(local, 'wb') as g:
+            shutil.copyfileobj(f, g)
+        yield local
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _xdatcar_frames(filename):
+    """
+    Helper function that streams the frames of a VASP XDATCAR one at a time,
+    so the trajectory is never held in memory. Yields the species of each
+    site, the lattice matrix and the fractional coordinates of each frame.
+    Variable cell XDATCARs, with a header before every frame, are supported.
+    """
+    with _open_file(filename) as f:
+        line = f.readline()
+        species = lattice = None
+        while line:
+            if line.split() and not line.lstrip().startswith(('Direct',
+                'direct', 'Cartesian', 'cartesian')):
+                # header: comment, scale, lattice, elements and their counts
+                scale = float(f.readline().split()[0])
+                lattice = np.array([[float(x) for x in f.readline().split()[:3]]
+                    for i in range(3)]) * scale
+                elements = f.readline().split()
+                counts = [int(n) for n in f.readline().split()]
+                species = [el for el, n in zip(elements, counts)
+                    for i in range(n)]
+                line = f.readline()
+            if line.lstrip().startswith(('Direct', 'direct')):
+                frac = np.array([[float(x) for x in f.readline().split()[:3]]
+                    for i in range(len(species))])
+                yield species, lattice, frac
+            elif line.lstrip().startswith(('Cartesian', 'cartesian')):
+                cart = np.array([[float(x) for x in f.readline().split()[:3]]
+                    for i in range(len(species))]) * scale
+                yield species, lattice, np.linalg.solve(lattice.T, cart.T).T
+            line = f.readline()
+
+def _read_partial_vasprun(filename):
+    """
+    Helper function for the truncated vasprun.xml of a killed or running
+    calculation. The file is streamed and parsed up to where it ends, returns
+    the energy (e_0_energy) and the structure of the last complete ionic step
+    or ``None`` if no ionic step was completed.
+    """
+    species, last = [], None
+    with _open_file(filename, 'rb') as f:
+        try:
+            for event, elem in ElementTree.iterparse(f):
+                if elem.tag == 'atominfo':
+                    species = [rc.find('c').text.strip() for rc in
+                        elem.iterfind("array[@name='atoms']/set/rc")]
+                elif elem.tag == 'calculation':
+                    energy = elem.find("energy/i[@name='e_0_energy']")
+                    struc = elem.find('structure')
+                    if energy is not None and struc is not None:
+                        last = (float(energy.text), Structure(
+                            _xml_varray(struc.find(
+                                "crystal/varray[@name='basis']")),
+                            species, _xml_varray(struc.find(
+                                "varray[@name='positions']"))))
+                    elem.clear()
+        except (ElementTree.ParseError, EOFError):
+            # the file ends in the middle of an element
+            pass
+
+    return last
+
+def _xml_varray(varray):
+    """Helper function that reads a vasprun.xml varray into a list of lists"""
+    return [[float(x) for x in v.text.split()] for v in varray.iterfind('v')]
+
+def _poscar_from_str(string):
+    """Helper function for reading Poscar from a string with any pymatgen"""
+    if hasattr(Poscar, 'from_str'):
+        return Poscar.from_str(string)
+    return Poscar.from_string(string)
+
+_DF_FORMATS = ('.csv', '.parquet', '.feather', '.npz')
+
+def save_df(df, filename):
+    """
+    Saves a DataFrame to a csv, Parquet, Feather or npz file. The format is
+    chosen from the extension of ``filename``, ``.csv`` is appended to
+    filenames without one of the ``.csv``, ``.parquet``, ``.feather`` or
+    ``.npz`` extensions. Parquet and Feather files need pyarrow. The npz file
+    is read without pickle, columns of tuples or lists (e.g. ``hkl_tuple``
+    and ``kpoints``) are stored as JSON strings.
+
+    Args:
+        df (`pandas DataFrame`): The DataFrame to save.
+        filename (`str`): Path to the file.
+
+    Returns:
+        str: The path the DataFrame was saved to
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext not in _DF_FORMATS:
+        filename += '.csv'
+        ext = '.csv'
+
+    # attrs may hold other DataFrames (e.g. parse errors) which can not be
+    # stored in the file metadata
+    df = df.reset_index(drop=True)
+    df.attrs = {}
+
+    if ext == '.csv':
+        df.to_csv(filename, header=True, index=False)
+    elif ext == '.parquet':
+        df.to_parquet(filename, index=False)
+    elif ext == '.feather':
+        df.to_feather(filename)
+    else:
+        arrays = {'columns': np.array([str(c) for c in df.columns])}
+        json_cols = []
+        for i, col in enumerate(df.columns):
+            values = df[col]
+            if values.dtype == object and not all(
+                isinstance(v, str) for v in values):
+                arrays['col_{}'.format(i)] = np.array(
+                    [json.dumps(_to_list(v)) for v in values], dtype=str)
+                json_cols.append(str(col))
+            elif values.dtype == object:
+                arrays['col_{}'.format(i)] = values.to_numpy(dtype=str)
+            else:
+                arrays['col_{}'.format(i)] = values.to_numpy()
+        arrays['json_columns'] = np.array(json_cols, dtype=str)
+        np.savez(filename, **arrays)
+
+    return filename
+
+def load_df(filename):
+    """
+    Reads a DataFrame from a csv, Parquet, Feather or npz file, e.g. one
+    saved by ``save_df``. The Miller index columns (``hkl``, ``hkl_string``)
+    are read as strings, ``hkl_tuple`` as tuples and ``kpoints`` as lists,
+    whichever format they were saved in.
+
+    Args:
+        filename (`str`): Path to the file.
+
+    Returns:
+        DataFrame
+    """
+    ext = os.path.splitext(filename)[1]
+    if ext == '.parquet':
+        df = pd.read_parquet(filename)
+    elif ext == '.feather':
+        df = pd.read_feather(filename)
+    elif ext == '.npz':
+        with np.load(filename, allow_pickle=False) as npz:
+            json_cols = set(npz['json_columns'])
+            data = {}
+            for i, col in enumerate(npz['columns']):
+                values = npz['col_{}'.format(i)]
+                if col in json_cols:
+                    data[col] = [json.loads(v) for v in values]
+                elif values.dtype.kind == 'U':
+                    data[col] = values.tolist()
+                else:
+                    data[col] = values
+        df = pd.DataFrame(data)
+    else:
+        df = pd.read_csv(filename, dtype={'hkl': str, 'hkl_string': str})
+
+    for col in ['hkl', 'hkl_string']:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    if 'hkl_tuple' in df.columns:
+        df['hkl_tuple'] = [tuple(int(i) for i in _literal(v))
+            for v in df['hkl_tuple']]
+    if 'kpoints' in df.columns:
+        df['kpoints'] = [_to_list(_literal(v)) for v in df['kpoints']]
+
+    return df
+
+# Columns of the surface energy table of the SQLite results store, a row is
+# one slab_vac_index calculation of a material
+_DB_TABLE = 'surface_energies'
+_DB_KEY = ['material', 'hkl_string', 'slab_thickness', 'vac_thickness',
+    'slab_index']
+_DB_COLUMNS = {'material': 'TEXT NOT NULL', 'hkl_string': 'TEXT NOT NULL',
+    'slab_thickness': 'REAL NOT NULL', 'vac_thickness': 'REAL NOT NULL',
+    'slab_index': 'INTEGER NOT NULL', 'atoms': 'INTEGER', 'area': 'REAL',
+    'bandgap': 'REAL', 'slab_energy': 'REAL', 'slab_per_atom': 'REAL',
+    'surface_energy': 'REAL', 'surface_energy_fm': 'REAL',
+    'surface_energy_boettger': 'REAL', 'vacuum_potential': 'REAL',
+    'vacuum_gradient': 'REAL', 'core_energy': 'REAL', 'time_taken': 'REAL',
+    'incomplete': 'INTEGER', 'path': 'TEXT', 'updated': 'TEXT'}
+_DB_INDEXES = {'hkl': ['hkl_string', 'material'],
+    'thickness': ['slab_thickness', 'vac_thickness'],
+    'surface_energy': ['surface_energy'],
+    'surface_energy_fm': ['surface_energy_fm']}
+
+def _connect_db(db_fname):
+    """
+    Helper function that connects to the SQLite results store and creates
+    the surface energy table and its indexes if they are not there yet
+    """
+    con = sqlite3.connect(db_fname, timeout=60)
+    con.execute('CREATE TABLE IF NOT EXISTS {} ({}, PRIMARY KEY ({}))'.format(
+        _DB_TABLE, ', '.join('{} {}'.format(col, kind) for col, kind in
+        _DB_COLUMNS.items()), ', '.join(_DB_KEY)))
+    for name, cols in _DB_INDEXES.items():
+        con.execute('CREATE INDEX IF NOT EXISTS idx_{}_{} ON {} ({})'.format(
+            _DB_TABLE, name, _DB_TABLE, ', '.join(cols)))
+
+    return con
+
+def save_db(df, db_fname, material=None):
+    """
+    Saves the surface energies parsed by ``convergence.parse_energies`` to a
+    SQLite results store, so the results of many materials can be queried
+    together with ``query_db``. Rows are upserted: a calculation that is
+    already in the store (same material, Miller index, slab and vacuum
+    thickness and slab index) is updated, only in the columns present in
+    ``df``, so parsing a folder again never duplicates it.
+
+    Args:
+        df (`pandas DataFrame`): DataFrame from ``parse_energies``.
+        db_fname (`str`): Path to the SQLite database, created if it does not
+            exist.
+        material (`str`, optional): Name of the material, e.g. the formula.
+            Defaults to ``None``, which uses the ``material`` column of df.
+
+    Returns:
+        int: The number of rows saved
+    """
+    df = df.copy()
+    if material is not None:
+        df['material'] = material
+    if 'material' not in df.columns:
+        raise ValueError('The material is neither supplied nor a column of '
+        'the DataFrame')
+    df['updated'] = pd.Timestamp.now().isoformat(timespec='seconds')
+
+    cols = [col for col in _DB_COLUMNS if col in df.columns]
+    missing = [col for col in _DB_KEY if col not in cols]
+    if missing:
+        raise ValueError('The DataFrame has no {} column'.format(
+            ', '.join(missing)))
+    update = [col for col in cols if col not in _DB_KEY]
+    rows = [tuple(_db_value(v) for v in row) for row in
+        df[cols].itertuples(index=False)]
+
+    with closing(_connect_db(db_fname)) as con, con:
+        if sqlite3.sqlite_version_info >= (3, 24, 0):
+            con.executemany(('INSERT INTO {} ({}) VALUES ({}) ON CONFLICT ({}) '
+                'DO UPDATE SET {}').format(_DB_TABLE, ', '.join(cols),
+                ', '.join('?' * len(cols)), ', '.join(_DB_KEY),
+                ', '.join('{0}=excluded.{0}'.format(col) for col in update)),
+                rows)
+        else:
+            # no upsert before SQLite 3.24, insert the new rows and update the
+            # existing ones, which also keeps the columns missing from df
+            con.executemany('INSERT OR IGNORE INTO {} ({}) VALUES ({})'.format(
+                _DB_TABLE, ', '.join(cols), ', '.join('?' * len(cols))), rows)
+            key = [cols.index(col) for col in _DB_KEY]
+            con.executemany('UPDATE {} SET {} WHERE {}'.format(_DB_TABLE,
+                ', '.join('{}=?'.format(col) for col in update),
+                ' AND '.join('{}=?'.format(col) for col in _DB_KEY)),
+                [tuple(row[cols.index(col)] for col in update) +
+                tuple(row[i] for i in key) for row in rows])
+
+    return len(rows)
+
+def query_db(db_fname, material=None, hkl=None, where=None, params=(),
+columns=None):
+    """
+    Reads surface energies from the SQLite results store written by
+    ``save_db``. The filters are combined, e.g. all facets of all materials
+    with a Fiorentini-Methfessel surface energy below 1 J/m^2 and a vacuum
+    gradient below 1 meV/A are
+    ``query_db('results.db', where='surface_energy_fm < ? AND
+    abs(vacuum_gradient) < ?', params=(1, 1))``.
+
+    Args:
+        db_fname (`str`): Path to the SQLite database.
+        material (`str` or `list`, optional): Material or list of materials.
+            Defaults to ``None``, which is all materials.
+        hkl (`tuple`, `list` or `str`, optional): Miller index as a tuple or
+            string (e.g. ``'001'``), or a list of them. Defaults to ``None``,
+            which is all Miller indices.
+        where (`str`, optional): Extra SQL condition on the columns of the
+            store, with ``?`` placeholders for ``params``. Defaults to
+            ``None``.
+        params (`tuple`, optional): Values of the placeholders in ``where``.
+            Defaults to ``()``.
+        columns (`list`, optional): Columns of the store to read. Defaults
+            to ``None``, which is all columns.
+
+    Returns:
+        DataFrame with a row for each calculation, sorted by material, Miller
+        index, slab index, vacuum and slab thickness
+    """
+    if not os.path.isfile(db_fname):
+        raise FileNotFoundError('No results store {}'.format(db_fname))
+    if isinstance(columns, str):
+        columns = [columns]
+    unknown = [col for col in columns or [] if col not in _DB_COLUMNS]
+    if unknown:
+        raise ValueError('{} are not columns of the results store, which has '
+        '{}'.format(', '.join(map(str, unknown)), ', '.join(_DB_COLUMNS)))
+
+    conditions, values = [], []
+    for col, wanted in [('material', material), ('hkl_string', hkl)]:
+        if wanted is None:
+            continue
+        if isinstance(wanted, str) or (col == 'hkl_string' and
+            all(isinstance(i, int) for i in wanted)):
+            wanted = [wanted]
+        if col == 'hkl_string':
+            wanted = [h if isinstance(h, str) else ''.join(map(str, h))
+                for h in wanted]
+        conditions.append('{} IN ({})'.format(col, ', '.join('?' *
+            len(wanted))))
+        values += list(wanted)
+    if where is not None:
+        conditions.append('({})'.format(where))
+        values += list(params)
+
+    sql = 'SELECT {} FROM {}{} ORDER BY {}'.format(', '.join(columns) if
+        columns else '*', _DB_TABLE, ' WHERE ' + ' AND '.join(conditions)
+        if conditions else '', ', '.join(col for col in ['material',
+        'hkl_string', 'slab_index', 'vac_thickness', 'slab_thickness']
+        if columns is None or col in columns) or 'rowid')
+    with closing(_connect_db(db_fname)) as con:
+        df = pd.read_sql_query(sql, con, params=values)
+
+    if 'hkl_string' in df.columns:
+        df['hkl_tuple'] = [tuple(int(i) for i in re.findall(r'-?\d', h))
+            for h in df['hkl_string']]
+
+    return df
+
+def _db_value(value):
+    """Helper function that turns numpy and missing values into SQLite ones"""
+    if value is None or (np.ndim(value) == 0 and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _literal(value):
+    """Helper function for reading tuples and lists written as strings"""
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    return value
+
+def _to_list(value):
+    """Helper function that turns nested arrays and tuples into lists"""
+    if isinstance(value, (np.ndarray, list, tuple)):
+        return [_to_list(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def plot_bond_analysis(bond=None, df=None, filename=None, width=6, height=5,
+dpi=300, color=None, plt_fname='bond_analysis.png', markersize=8, marker='x'):
     """
     Plots the bond distance with respect to fractional coordinate. Used in
-    conjunction with surfaxe.analysis.bond_analysis.
+    conjunction with surfaxe.analysis.bond_analysis. Every bond in the data
+    from an analysis of several bonds is plotted, with a colour for each.
 
     Args:
-        bond (`list`): Bond to analyse; e.g. ``['Y', 'O']`` order of elements
+        bond (`list`, optional): Bond to analyse; e.g. ``['Y', 'O']`` or a
+            list of bonds e.g. ``[['Ti', 'O'], ['Y', 'O']]``, order of elements
             in the bond must be the same as in the Dataframe or provided file.
+            Defaults to ``None``, which plots all bonds in the data.
         df (`pandas DataFrame`, optional): DataFrame from
             surfaxe.analysis.bond_analysis. Defaults to ``None``.
-        filename (`str`, optional): Path to csv file with data from
-            surfaxe.analysis.bond_analysis. Defaults to ``None``.
+        filename (`str`, optional): Path to csv, Parquet, Feather or npz file
+            with data from surfaxe.analysis.bond_analysis. Defaults to ``None``.
             Either df or filename need to be supplied.
         width (`float`, optional): Width of figure in inches. Defaults to ``6``.
         height (`float`, optional): Height of figure in inches. Defaults to
             ``5``.
         dpi (`int`, optional): Dots per inch. Defaults to ``300``.
-        color (`str`, optional): Color of marker. Defaults to ``None`` which
-            defaults to surfaxe base style
+        color (`str` or `list`, optional): Color of marker, or a list of
+            colours for several bonds. Defaults to ``None`` which defaults to
+            surfaxe base style
         plt_fname (`str`, optional): Filename of the plot. Defaults to
             ``'bond_analysis.png'``.
 
@@ -294,7 +1470,7 @@ color=None, plt_fname='bond_analysis.png', markersize=8, marker='x'):
     """
 
     if filename is not None:
-        df = pd.read_csv(filename)
+        df = load_df(filename)
     elif df is not None:
         df = df
     else:
@@ -302,20 +1478,42 @@ color=None, plt_fname='bond_analysis.png', markersize=8, marker='x'):
         warnings.warn('Data not supplied')
 
     if color is None:
-        color = '#F95F6E'
+        colors = ['#F95F6E', '#9A323C', '#FE7B88', '#64232A', '#E6505F',
+            '#40161A']
+    elif type(color) == str:
+        colors = [color]
+    else:
+        colors = color
+
+    # The data of one bond has the elements in the column names, the data
+    # of several bonds is in long format with a bond column
+    if bond is None and 'bond' not in df.columns:
+        bond = [c for c in df.columns if c.endswith('_bond_distance')][0][
+            :-len('_bond_distance')].split('-')
+    if bond is not None:
+        bonds = bond if type(bond[0]) in (list, tuple) else [bond]
+        labels = ['{}-{}'.format(b[0], b[1]) for b in bonds]
+    else:
+        labels = list(df['bond'].unique())
 
     fig, ax = plt.subplots(1,1, dpi=dpi, figsize=(width, height))
-    x = df['{}_c_coord'.format(bond[0])]
-    y = df['{}-{}_bond_distance'.format(bond[0],bond[1])]
-    ax.scatter(x, y, marker=marker, s=markersize, c=color)
+    for n, label in enumerate(labels):
+        if 'bond' in df.columns:
+            df_bond = df[df['bond'] == label]
+            x, y = df_bond['c_coord'], df_bond['bond_distance']
+        else:
+            x = df['{}_c_coord'.format(label.split('-')[0])]
+            y = df['{}_bond_distance'.format(label)]
+        ax.scatter(x, y, marker=marker, s=markersize,
+            c=colors[n % len(colors)])
     ax.set_ylabel("Bond distance (Å) ")
-    ax.legend(['{}-{} bond'.format(bond[0], bond[1])])
+    ax.legend(['{} bond'.format(label) for label in labels])
     plt.xlabel("Fractional coordinate in c")
     fig.savefig(plt_fname, facecolor='w', bbox_inches='tight')
 
 
 def plot_electrostatic_potential(df=None, filename=None, dpi=300, width=6,
-height=5, colors=None, plt_fname='potential.png'):
+height=5, colors=None, plt_fname='potential.png', ylabel='Potential (eV)'):
     """
     Plots the planar and macroscopic electrostatic potential along one
     direction. Can take either a DataFrame or a potential.csv file as input.
@@ -323,8 +1521,8 @@ height=5, colors=None, plt_fname='potential.png'):
     Args:
         df (`pandas DataFrame`, optional): pandas DataFrame from
             surfaxe.analysis.electrostatic_potential. Defaults to ``None``.
-        filename (`str`, optional): The filename of csv file with potential
-            data. Defaults to ``None``.
+        filename (`str`, optional): The filename of csv, Parquet, Feather or
+            npz file with potential data. Defaults to ``None``.
         dpi (`int`, optional): Dots per inch. Defaults to 300.
         width (`float`, optional): Width of figure in inches. Defaults to ``6``.
         height (`float`, optional): Height of figure in inches. Defaults to
@@ -334,6 +1532,8 @@ height=5, colors=None, plt_fname='potential.png'):
             base style.
         plt_fname (`str`, optional): Filename of the plot. Defaults to
             ``'potential.png'``.
+        ylabel (`str`, optional): Label of the y axis, e.g. for the averages
+            of a CHGCAR. Defaults to ``'Potential (eV)'``.
 
     Returns:
         None, saves plot to potential.png
@@ -341,7 +1541,7 @@ height=5, colors=None, plt_fname='potential.png'):
     if df is not None:
         df = df
     elif filename is not None:
-        df = pd.read_csv(filename)
+        df = load_df(filename)
     else:
         warnings.formatwarning = _custom_formatwarning
         warnings.warn('Data not supplied')
@@ -356,7 +1556,7 @@ height=5, colors=None, plt_fname='potential.png'):
         ax.plot(df['macroscopic'], label='Macroscopic', c=colors[1])
     ax.axes.xaxis.set_visible(False)
     ax.legend()
-    plt.ylabel('Potential (eV)')
+    plt.ylabel(ylabel)
     fig.savefig(plt_fname, facecolor='w', bbox_inches='tight')
 
 def plot_surfen(df, colors=None, dpi=300, width=8, height=8, 
@@ -479,6 +1679,7 @@ def plot_surfen(df, colors=None, dpi=300, width=8, height=8,
             plt_fname = 'surface_energy_{}.png'.format(group[0])
 
         fig.savefig(plt_fname, bbox_inches='tight', facecolor='w')
+        plt.close(fig)
 
 def plot_enatom(df, colors=None, dpi=300, width=6, height=5, 
 plt_fname='energy_per_atom.png'):
@@ -1,6 +1,6 @@
 # Pymatgen  
 from pymatgen.core import Structure
-from pymatgen.io.vasp.outputs import Locpot, Outcar, Vasprun
+from pymatgen.io.vasp.outputs import Outcar, Vasprun
 from pymatgen.analysis.local_env import CrystalNN
 
 # Misc
@@ -8,14 +8,19 @@ import os
 import pandas as pd 
 import numpy as np 
 import warnings 
+import functools
+import multiprocessing
 
 # surfaxe 
 from surfaxe.generation import oxidation_states
-from surfaxe.io import _custom_formatwarning, slab_from_file, _instantiate_structure
+from surfaxe.io import _custom_formatwarning, slab_from_file, \
+_instantiate_structure, planar_average, save_df, _find_file, _local_file, \
+_exists, _walk, _bonded_structure
+from surfaxe.analysis import _get_axis, _read_locpot, _potential
 
 def process_data(bulk_per_atom, parse_hkl=True, path_to_fols=None, hkl_dict=None,
 parse_core_energy=False, core_atom=None, bulk_nn=None, parse_vacuum=False, 
-save_csv=True, csv_fname='data.csv', **kwargs): 
+save_csv=True, csv_fname='data.csv', processes=None, chunksize=1, **kwargs): 
     """
     Parses the folders to collect all final data on relevant input and output 
     parameters, and optionally core and vacuum level energies. 
@@ -52,7 +57,9 @@ save_csv=True, csv_fname='data.csv', **kwargs):
         parse_hkl (`bool`, optional): If ``True`` the script parses the names   
             of the folders to get the Miller indices. Defaults to ``True``.
         path_to_fols (`str`, optional): Path to where surfaxe should look for 
-            the hkl folders are. Defaults to None which searches in cwd.     
+            the hkl folders are, can be a tar archive of the folders, which
+            is read without unpacking it. Defaults to None which searches in
+            cwd.     
         hkl_dict (`dict`, optional): dictionary of tuples of Miller indices 
             and paths to the folders the relevant outputs. Defaults to ``None``. 
             E.g. If the outputs of the calculations on the (1,-1,2) slab are in 
@@ -70,8 +77,18 @@ save_csv=True, csv_fname='data.csv', **kwargs):
             Defaults to ``True``. 
         save_csv (`bool`, optional): If ``True``, it writes data to a csv file.
             Defaults to ``True``.
-        csv_fname (`str`, optional): The filename of the csv. Defaults to 
-            data.csv 
+        csv_fname (`str`, optional): The filename of the csv. Defaults to
+            data.csv. A ``.parquet``, ``.feather`` or
+            ``.npz`` extension saves the data in that format instead.
+        processes (`int`, optional): Number of CPU processes to use, limited
+            to max-1. Defaults to max-1.
+        chunksize (`int`, optional): Number of folders sent to a process at
+            a time. Increase it for many small folders. Defaults to ``1``.
+
+    The rows are in the order of ``hkl_dict`` followed by the Miller index
+    folders found in ``path_to_fols`` sorted by name, regardless of the
+    number of processes used.
+
     Returns: 
         DataFrame
     """
@@ -83,18 +100,24 @@ save_csv=True, csv_fname='data.csv', **kwargs):
             if not isinstance(value, str): 
                 raise TypeError('The values supplied to hkl_dict are not strings.')
     
+    if processes == None or processes > multiprocessing.cpu_count():
+        processes = multiprocessing.cpu_count() - 1
+
     cwd = os.getcwd()
-    if path_to_fols: 
-        cwd = path_to_fols 
+    if path_to_fols:
+        cwd = path_to_fols
 
     # Get the Miller indices as tuples and strings from folders in root dir
     if parse_hkl:
         if not hkl_dict: 
             hkl_dict = {}
-        for fol in os.listdir(cwd):
-            if os.path.isdir(os.path.join(cwd, fol)) and len(fol)==3 and\
-                fol.isdigit():
-                hkl_dict[tuple(map(int, fol))] = os.path.join(cwd, fol)
+        walk = next(_walk(cwd), None)
+        if walk is None:
+            raise FileNotFoundError('No folder or tar archive {}'.format(cwd))
+        root, fols, files = walk
+        for fol in sorted(fols):
+            if len(fol)==3 and fol.isdigit():
+                hkl_dict[tuple(map(int, fol))] = os.path.join(root, fol)
 
     # Set up additional arguments for get_core_energy 
     get_core_energy_kwargs = {'orbital': '1s', 'ox_states': None, 
@@ -111,49 +134,22 @@ save_csv=True, csv_fname='data.csv', **kwargs):
             warnings.warn(('Core atom or bulk nearest neighbours were not '
             'supplied. Core energy will not be parsed.'))
 
-    # For each miller index, check if the folders specified are there and 
-    # parse them for data
-    df_list, electrostatic_list, core_energy_list = ([] for i in range(3))
-
-    for hkl_tuple, path in hkl_dict.items():
-        vsp_path = '{}/vasprun.xml'.format(path)
-        if os.path.exists(vsp_path):
-            vsp = Vasprun(vsp_path, parse_potcar_file=False)
-        else:  # should give error if neither vasprun.xml(.gz) able to be parsed
-            vsp = Vasprun(vsp_path + '.gz', parse_potcar_file=False)
-
-        psc_path = '{}/POSCAR'.format(path)
-        slab = slab_from_file(psc_path, hkl_tuple)
-        vsp_dict = vsp.as_dict()
-        
-        df_list.append({
-            'hkl': ''.join(map(str, hkl_tuple)), 
-            'hkl_tuple': hkl_tuple,
-            'area': slab.surface_area, 
-            'atoms': vsp_dict['nsites'], 
-            'functional': vsp_dict['run_type'], 
-            'encut': vsp_dict['input']['incar']['ENCUT'], 
-            'algo': vsp_dict['input']['incar']['ALGO'],
-            'ismear': vsp_dict['input']['parameters']['ISMEAR'],
-            'sigma': vsp_dict['input']['parameters']['SIGMA'],
-            'kpoints': vsp_dict['input']['kpoints']['kpoints'],
-            'bandgap': vsp_dict['output']['bandgap'],  
-            'slab_energy': vsp_dict['output']['final_energy'],
-            'slab_per_atom': vsp_dict['output']['final_energy_per_atom']
-        })
-
-        if parse_vacuum: 
-            electrostatic_list.append(
-                vacuum(path)
-            )
-                                    
-        if get_core: 
-            otc_path='{}/OUTCAR'.format(path)
-            core_energy_list.append(
-                core_energy(core_atom, bulk_nn, outcar=otc_path, 
-                structure=psc_path, **get_core_energy_kwargs)
-                )      
-                        
+    if len(hkl_dict) > 20 and get_core:
+        warnings.formatwarning = _custom_formatwarning
+        warnings.warn(('Determining core energies for {} slabs may be slow. '
+        'Running on {} cores.').format(len(hkl_dict), processes))
+
+    # For each miller index, check if the folders specified are there and
+    # parse them for data, imap keeps the results in the order of hkl_dict
+    helper = functools.partial(_mp_helper_data, parse_vacuum, get_core,
+    core_atom=core_atom, bulk_nn=bulk_nn, **get_core_energy_kwargs)
+    tasks = list(hkl_dict.items())
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            df_list = list(pool.imap(helper, tasks, chunksize=chunksize))
+    else:
+        df_list = [helper(task) for task in tasks]
+
     df = pd.DataFrame(df_list)
     df['surface_energy'] = (
         (df['slab_energy'] - bulk_per_atom * df['atoms'])/(2*df['area']) * 16.02
@@ -162,20 +158,59 @@ save_csv=True, csv_fname='data.csv', **kwargs):
         (df['slab_energy'] - bulk_per_atom * df['atoms'])/(2*df['area'])
     )
 
-    if electrostatic_list: 
-        df['vacuum_potential'] = electrostatic_list
-    
-    if core_energy_list: 
-        df['core_energy'] = core_energy_list
+    # Keep the vacuum and core energies as the last columns
+    df = df[[c for c in df.columns if c not in ['vacuum_potential', 
+    'core_energy']] + [c for c in ['vacuum_potential', 'core_energy'] 
+    if c in df.columns]]
 
     # Save to csv or return DataFrame
     if save_csv: 
-        if not csv_fname.endswith('.csv'):
-            csv_fname += '.csv'
-        df.to_csv(csv_fname, header=True, index=False)
+        save_df(df, csv_fname)
     else:
         return df
 
+def _mp_helper_data(parse_vacuum, get_core, task, core_atom=None, bulk_nn=None,
+**kwargs):
+    """
+    Helper function for multiprocessing, parses the vasprun.xml, POSCAR and
+    optionally LOCPOT and OUTCAR of one Miller index folder. ``task`` is a
+    (hkl_tuple, path) tuple. Returns a dict of the extracted data.
+    """
+    hkl_tuple, path = task
+    # should give error if no vasprun.xml(.gz, .xz, ...) is able to be parsed
+    with _local_file(_find_file('{}/vasprun.xml'.format(path))) as fname:
+        vsp = Vasprun(fname, parse_potcar_file=False)
+
+    psc_path = '{}/POSCAR'.format(path)
+    slab = slab_from_file(psc_path, hkl_tuple)
+    vsp_dict = vsp.as_dict()
+
+    data = {
+        'hkl': ''.join(map(str, hkl_tuple)),
+        'hkl_tuple': hkl_tuple,
+        'area': slab.surface_area,
+        'atoms': vsp_dict['nsites'],
+        'functional': vsp_dict['run_type'],
+        'encut': vsp_dict['input']['incar']['ENCUT'],
+        'algo': vsp_dict['input']['incar']['ALGO'],
+        'ismear': vsp_dict['input']['parameters']['ISMEAR'],
+        'sigma': vsp_dict['input']['parameters']['SIGMA'],
+        'kpoints': vsp_dict['input']['kpoints']['kpoints'],
+        'bandgap': vsp_dict['output']['bandgap'],
+        'slab_energy': vsp_dict['output']['final_energy'],
+        'slab_per_atom': vsp_dict['output']['final_energy_per_atom']
+    }
+
+    if parse_vacuum:
+        data['vacuum_potential'] = vacuum(path)
+
+    if get_core:
+        otc_path = '{}/OUTCAR'.format(path)
+        data['core_energy'] = core_energy(core_atom, bulk_nn, outcar=otc_path,
+        structure=psc_path, **kwargs)
+
+    return data
+
 def vacuum(path=None): 
     '''
     Gets the energy of the vacuum level. It either parses potential.csv file if 
@@ -199,11 +234,8 @@ def vacuum(path=None):
         max_potential = round(max_potential, 3)
     
     elif type(path)==str and 'LOCPOT' in path:
-        if os.path.exists(path):
-            lpt = Locpot.from_file(path)
-        else:  # should give error if neither LOCPOT(.gz) able to be parsed
-            lpt = Locpot.from_file(path + ".gz")
-        planar = lpt.get_average_along_axis(2)
+        # should give error if no LOCPOT(.gz, .xz, ...) is able to be parsed
+        planar = planar_average(_find_file(path))[0]
         max_potential = float(f"{np.max(planar): .3f}")
     
     else: 
@@ -217,14 +249,8 @@ def vacuum(path=None):
             max_potential = df['planar'].max()
             max_potential = round(max_potential, 3)
 
-        elif os.path.isfile('{}/LOCPOT'.format(cwd)): 
-            lpt = Locpot.from_file('{}/LOCPOT'.format(cwd))
-            planar = lpt.get_average_along_axis(2)
-            max_potential = float(f"{np.max(planar): .3f}")
-
-        elif os.path.isfile('{}/LOCPOT.gz'.format(cwd)):
-            lpt = Locpot.from_file('{}/LOCPOT.gz'.format(cwd))
-            planar = lpt.get_average_along_axis(2)
+        elif _exists(_find_file('{}/LOCPOT'.format(cwd))):
+            planar = planar_average(_find_file('{}/LOCPOT'.format(cwd)))[0]
             max_potential = float(f"{np.max(planar): .3f}")
 
         else: 
@@ -234,7 +260,105 @@ def vacuum(path=None):
             'no LOCPOT or potential.csv files were provided.'.format(path))
 
     return max_potential
-        
+
+def potential_analysis(path=None, slab_thickness=None, vac_thickness=None,
+structure=None, **kwargs):
+    """
+    Reads the LOCPOT in a folder once to get the vacuum level, the planar and
+    macroscopic potential and the average gradient of the vacuum region. If
+    there is no LOCPOT, but a potential.csv with planar and gradient columns
+    is present, the values are taken from the csv file instead. If neither
+    file is available, the vacuum level and gradient are np.nan.
+
+    Args:
+        path (`str`, optional): The path to the folder with the LOCPOT or the
+            path to the LOCPOT itself. Defaults to cwd.
+        slab_thickness (`int`, optional): The slab thickness in Å, used to
+            estimate the extent of the vacuum region. Defaults to ``None``.
+        vac_thickness (`int`, optional): The vacuum thickness in Å, used to
+            estimate the extent of the vacuum region. Defaults to ``None``.
+            The vacuum gradient is only calculated if both thicknesses are set.
+        structure (`str`, optional): Slab the potential belongs to, used to
+            determine where the vacuum region is. Takes a filename or a
+            pymatgen Structure or Slab object. Defaults to ``None``, which uses
+            the structure from the LOCPOT.
+        kwargs: Keyword arguments for ``analysis.electrostatic_potential``
+            e.g. ``prim_to_conv``, ``lattice_vector``, ``double_window``
+
+    Returns:
+        dict with the ``vacuum_potential`` (eV), ``vacuum_gradient`` (meV)
+        and the planar, macroscopic and gradient potential DataFrame
+        ``potential``
+    """
+    cwd = os.getcwd() if path is None else path
+    locpot = cwd if 'LOCPOT' in os.path.basename(cwd) else os.path.join(cwd,
+    'LOCPOT')
+    csv = os.path.join(os.path.dirname(locpot), 'potential.csv')
+
+    if _exists(_find_file(locpot)):
+        ax = _get_axis(kwargs.get('axis', 'c'))
+        planar, struc, dim = _read_locpot(locpot, ax)
+        df = _potential(planar, struc, ax, dim[ax],
+        prim_to_conv=kwargs.get('prim_to_conv', 1),
+        lattice_vector=kwargs.get('lattice_vector', None),
+        double_window=kwargs.get('double_window', False))
+        if structure is None:
+            structure = struc
+
+    elif os.path.isfile(csv):
+        df = pd.read_csv(csv)
+        if 'gradient' not in df.columns:
+            df['gradient'] = np.gradient(df['planar'])
+
+    else:
+        warnings.formatwarning = _custom_formatwarning
+        warnings.warn('Vacuum electrostatic potential was not parsed from {} '
+        'no LOCPOT or potential.csv files were provided.'.format(cwd))
+        return {'vacuum_potential': np.nan, 'vacuum_gradient': np.nan,
+        'potential': None}
+
+    vacuum_potential = float(f"{np.max(df['planar']): .3f}")
+
+    vacuum_gradient = np.nan
+    if (structure is not None and slab_thickness is not None and
+    vac_thickness is not None):
+        vacuum_gradient = _vacuum_gradient(df['gradient'].to_numpy(),
+        _instantiate_structure(structure), slab_thickness, vac_thickness)
+
+    return {'vacuum_potential': vacuum_potential,
+    'vacuum_gradient': vacuum_gradient, 'potential': df}
+
+def _vacuum_gradient(g, slab, slab_thickness, vac_thickness):
+    """
+    Helper function for getting the average gradient of the vacuum region in
+    meV from the gradient of the planar potential in eV.
+    """
+    ratio = int(vac_thickness)/(int(vac_thickness)+int(slab_thickness))
+    # fractional centre of mass, same as Slab.center_of_mass but also works 
+    # for Structure objects
+    com = np.average(slab.frac_coords, weights=[s.species.weight for s in slab], 
+    axis=0)
+    # check if slab is centred so can get the gradient
+    if 0.45 < com[2] < 0.55:
+        # divide by 2 bc two regions, 0.75 is a scaling factor that
+        # should hopefully work to avoid any charge from dangling
+        # bonds?
+        a = int(len(g)*ratio/2*0.75)
+        gradient = np.mean(g[:a]) * 1000
+
+    else:
+        a = int(len(g)*ratio*0.75)
+        # if atoms are more towards the end of the slab, the start
+        # should be vacuum
+        if com[2] > 0.5:
+            gradient = np.mean(g[:a]) * 1000
+        # and then if atoms are at the start, the vacuum is at
+        # the end
+        else:
+            gradient = np.mean(g[(len(g)-a):]) * 1000
+
+    return gradient
+
 
 def core_energy(core_atom, bulk_nn, orbital='1s', ox_states=None, 
 nn_method=CrystalNN(), outcar='OUTCAR', structure='POSCAR'): 
@@ -279,7 +403,7 @@ nn_method=CrystalNN(), outcar='OUTCAR', structure='POSCAR'):
     """
     struc = _instantiate_structure(structure)
     struc = oxidation_states(struc, ox_states)
-    bonded_struc = nn_method.get_bonded_structure(struc)
+    bonded_struc = _bonded_structure(struc, nn_method)
     bulk_nn.sort()
     bulk_nn_str = ' '.join(bulk_nn)
     
@@ -315,13 +439,12 @@ nn_method=CrystalNN(), outcar='OUTCAR', structure='POSCAR'):
     if type(atom) is np.float64: 
         core_energy = np.nan 
     else:       
-        # Read OUTCAR, get the core state energy
-        if os.path.exists(outcar):
-            otc = Outcar(outcar)
-        else:  # should give error if neither OUTCAR(.gz) able to be parsed
-            otc = Outcar(outcar + '.gz')
+        # Read OUTCAR, get the core state energy, should give error if no
+        # OUTCAR(.gz, .xz, ...) is able to be parsed
+        with _local_file(_find_file(outcar)) as fname:
+            otc = Outcar(fname)
+            core_energy_dict = otc.read_core_state_eigen()
 
-        core_energy_dict = otc.read_core_state_eigen()
         try: 
             core_energy = core_energy_dict[atom][orbital][-1]
         except IndexError: 
@@ -1,8 +1,21 @@
 import unittest
 import os
+import shutil
+import tempfile
+import contextlib
+import io
+from unittest import mock
 from pathlib import Path
+import numpy as np
+from pymatgen.core import Structure, Lattice
+from pymatgen.core.trajectory import Trajectory
+from pymatgen.io.vasp import Locpot, Chgcar, Poscar
+from pymatgen.analysis.local_env import CutOffDictNN
+from surfaxe.generation import oxidation_states
 from surfaxe.analysis import simple_nn, complex_nn, cart_displacements, \
-bond_analysis, electrostatic_potential, surface_dipole
+bond_analysis, electrostatic_potential, surface_dipole, \
+trajectory_displacements, potential_summary, volumetric_average, _potential
+from surfaxe.cli import simplenn, complexnn
 
 data_dir = str(Path(__file__).parents[2].joinpath('example_data/analysis'))
 
@@ -40,9 +53,49 @@ class NNTestCase(unittest.TestCase):
            save_csv=False, end=self.lta_end)
         self.assertEqual(end_data.shape, (240, 6))
         self.assertNotEqual(end_data['nn_start'][101], end_data['nn_end'][101])
+
+    def test_complex_nn_batch(self): 
+        cut_off_dict = {('La3+','O2-'): 2.91, ('Ti4+','O2-'): 2.35}
+        batch = complex_nn(start=[(self.lta, self.lta_end), self.lta_end], 
+            cut_off_dict=cut_off_dict, save_csv=False, processes=2)
+        self.assertEqual(batch.shape, (480, 7))
+        self.assertEqual(list(batch['structure'].unique()), 
+            [self.lta, self.lta_end])
+        end_data = complex_nn(start=self.lta, cut_off_dict=cut_off_dict, 
+            end=self.lta_end, save_csv=False)
+        self.assertTrue(np.array_equal(batch[:240]['nn_end'], 
+            end_data['nn_end']))
+        self.assertTrue(np.array_equal(batch[240:]['nn_start'], 
+            end_data['nn_end']))
+
+    def test_complex_nn_cutoffdictnn(self):  
+        cut_off_dict = {('Ag+','S2-'): 3.09, ('La3+','O2-'): 2.91,
+            ('La3+','S2-'): 3.559, ('Ti4+','O2-'): 2.35, ('Ti4+','S2-'): 2.91}
+        end_data = complex_nn(start=self.lta, cut_off_dict=cut_off_dict, 
+            save_csv=False, end=self.lta_end, processes=2)
+        struc = oxidation_states(Structure.from_file(self.lta_end))
+        bonded = CutOffDictNN(cut_off_dict).get_bonded_structure(struc)
+        for n in range(len(struc)): 
+            self.assertEqual(end_data['cn_end'][n], 
+                bonded.get_coordination_of_site(n))
+            self.assertEqual(end_data['nn_end'][n], ' '.join(sorted(
+                d.site.specie.symbol for d in bonded.get_connected_sites(n))))
         
 
-class CartDisplacementsTestCase(unittest.TestCase): 
+class NNCLITestCase(unittest.TestCase): 
+
+    def test_mismatched_end(self): 
+        SnO2 = os.path.join(data_dir, 'CONTCAR_SnO2')
+        for cli, bonds in [(simplenn, []), (complexnn, ['-b', 'Sn', 'O', '2.2'])]:
+            for start, end in [([SnO2] * 3, [SnO2]), ([SnO2], [SnO2] * 2)]: 
+                argv = ['surfaxe', '-s'] + start + ['-e'] + end + bonds
+                with mock.patch('sys.argv', argv), \
+                contextlib.redirect_stderr(io.StringIO()) as err, \
+                self.assertRaises(SystemExit): 
+                    cli.main()
+                self.assertIn('--end needs one structure', err.getvalue())
+
+class CartDisplacementsTestCase(unittest.TestCase):  
 
     def setUp(self): 
         self.start = os.path.join(data_dir, 'POSCAR_LTA_010')
@@ -53,6 +106,32 @@ class CartDisplacementsTestCase(unittest.TestCase):
             end=self.end, save_txt=False)
         self.assertIsNotNone(cart_data)
         self.assertEqual(len(cart_data['site']), 192)
+        # atoms crossing the cell boundary move by much less than a lattice 
+        # vector
+        self.assertLess(cart_data['displacement'].max(), 1)
+
+    def test_trajectory_displacements(self): 
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        start = Structure(Lattice.cubic(5), ['Na', 'Cl'], 
+            [[0.99, 0.5, 0.5], [0.2, 0.2, 0.2]])
+        frames = []
+        for i in range(4): 
+            frame = start.copy()
+            frame.translate_sites([0], [0.03*i, 0, 0])
+            frames.append(frame)
+        xdatcar = os.path.join(tmp, 'XDATCAR')
+        Trajectory.from_structures(frames).write_Xdatcar(xdatcar)
+
+        traj = trajectory_displacements(xdatcar)
+        self.assertEqual(traj['step'].shape, (4, 2))
+        self.assertTrue(np.allclose(traj['step'][1:, 0], 0.15))
+        self.assertTrue(np.allclose(traj['cumulative'][:, 0], 
+            [0, 0.15, 0.3, 0.45]))
+        self.assertTrue(np.allclose(traj['cumulative'], 
+            trajectory_displacements(frames)['cumulative']))
+        cart_data = cart_displacements(frames, max_disp=0.01, save_txt=False)
+        self.assertEqual(cart_data['atom'][0], ('Na', 1))
 
 class BondAnalysisTestCase(unittest.TestCase): 
 
@@ -63,6 +142,33 @@ class BondAnalysisTestCase(unittest.TestCase):
         bonds_data = bond_analysis(structure=self.structure, 
         bond = ['Sn', 'O'], save_csv=False, save_plt=False)
         self.assertEqual(bonds_data.shape, (30,3))
+
+    def test_bond_analysis_cutoff(self): 
+        crystalnn = bond_analysis(structure=self.structure, 
+        bond = ['Sn', 'O'], save_csv=False, save_plt=False)
+        bulk = Structure.from_spacegroup('P4_2/mnm', Lattice.tetragonal(4.737, 
+            3.186), ['Sn', 'O'], [[0, 0, 0], [0.307, 0.307, 0]])
+        for cutoff in (2.3, bulk): 
+            bonds_data = bond_analysis(structure=self.structure, 
+            bond = ['Sn', 'O'], save_csv=False, save_plt=False, cutoff=cutoff)
+            self.assertTrue(np.allclose(bonds_data.values, crystalnn.values))
+
+    def test_bond_analysis_multiple_bonds(self): 
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        lta = os.path.join(data_dir, 'CONTCAR_LTA_010')
+        cutoff = {'Ti-O': 2.3, 'La-O': 3.0}
+        bonds_data = bond_analysis(structure=lta, bond=[['Ti', 'O'], 
+            ['La', 'O']], save_csv=False, save_plt=True, 
+            plt_fname=os.path.join(tmp, 'bond_analysis.png'), cutoff=cutoff)
+        self.assertTrue(os.path.isfile(os.path.join(tmp, 'bond_analysis.png')))
+        self.assertEqual(list(bonds_data.columns), 
+            ['bond', 'index', 'c_coord', 'bond_distance'])
+        ti_o = bond_analysis(structure=lta, bond=['Ti', 'O'], save_csv=False,
+            cutoff=cutoff)
+        self.assertTrue(np.allclose(bonds_data[bonds_data['bond'] == 'Ti-O'][
+            ['index', 'c_coord', 'bond_distance']].values, ti_o.values))
+        self.assertEqual(len(bonds_data[bonds_data['bond'] == 'La-O']), 60)
     
     def test_bond_analysis_nonsense_bond(self):
         with self.assertRaises(TypeError) as e:
@@ -99,7 +205,47 @@ class ElectrostaticPotentialTestCase(unittest.TestCase):
             electrostatic_potential(locpot='waa', 
             save_csv=False, save_plt=False, prim_to_conv=2)
 
-class SurfaceDipoleTestCase(unittest.TestCase): 
+    def test_macroscopic_average(self): 
+        struc = Structure(Lattice.cubic(20), ['Sn'], [[0, 0, 0]])
+        z = np.arange(200) * 0.1
+        planar = np.sin(2 * np.pi * z / 2) + np.cos(2 * np.pi * z / 2.5) - 3
+        potential = _potential(planar, struc, 2, 200, lattice_vector=2)
+        self.assertEqual(list(potential.columns), 
+        ['planar', 'macroscopic', 'gradient'])
+        expected = np.mean([np.roll(planar, 10 - i) for i in range(20)], 
+        axis=0)
+        np.testing.assert_allclose(potential['macroscopic'], expected)
+
+        # both periods are averaged out by the double window
+        potential = _potential(planar, struc, 2, 200, lattice_vector=[2, 2.5])
+        np.testing.assert_allclose(potential['macroscopic'], -3, atol=1e-12)
+
+class VolumetricAverageTestCase(unittest.TestCase): 
+
+    def test_volumetric_average(self): 
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        struc = Structure(Lattice.orthorhombic(4, 4, 30), ['Sn', 'O', 'Sn'], 
+            [[0, 0, 0.4], [0.5, 0.5, 0.5], [0, 0, 0.6]])
+        rng = np.random.default_rng(0)
+        slab, bulk = rng.random((6, 6, 40)), rng.random((6, 6, 40))
+        for name, data in [('CHGCAR', slab), ('CHGCAR_bulk', bulk)]: 
+            Chgcar(Poscar(struc), {'total': data * struc.volume, 
+            'diff': data}).write_file(os.path.join(tmp, name))
+
+        chg = volumetric_average(os.path.join(tmp, 'CHGCAR'), 
+        lattice_vector=3, save_csv=False, save_plt=False)
+        diff = volumetric_average(os.path.join(tmp, 'CHGCAR'), 
+        reference=os.path.join(tmp, 'CHGCAR_bulk'), lattice_vector=3, 
+        save_csv=False, save_plt=False)
+
+        self.assertEqual(list(chg.columns), 
+        ['planar', 'macroscopic', 'gradient'])
+        self.assertTrue(np.allclose(chg['planar'], slab.mean(axis=(0, 1))))
+        self.assertTrue(np.allclose(diff['planar'], 
+        (slab - bulk).mean(axis=(0, 1))))
+
+class SurfaceDipoleTestCase(unittest.TestCase):  
 
     def setUp(self): 
         self.locpot = os.path.join(data_dir, 'LOCPOT')
@@ -112,4 +258,31 @@ class SurfaceDipoleTestCase(unittest.TestCase):
     def test_errors(self): 
         with self.assertRaises(ValueError) as e:
             surface_dipole('waa', prim_to_conv=2, 
-                           save_csv=False, save_plt=False, axis='c')
\ No newline at end of file
+                           save_csv=False, save_plt=False, axis='c')
+
+    def test_potential_summary(self): 
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        slab = Structure(Lattice.orthorhombic(4, 4, 30), ['Sn', 'O', 'Sn'], 
+            [[0, 0, 0.4], [0.5, 0.5, 0.5], [0, 0, 0.6]])
+        z = np.arange(150) * 0.2
+        for i in range(2): 
+            # vacuum at 4 eV with a slope, slab at -8 eV with 1.5 A period
+            planar = np.where((z > 9) & (z < 21), 
+                -8 + 2 * np.cos(2 * np.pi * z / 1.5), 4 + 0.1 * i * z / 30)
+            os.mkdir(os.path.join(tmp, str(i)))
+            Locpot(Poscar(slab), {'total': np.broadcast_to(planar, 
+                (4, 4, 150)).copy()}).write_file(
+                os.path.join(tmp, str(i), 'LOCPOT'))
+
+        summary = potential_summary(os.path.join(tmp, '*', 'LOCPOT'), 
+        lattice_vector=1.5, save_csv=False)
+        dipole = surface_dipole(os.path.join(tmp, '0', 'LOCPOT'), 
+        lattice_vector=1.5, save_plt=False, 
+        csv_fname=os.path.join(tmp, 'potential.csv'))
+        self.assertTrue(os.path.isfile(os.path.join(tmp, 'potential.csv')))
+
+        self.assertEqual(summary.shape, (2, 5))
+        self.assertEqual(list(summary['surface_dipole']), [dipole, 12.093])
+        self.assertTrue(np.allclose(summary['bulk_potential'], -7.995))
+        self.assertTrue(np.allclose(summary['vacuum_gradient'], [0, 2/3]))
\ No newline at end of file
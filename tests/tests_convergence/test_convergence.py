@@ -1,11 +1,39 @@
 import os
+import shutil
+import tempfile
+import tarfile
 import unittest
+import time
+from unittest import mock
 from pathlib import Path
-from surfaxe.convergence import parse_energies, parse_structures
+from surfaxe.convergence import parse_energies, parse_structures, \
+_mp_helper_energy, _fm_boettger, _find_fols, watch_energies, \
+_vasprun_signature, plan_convergence, _last_ionic_step, _parse_energy_fol
+from surfaxe.io import query_db
+from pymatgen.core import Structure
+import numpy as np
 import pandas as pd
 
 fols = str(Path(__file__).parents[2].joinpath('example_data/convergence/Y2Ti2S2O5/001'))
 
+class _FolderError(Exception): 
+    # needs two arguments, so it can not be unpickled from the pool 
+    def __init__(self, path, reason): 
+        super().__init__('{} {}'.format(path, reason))
+
+def _fake_energy_fol(parse_vacuum, get_core, hkl, path, slab_thickness, 
+vac_thickness, slab_index, **kwargs): 
+    # the first folders finish last so the pool returns them out of order 
+    time.sleep(0.2 if slab_thickness == '10' else 0)
+    if slab_thickness == '40': 
+        raise _FolderError(path, 'is broken')
+    atoms = int(slab_thickness)
+    return {'hkl_string': ''.join(map(str, hkl)), 'hkl_tuple': hkl, 
+        'slab_thickness': slab_thickness, 'vac_thickness': vac_thickness, 
+        'slab_index': slab_index, 'atoms': atoms, 'area': 10.0, 
+        'bandgap': 1.0, 'slab_energy': -5.0 * atoms + 1.0, 
+        'slab_per_atom': -5.0 + 1.0 / atoms, 'time_taken': 1.0}
+
 class ParseEnergiesTestCase(unittest.TestCase): 
 
     def setUp(self): 
@@ -17,13 +45,41 @@ class ParseEnergiesTestCase(unittest.TestCase):
         b=df[(df['vac_thickness'].astype(int)==30)&(df['slab_thickness'].astype(int)==20)]
         self.assertEqual(df.shape, (6,14))
         self.assertEqual(b['surface_energy_boettger'].values[0], 0.41701338602378163)
-        self.assertEqual(b['surface_energy_fm'].values[0], 0.4170133860237656)
+        self.assertAlmostEqual(b['surface_energy_fm'].values[0], 0.4170133860237656)
         self.assertEqual(b['surface_energy'].values[0], 0.4119406752267468)
 
     def test_no_pwd(self): 
         self.assertRaises(FileNotFoundError, parse_energies, hkl=(0,0,1), 
         bulk_per_atom=-6.188, save_csv=False, plt_surfen=False)
     
+    def test_folder_error_is_returned(self): 
+        task = (3, [os.path.join(self.fols, '20_20_15'), '20', '20', '15', 
+        (0,0,1)])
+        n, data, error = _mp_helper_energy(False, False, task)
+        self.assertEqual(n, 3)
+        self.assertIsNone(data)
+        self.assertTrue(error['error'].startswith('FileNotFoundError: '))
+        self.assertIn('Traceback', error['traceback'])
+
+    def test_find_fols(self): 
+        paths = _find_fols((0,0,1), self.fols)
+        self.assertEqual(len(paths), 6)
+        self.assertEqual(paths[0][1:], ['20', '20', '15', (0,0,1)])
+        self.assertEqual(_find_fols('all', str(Path(self.fols).parent)), paths)
+        self.assertEqual(_find_fols([(0,0,1), (1,1,0)], self.fols), paths)
+        self.assertEqual(_find_fols([(1,1,0)], self.fols), [])
+
+    def test_find_fols_tar(self): 
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        archive = os.path.join(tmp, 'Y2Ti2S2O5.tar.gz')
+        with tarfile.open(archive, 'w:gz') as tar: 
+            tar.add(self.fols, arcname='Y2Ti2S2O5/001')
+        paths = _find_fols((0,0,1), archive)
+        self.assertEqual(paths, [[os.path.join(archive, 'Y2Ti2S2O5', 
+            os.path.relpath(p[0], str(Path(self.fols).parent))), *p[1:]] 
+            for p in _find_fols((0,0,1), self.fols)])
+
     def test_parse_core_no_atom_set(self): 
         df = parse_energies(hkl=(0,0,1), bulk_per_atom=-8.83099767, 
         path_to_fols=self.fols, plt_surfen=False, save_csv=False, 
@@ -45,9 +101,199 @@ class ParseEnergiesTestCase(unittest.TestCase):
         b=df[(df['vac_thickness'].astype(int)==30)&(df['slab_thickness'].astype(int)==20)]
         self.assertEqual(df.shape, (6,14))
         self.assertEqual(b['surface_energy_boettger'].values[0], 0.41701338602378163)
-        self.assertEqual(b['surface_energy_fm'].values[0], 0.4170133860237656)
+        self.assertAlmostEqual(b['surface_energy_fm'].values[0], 0.4170133860237656)
         self.assertEqual(b['surface_energy'].values[0], 0.4119406752267468)
 
+class FMBoettgerTestCase(unittest.TestCase): 
+
+    def setUp(self): 
+        # two terminations with energies linear in the number of atoms, so 
+        # both methods should give back the same surface energy of 0.5 J/m2
+        self.df = pd.DataFrame({
+            'slab_index': ['1']*3 + ['2']*4,
+            'vac_thickness': ['20']*7,
+            'slab_thickness': ['40', '20', '60', '20', '30', '40', '100'],
+            'atoms': [40, 20, 60, 30, 50, 70, 90],
+            'area': [10.0]*3 + [12.0]*4})
+        self.df['slab_energy'] = -5.0*self.df['atoms'] + \
+            2*self.df['area']*0.5/16.02
+
+    def test_fm_boettger(self): 
+        df = _fm_boettger(self.df)
+        self.assertEqual(list(df['slab_thickness']), 
+            ['20', '40', '60', '20', '30', '40', '100'])
+        self.assertTrue(np.allclose(df['surface_energy_fm'], 0.5))
+        self.assertTrue(np.allclose(df['surface_energy_boettger'].iloc[[0,1,3,4,5]], 0.5))
+        self.assertTrue(df['surface_energy_boettger'].iloc[[2,6]].isna().all())
+
+    def test_fm_boettger_remove_first(self): 
+        df = _fm_boettger(self.df, remove_first_energy=True)
+        self.assertTrue(np.allclose(df['surface_energy_fm'], 0.5))
+        self.assertTrue(df['surface_energy_boettger'].iloc[[0,2,3,6]].isna().all())
+
+    def test_fm_boettger_hkl_groups(self): 
+        # the same slab index and vacuum in another Miller index is a 
+        # separate group
+        df2 = self.df.copy()
+        df2['slab_energy'] = -5.0*df2['atoms'] + 2*df2['area']*0.8/16.02
+        df = pd.concat([self.df.assign(hkl_string='110'), 
+            df2.assign(hkl_string='001')], ignore_index=True)
+        df = _fm_boettger(df)
+        self.assertEqual(list(df['hkl_string'].unique()), ['001', '110'])
+        self.assertTrue(np.allclose(df['surface_energy_fm'].iloc[:7], 0.8))
+        self.assertTrue(np.allclose(df['surface_energy_fm'].iloc[7:], 0.5))
+        self.assertTrue(df['surface_energy_boettger'].iloc[[2,6,9,13]].isna().all())
+
+class WatchEnergiesTestCase(unittest.TestCase): 
+
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def test_vasprun_signature(self): 
+        self.assertIsNone(_vasprun_signature(self.tmp))
+        vsp = os.path.join(self.tmp, 'vasprun.xml')
+        with open(vsp, 'w') as f: 
+            f.write('<?xml version="1.0"?>\n<modeling>\n <calculation>\n')
+        self.assertIsNone(_vasprun_signature(self.tmp))
+        with open(vsp, 'a') as f: 
+            f.write(' </calculation>\n</modeling>\n')
+        self.assertEqual(_vasprun_signature(self.tmp)[1], os.path.getsize(vsp))
+
+    def test_watch_no_finished_folders(self): 
+        csv = os.path.join(self.tmp, 'data.csv')
+        df = watch_energies((0,0,1), -8.83099767, path_to_fols=fols, 
+        max_polls=1, csv_fname=csv, processes=1)
+        self.assertTrue(df.empty)
+        self.assertFalse(os.path.exists(csv))
+
+class ParseEnergiesPoolTestCase(unittest.TestCase): 
+
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        for st in ['10', '20', '30', '40']: 
+            os.makedirs(os.path.join(self.tmp, 'MAT', '001', 
+            '{}_20_1'.format(st)))
+
+    @mock.patch('surfaxe.convergence._parse_energy_fol', _fake_energy_fol)
+    @mock.patch('multiprocessing.cpu_count', return_value=4)
+    def test_pool_errors_and_order(self, cpu_count): 
+        db = os.path.join(self.tmp, 'results.db')
+        with self.assertWarns(UserWarning): 
+            df = parse_energies((0,0,1), -5.0, path_to_fols=self.tmp, 
+            processes=3, plt_surfen=False, save_csv=False, db_fname=db)
+
+        # the parsed rows are in folder order, not the order they finished 
+        self.assertEqual(list(df['slab_thickness']), ['10', '20', '30'])
+        self.assertTrue(np.allclose(df['surface_energy'], 16.02 / 20))
+
+        errors = df.attrs['errors']
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors['slab_thickness'][0], '40')
+        self.assertTrue(errors['error'][0].startswith('_FolderError: '))
+        self.assertIn('is broken', errors['traceback'][0])
+
+        stored = query_db(db, material='MAT')
+        self.assertEqual(sorted(stored['slab_thickness'].astype(float)), 
+        [10, 20, 30])
+
+class UnfinishedRunTestCase(unittest.TestCase):  
+
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.struc = Structure.from_file(str(Path(__file__).parents[2].joinpath(
+            'example_data/analysis/CONTCAR_SnO2')))
+        self.struc.to(filename=os.path.join(self.tmp, 'POSCAR'), fmt='poscar')
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def _write_vasprun(self, energies): 
+        # one complete ionic step per energy and a truncated one after them
+        rc = ''.join('<rc><c>{}</c><c>1</c></rc>'.format(s.specie) 
+            for s in self.struc)
+        structure = ('<structure><crystal><varray name="basis">{}</varray>'
+            '</crystal><varray name="positions">{}</varray></structure>').format(
+            ''.join('<v>{} {} {}</v>'.format(*v) for v in 
+            self.struc.lattice.matrix), 
+            ''.join('<v>{} {} {}</v>'.format(*s.frac_coords) for s in self.struc))
+        with open(os.path.join(self.tmp, 'vasprun.xml'), 'w') as f: 
+            f.write('<?xml version="1.0"?>\n<modeling>\n<atominfo><array '
+                'name="atoms"><set>{}</set></array></atominfo>\n'.format(rc))
+            for energy in energies: 
+                f.write('<calculation><scstep><energy><i name="e_0_energy">'
+                    '1.0</i></energy></scstep>{}<energy><i name="e_0_energy">'
+                    '{}</i></energy></calculation>\n'.format(structure, energy))
+            f.write('<calculation><scstep><energy><i name="e_0_en')
+
+    def test_truncated_vasprun(self): 
+        self._write_vasprun([])
+        self.assertIsNone(_last_ionic_step(self.tmp))
+        self._write_vasprun([-100.5, -101.25])
+        energy, struc = _last_ionic_step(self.tmp)
+        self.assertEqual(energy, -101.25)
+        self.assertEqual(struc, self.struc)
+
+    def _write_oszicar(self): 
+        with open(os.path.join(self.tmp, 'OSZICAR'), 'w') as f: 
+            f.write('       N       E                     dE             d eps  '
+                '     ncg     rms          rms(c)\n'
+                'DAV:   1    -0.1E+03   -0.1E+03   -0.1E+03  1000   0.1E+03\n'
+                '   1 F= -.10051E+03 E0= -.10050E+03  d E =-.1E+03\n'
+                'DAV:   1    -0.1E+03   -0.1E+03   -0.1E+03  1000   0.1E+03\n')
+
+    def test_oszicar(self): 
+        self._write_oszicar()
+        self._write_vasprun([-1.0])
+        data = _parse_energy_fol(False, False, (1,1,0), self.tmp, '20', '20', 
+            '0')
+        self.assertTrue(data['incomplete'])
+        self.assertEqual(data['slab_energy'], -100.5)
+        self.assertEqual(data['atoms'], len(self.struc))
+        self.assertTrue(np.isnan(data['bandgap']))
+
+    def test_other_errors(self): 
+        # only unfinished or truncated vasprun.xml files use the OSZICAR
+        self._write_oszicar()
+        os.mkdir(os.path.join(self.tmp, 'vasprun.xml'))
+        with self.assertRaises(OSError): 
+            _parse_energy_fol(False, False, (1,1,0), self.tmp, '20', '20', '0')
+
+class PlanConvergenceTestCase(unittest.TestCase): 
+
+    def setUp(self): 
+        # termination 1 converges slowly with slab thickness, termination 2 
+        # is converged at 20 A; both are 0.02 J/m2 off at 20 A of vacuum 
+        rows = []
+        for idx, amp in [('1', 0.5), ('2', 0.002)]: 
+            for vac in [20, 30]: 
+                for st in [20, 30, 40]: 
+                    rows.append({'hkl_string': '001', 'hkl_tuple': (0,0,1), 
+                    'slab_index': idx, 'slab_thickness': str(st), 
+                    'vac_thickness': str(vac), 'surface_energy_fm': 
+                    1.0 + amp*np.exp(-st/10) + 0.02*(vac == 20)})
+        self.df = pd.DataFrame(rows)
+
+    def test_plan_convergence(self): 
+        plan = plan_convergence(self.df, tol=0.01)
+        conv = plan['convergence']
+        self.assertFalse(conv['converged'].any())
+        self.assertEqual(conv['slab_thickness'][1], 20)
+        self.assertEqual(conv['suggested'][0], [(50, 30), (40, 40)])
+        self.assertEqual(plan['generate_slabs'], [
+            {'hkl': (0,0,1), 'thicknesses': [50], 'vacuums': [30]}, 
+            {'hkl': (0,0,1), 'thicknesses': [20, 40], 'vacuums': [40]}])
+
+    def test_plan_converged(self): 
+        plan = plan_convergence(self.df, tol=0.05)
+        conv = plan['convergence']
+        self.assertTrue(conv['converged'].all())
+        self.assertEqual(list(conv['vac_thickness']), [20, 20])
+        self.assertEqual(plan['generate_slabs'], [])
+
 class ParseStructuresTestCase(unittest.TestCase):
 
     def setUp(self): 
@@ -102,7 +348,13 @@ class ParseStructuresTestCase(unittest.TestCase):
         self.assertEqual(d[0]['bonds']['Ti-O']['Ti_c_coord'][3], 0.415056)
 
 
-    def test_parse_bonds_none(self): 
+    def test_parse_bonds_parallel(self): 
+        kwargs = {'structure_file': 'POSCAR', 'path_to_fols': self.fols, 
+            'save_json': False, 'bond': [['Y', 'O'], ['Ti', 'O']]}
+        self.assertEqual(parse_structures((0,0,1), processes=1, **kwargs), 
+            parse_structures((0,0,1), processes=2, **kwargs))
+
+    def test_parse_bonds_none(self):  
         d = parse_structures((0,0,1), structure_file='POSCAR', path_to_fols=self.fols, save_json=False,
         bond=None)
 
@@ -1,7 +1,37 @@
 import unittest
+import os
+import gzip
+import bz2
+import lzma
+import tarfile
+import shutil
+import tempfile
+import numpy as np
 from pathlib import Path
+from pymatgen.core import Structure, Lattice
+from pymatgen.analysis.local_env import CrystalNN
 from pymatgen.core.surface import Slab
-from surfaxe.io import _load_config_dict, slab_from_file
+from pymatgen.io.vasp.inputs import Poscar
+from pymatgen.io.vasp.outputs import Locpot
+import pandas as pd
+from unittest import mock
+from surfaxe.io import _load_config_dict, slab_from_file, planar_average, \
+_load_sidecar, save_df, load_df, _open_file, _find_file, _local_file, \
+_instantiate_structure, _walk, _exists, save_db, query_db, set_nn_cache, \
+clear_nn_cache, _bonded_structure, _neighbours, volumetric_to_npy, load_grid, \
+planar_difference
+
+try: 
+    import zstandard
+    has_zstandard = True
+except ImportError: 
+    has_zstandard = False
+
+try: 
+    import pyarrow
+    has_pyarrow = True
+except ImportError: 
+    has_pyarrow = False
 
 class LoadTestCase(unittest.TestCase): 
 
@@ -28,4 +58,312 @@ class SlabFromFileTestCase(unittest.TestCase):
     def test_slab_from_file(self): 
         slab = slab_from_file(self.slab, (0,1,0))
 
-        self.assertEqual(type(slab), Slab)
\ No newline at end of file
+        self.assertEqual(type(slab), Slab)
+
+class PlanarAverageTestCase(unittest.TestCase): 
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        struc = Structure.from_file(str(Path(__file__).parents[2].joinpath(
+            'example_data/analysis/CONTCAR_SnO2')))
+        rng = np.random.default_rng(0)
+        self.lpt = Locpot(Poscar(struc), {'total': rng.normal(size=(6, 7, 31))})
+        self.locpot = os.path.join(self.tmp, 'LOCPOT')
+        self.lpt.write_file(self.locpot)
+    
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def test_planar_average(self): 
+        for axis in range(3): 
+            planar, struc, dim = planar_average(self.locpot, axis=axis, 
+            chunk_size=7)
+            self.assertEqual(dim, (6, 7, 31))
+            self.assertEqual(len(struc), len(self.lpt.structure))
+            self.assertTrue(np.allclose(planar, 
+            self.lpt.get_average_along_axis(axis)))
+
+    def test_planar_average_gz(self): 
+        with open(self.locpot, 'rb') as f, \
+        gzip.open(self.locpot + '.gz', 'wb') as g: 
+            shutil.copyfileobj(f, g)
+        planar = planar_average(self.locpot + '.gz')[0]
+        self.assertTrue(np.allclose(planar, self.lpt.get_average_along_axis(2)))
+
+    def test_truncated(self): 
+        with open(self.locpot, 'r') as f: 
+            lines = f.readlines()
+        with open(self.locpot, 'w') as f: 
+            f.writelines(lines[:-20])
+        with self.assertRaises(ValueError): 
+            planar_average(self.locpot)
+
+    def test_sidecar(self): 
+        planar = planar_average(self.locpot)[0]
+        sidecar = self.locpot + '.planar.npz'
+        self.assertTrue(os.path.isfile(sidecar))
+        data = _load_sidecar(self.locpot, sidecar)
+        self.assertEqual(data['dim'], (6, 7, 31))
+        self.assertTrue(np.array_equal(data['planar'][2], planar))
+        self.assertTrue(np.allclose(planar_average(self.locpot, axis=0)[0], 
+        self.lpt.get_average_along_axis(0)))
+
+        # a changed LOCPOT invalidates the sidecar
+        lpt = Locpot(Poscar(self.lpt.structure), {'total': np.ones((6, 7, 31))})
+        lpt.write_file(self.locpot)
+        self.assertTrue(np.allclose(planar_average(self.locpot)[0], 1))
+
+    def test_grid_cache(self): 
+        npy = volumetric_to_npy(self.locpot)
+        self.assertEqual(npy, self.locpot + '.grid.npy')
+        grid, struc = load_grid(self.locpot)
+        self.assertIsInstance(grid, np.memmap)
+        self.assertTrue(np.allclose(grid, self.lpt.data['total']))
+
+        # without the sidecar the planar averages come from the mapped grid
+        for axis in range(3): 
+            planar = planar_average(self.locpot, axis=axis)[0]
+            os.remove(self.locpot + '.planar.npz')
+            self.assertTrue(np.allclose(planar, 
+            self.lpt.get_average_along_axis(axis)))
+        del grid
+
+        # a changed LOCPOT is parsed and converted again
+        lpt = Locpot(Poscar(self.lpt.structure), {'total': np.ones((6, 7, 31))})
+        lpt.write_file(self.locpot)
+        self.assertTrue(np.allclose(planar_average(self.locpot, 
+        grid_cache=True)[0], 1))
+        self.assertTrue(np.allclose(load_grid(self.locpot)[0], 1))
+
+    def test_planar_difference(self): 
+        reference = os.path.join(self.tmp, 'LOCPOT_ref')
+        lpt = Locpot(Poscar(self.lpt.structure), {'total': np.ones((6, 7, 31))})
+        lpt.write_file(reference)
+        npy = os.path.join(self.tmp, 'diff.npy')
+        for axis in range(3): 
+            planar, struc, dim = planar_difference(self.locpot, reference, 
+            axis=axis, chunk_size=4, grid=npy)
+            self.assertTrue(np.allclose(planar, 
+            self.lpt.get_average_along_axis(axis) - 1))
+        self.assertTrue(np.allclose(np.load(npy).T, 
+        self.lpt.data['total'] - 1))
+
+        lpt = Locpot(Poscar(self.lpt.structure), {'total': np.ones((6, 7, 30))})
+        lpt.write_file(reference)
+        with self.assertRaises(ValueError): 
+            planar_difference(self.locpot, reference)
+
+class DataFrameFileTestCase(unittest.TestCase): 
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.df = pd.DataFrame({'hkl': ['001', '1-10'], 
+            'hkl_tuple': [(0,0,1), (1,-1,0)], 
+            'slab_thickness': [20, 30], 
+            'kpoints': [[[3, 3, 1]], [[2, 2, 1]]], 
+            'slab_energy': [-100.5, -150.25]})
+        self.df.attrs['errors'] = pd.DataFrame()
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def check_roundtrip(self, fname): 
+        fname = save_df(self.df, os.path.join(self.tmp, fname))
+        df = load_df(fname)
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        self.assertEqual(list(df['hkl']), ['001', '1-10'])
+        self.assertEqual(list(df['hkl_tuple']), [(0,0,1), (1,-1,0)])
+        self.assertEqual(list(df['kpoints']), [[[3, 3, 1]], [[2, 2, 1]]])
+        self.assertEqual(list(df['slab_energy']), [-100.5, -150.25])
+        return fname
+
+    def test_csv(self): 
+        fname = self.check_roundtrip('data')
+        self.assertTrue(fname.endswith('data.csv'))
+
+    def test_npz(self): 
+        self.check_roundtrip('data.npz')
+
+    @unittest.skipUnless(has_pyarrow, 'pyarrow is not installed')
+    def test_parquet_feather(self): 
+        self.check_roundtrip('data.parquet')
+        self.check_roundtrip('data.feather')
+
+class ResultsStoreTestCase(unittest.TestCase): 
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, 'results.db')
+        self.df = pd.DataFrame({'hkl_string': ['001', '001', '110'], 
+            'hkl_tuple': [(0,0,1), (0,0,1), (1,1,0)],
+            'slab_thickness': ['20', '30', '20'], 
+            'vac_thickness': ['20', '20', '20'], 'slab_index': ['0', '0', '1'],
+            'surface_energy_fm': [0.9, 1.2, 0.5], 'time_taken': [1, 2, 3]})
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def test_upsert(self): 
+        save_db(self.df, self.db, material='SnO2')
+        df = self.df.copy()
+        df['surface_energy_fm'] = [0.8, 1.2, 0.5]
+        self.assertEqual(save_db(df.drop(columns='time_taken'), self.db, 
+            material='SnO2'), 3)
+        save_db(self.df, self.db, material='TiO2')
+        q = query_db(self.db, material='SnO2')
+        self.assertEqual(len(q), 3)
+        self.assertEqual(list(q['surface_energy_fm']), [0.8, 1.2, 0.5])
+        # columns missing from an update are kept
+        self.assertEqual(list(q['time_taken']), [1, 2, 3])
+        self.assertRaises(ValueError, save_db, self.df, self.db)
+
+    def test_query(self): 
+        save_db(self.df, self.db, material='SnO2')
+        save_db(self.df, self.db, material='TiO2')
+        q = query_db(self.db, hkl=(0,0,1), where='surface_energy_fm < ?', 
+            params=(1,))
+        self.assertEqual(list(q['material']), ['SnO2', 'TiO2'])
+        self.assertEqual(q['hkl_tuple'][0], (0,0,1))
+        self.assertEqual(len(query_db(self.db, hkl=['001', (1,1,0)], 
+            material=['SnO2'])), 3)
+        self.assertRaises(FileNotFoundError, query_db, 
+            os.path.join(self.tmp, 'missing.db'))
+        self.assertEqual(list(query_db(self.db, columns=['material', 
+            'surface_energy_fm']).columns), ['material', 'surface_energy_fm'])
+        with self.assertRaises(ValueError): 
+            query_db(self.db, columns=['material', 'material; DROP TABLE'])
+
+    def test_upsert_old_sqlite(self): 
+        # SQLite before 3.24 has no upsert 
+        with mock.patch('sqlite3.sqlite_version_info', (3, 22, 0)): 
+            self.test_upsert()
+
+class CompressedFileTestCase(unittest.TestCase):  
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.poscar = str(Path(__file__).parents[2].joinpath(
+            'example_data/analysis/CONTCAR_SnO2'))
+        with open(self.poscar, 'rb') as f: 
+            self.raw = f.read()
+        self.compressors = {'gz': gzip.compress, 'bz2': bz2.compress, 
+            'xz': lzma.compress}
+        if has_zstandard: 
+            self.compressors['zst'] = zstandard.ZstdCompressor().compress
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def test_open_by_magic_bytes(self): 
+        for ext, compress in self.compressors.items(): 
+            # the extension does not match the compression on purpose
+            fname = os.path.join(self.tmp, 'CONTCAR_{}.txt'.format(ext))
+            with open(fname, 'wb') as f: 
+                f.write(compress(self.raw))
+            with _open_file(fname) as f: 
+                self.assertEqual(f.read(), self.raw.decode())
+
+    def test_structure_from_compressed(self): 
+        struc = Structure.from_file(self.poscar)
+        for ext, compress in self.compressors.items(): 
+            folder = os.path.join(self.tmp, ext)
+            os.mkdir(folder)
+            with open(os.path.join(folder, 'CONTCAR.' + ext), 'wb') as f: 
+                f.write(compress(self.raw))
+            fname = _find_file(os.path.join(folder, 'CONTCAR'))
+            self.assertTrue(fname.endswith('CONTCAR.' + ext))
+            self.assertEqual(_instantiate_structure(fname), struc)
+            self.assertEqual(_instantiate_structure(
+                os.path.join(folder, 'CONTCAR')), struc)
+
+    def test_local_file(self): 
+        for ext, compress in self.compressors.items(): 
+            fname = os.path.join(self.tmp, 'CONTCAR_SnO2.' + ext)
+            with open(fname, 'wb') as f: 
+                f.write(compress(self.raw))
+            with _local_file(fname) as local: 
+                # decompressed to a temporary file without the extension
+                self.assertEqual(os.path.basename(local), 'CONTCAR_SnO2')
+                with open(local, 'rb') as f: 
+                    self.assertEqual(f.read(), self.raw)
+            self.assertFalse(os.path.exists(local))
+        with _local_file(self.poscar) as local: 
+            self.assertEqual(local, self.poscar)
+        self.assertTrue(os.path.exists(self.poscar))
+
+    def test_planar_average_xz(self):  
+        lpt = Locpot(Poscar(Structure.from_file(self.poscar)), 
+            {'total': np.arange(6*7*8, dtype=float).reshape(6, 7, 8)})
+        locpot = os.path.join(self.tmp, 'LOCPOT')
+        lpt.write_file(locpot)
+        with open(locpot, 'rb') as f, lzma.open(locpot + '.xz', 'wb') as g: 
+            g.write(f.read())
+        os.remove(locpot)
+        planar = planar_average(_find_file(locpot), cache=False)[0]
+        self.assertTrue(np.allclose(planar, lpt.get_average_along_axis(2)))
+
+class TarArchiveTestCase(unittest.TestCase): 
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.poscar = str(Path(__file__).parents[2].joinpath(
+            'example_data/analysis/CONTCAR_SnO2'))
+        self.struc = Structure.from_file(self.poscar)
+        self.lpt = Locpot(Poscar(self.struc), 
+            {'total': np.arange(6*7*8, dtype=float).reshape(6, 7, 8)})
+        folder = os.path.join(self.tmp, 'mat', '001', '20_20_1')
+        os.makedirs(folder)
+        self.lpt.write_file(os.path.join(folder, 'LOCPOT'))
+        with open(self.poscar, 'rb') as f, \
+            gzip.open(os.path.join(folder, 'CONTCAR.gz'), 'wb') as g: 
+            g.write(f.read())
+        self.archive = os.path.join(self.tmp, 'mat.tar.gz')
+        with tarfile.open(self.archive, 'w:gz') as tar: 
+            tar.add(os.path.join(self.tmp, 'mat'), arcname='mat')
+
+    def tearDown(self): 
+        shutil.rmtree(self.tmp)
+
+    def test_walk_archive(self): 
+        walk = list(_walk(self.archive))
+        self.assertEqual([w[0] for w in walk], [self.archive, 
+            os.path.join(self.archive, 'mat'), 
+            os.path.join(self.archive, 'mat', '001'),
+            os.path.join(self.archive, 'mat', '001', '20_20_1')])
+        self.assertEqual(sorted(walk[-1][2]), ['CONTCAR.gz', 'LOCPOT'])
+        self.assertEqual(list(_walk(os.path.join(self.archive, 'x'))), [])
+
+    def test_read_from_archive(self): 
+        folder = os.path.join(self.archive, 'mat', '001', '20_20_1')
+        self.assertTrue(_exists(os.path.join(folder, 'LOCPOT')))
+        self.assertFalse(_exists(os.path.join(folder, 'OUTCAR')))
+        self.assertEqual(_find_file(os.path.join(folder, 'CONTCAR')), 
+            os.path.join(folder, 'CONTCAR.gz'))
+        self.assertEqual(_instantiate_structure(
+            os.path.join(folder, 'CONTCAR')), self.struc)
+        planar = planar_average(os.path.join(folder, 'LOCPOT'))[0]
+        self.assertTrue(np.allclose(planar, self.lpt.get_average_along_axis(2)))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'mat.tar.gz.planar.npz')))
+
+class NNCacheTestCase(unittest.TestCase): 
+    def setUp(self): 
+        self.tmp = tempfile.mkdtemp()
+        self.struc = Structure.from_spacegroup('P4_2/mnm', Lattice.tetragonal(
+            4.737, 3.186), ['Sn', 'O'], [[0, 0, 0], [0.307, 0.307, 0]])
+        clear_nn_cache()
+
+    def tearDown(self): 
+        set_nn_cache()
+        clear_nn_cache()
+        shutil.rmtree(self.tmp)
+
+    def test_bonded_structure(self): 
+        sg = _bonded_structure(self.struc, CrystalNN())
+        self.assertEqual(sg, CrystalNN().get_bonded_structure(self.struc))
+        # equal structure and nn_method, not the same objects
+        self.assertIs(_bonded_structure(self.struc.copy(), CrystalNN()), sg)
+        self.assertIsNot(_bonded_structure(self.struc, 
+            CrystalNN(distance_cutoffs=(0.4, 0.8))), sg)
+
+    def test_disk_cache(self): 
+        set_nn_cache(cache_dir=self.tmp)
+        neighbours = _neighbours(self.struc, CrystalNN(), [0, 1])
+        self.assertEqual(len(os.listdir(self.tmp)), 1)
+        clear_nn_cache()
+        self.assertEqual(_neighbours(self.struc, CrystalNN(), [0, 1]), 
+            neighbours)
@@ -1,7 +1,9 @@
 import unittest
 import os
+import math
 from pathlib import Path
-from surfaxe.vasp_data import vacuum, core_energy, process_data
+from surfaxe.vasp_data import vacuum, core_energy, process_data, \
+potential_analysis
 
 data_dir = str(Path(__file__).parents[2].joinpath('example_data/vasp_data'))
 analysis_dir = str(Path(__file__).parents[2].joinpath('example_data/analysis'))
@@ -25,6 +27,23 @@ class VacuumTestCase(unittest.TestCase):
         self.assertEqual(lpt, 4.557)
         self.assertEqual(fol_lpt, 4.557)
         self.assertWarns(UserWarning, vacuum)
+
+class PotentialAnalysisTestCase(unittest.TestCase): 
+
+    def setUp(self): 
+        self.path = os.path.join(data_dir, '101')
+        self.structure = os.path.join(data_dir, '101/POSCAR')
+
+    def test_potential_analysis(self): 
+        pa = potential_analysis(self.path, 20, 20, structure=self.structure)
+        self.assertEqual(pa['vacuum_potential'], vacuum(self.path))
+        self.assertEqual(pa['potential'].shape, (840, 3))
+        self.assertAlmostEqual(pa['vacuum_gradient'], -1.679, places=3)
+
+    def test_no_gradient_without_thickness(self): 
+        pa = potential_analysis(self.path)
+        self.assertEqual(pa['vacuum_potential'], 7.926)
+        self.assertTrue(math.isnan(pa['vacuum_gradient']))
         
 
 class CoreTestCase(unittest.TestCase): 